@@ -0,0 +1,169 @@
+"""
+Compare the PyTorch and int8 ONNX embedding backends on the bundled PDFs.
+
+For each model this reports embedding throughput on both backends, the
+cosine similarity between the two backends' vectors for the same input, and
+how many of the top-k neighbours survive two ways: an index built by ONNX
+(a fresh collection) and ONNX queries against vectors stored by PyTorch (an
+existing collection kept after switching backends).
+
+Run from the backend folder so the ./models paths resolve:
+
+    python -m benchmarks.embedding_backend_benchmark --threads 0 4
+"""
+import argparse
+import dataclasses
+import glob
+import os
+import sys
+import time
+from pathlib import Path
+
+src_path = Path(__file__).resolve().parents[1] / "src"
+if str(src_path) not in sys.path:
+    sys.path.insert(0, str(src_path))
+
+import fitz  # noqa: E402
+import numpy as np  # noqa: E402
+from PIL import Image  # noqa: E402
+
+from smart_doc.retrieval.components import (  # noqa: E402
+    RAGConfig,
+    create_image_embedder,
+    create_splitters,
+    create_text_embedder,
+)
+from smart_doc.retrieval.language import detect_text_languages  # noqa: E402
+
+
+PDF_FOLDER = Path(__file__).resolve().parents[1] / "pdfs"
+
+
+def load_inputs(pdf_paths, config, max_images):
+    splitter = create_splitters(config).child
+    texts = {"en": [], "ar": []}
+    images = []
+
+    for path in pdf_paths:
+        with fitz.open(path) as pdf:
+            for page in pdf:
+                chunks = splitter.split_text(page.get_text())
+                for chunk, language in zip(chunks, detect_text_languages(chunks)):
+                    texts[language].append(chunk)
+
+                if len(images) < max_images:
+                    pixmap = page.get_pixmap(dpi=72)
+                    images.append(
+                        Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples)
+                    )
+
+    return texts, images
+
+
+def timed(embedder, inputs):
+    # One call first so lazy initialisation is not timed.
+    embedder(inputs[:1])
+    start = time.perf_counter()
+    vectors = np.array(embedder(inputs), dtype=np.float32)
+    return vectors, time.perf_counter() - start
+
+
+def normalise(vectors):
+    return vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+
+
+def neighbour_recall(queries, index, reference_queries, reference_index, k):
+    """Share of each query's top-k reference neighbours also found in its top-k."""
+    found = np.argsort(-normalise(queries) @ normalise(index).T, axis=1)[:, :k]
+    expected = np.argsort(-normalise(reference_queries) @ normalise(reference_index).T, axis=1)[:, :k]
+    return float(np.mean([
+        len(set(a) & set(b)) / len(b) for a, b in zip(found, expected)
+    ]))
+
+
+def compare(label, torch_embedder, onnx_embedder, inputs, queries, k):
+    torch_vectors, torch_seconds = timed(torch_embedder, inputs)
+    onnx_vectors, onnx_seconds = timed(onnx_embedder, inputs)
+    torch_queries = np.array(torch_embedder(queries), dtype=np.float32)
+    onnx_queries = np.array(onnx_embedder(queries), dtype=np.float32)
+
+    similarity = np.sum(normalise(torch_vectors) * normalise(onnx_vectors), axis=1)
+    k = min(k, len(inputs))
+
+    print(
+        f"{label:<8} {len(inputs):5d} items  "
+        f"torch {len(inputs) / torch_seconds:7.1f}/s  "
+        f"onnx {len(inputs) / onnx_seconds:7.1f}/s  "
+        f"({torch_seconds / onnx_seconds:4.1f}x)  "
+        f"cosine mean {similarity.mean():.4f} min {similarity.min():.4f}  "
+        f"recall@{k} onnx index {neighbour_recall(onnx_queries, onnx_vectors, torch_queries, torch_vectors, k):.3f}  "
+        f"torch index {neighbour_recall(onnx_queries, torch_vectors, torch_queries, torch_vectors, k):.3f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pdf-folder", default=str(PDF_FOLDER))
+    parser.add_argument("--threads", type=int, nargs="+", default=[RAGConfig.onnx_threads])
+    parser.add_argument("--max-images", type=int, default=64)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+
+    pdf_paths = sorted(glob.glob(os.path.join(args.pdf_folder, "*.pdf")))
+    if not pdf_paths:
+        raise SystemExit(f"No PDFs found in {args.pdf_folder}")
+
+    torch_config = RAGConfig()
+    texts, images = load_inputs(pdf_paths, torch_config, args.max_images)
+    print(
+        f"{len(pdf_paths)} PDFs: {len(texts['en'])} English chunks, "
+        f"{len(texts['ar'])} Arabic chunks, {len(images)} page images"
+    )
+
+    models = {
+        "en": torch_config.english_embedding_model,
+        "ar": torch_config.arabic_embedding_model,
+    }
+    torch_text = {
+        language: create_text_embedder(model, torch_config)
+        for language, model in models.items() if texts[language]
+    }
+    torch_image = create_image_embedder(torch_config.image_embedding_model, "cpu", torch_config)
+
+    for threads in args.threads:
+        print(f"onnx_threads={threads}")
+        onnx_config = dataclasses.replace(
+            torch_config,
+            embedding_backend="onnx",
+            onnx_threads=threads
+        )
+
+        for language, torch_embedder in torch_text.items():
+            # A chunk's first sentence stands in for a question about it.
+            queries = [
+                chunk.split(".")[0][:200]
+                for chunk in texts[language][::max(1, len(texts[language]) // args.queries)]
+            ]
+            compare(
+                language,
+                torch_embedder,
+                create_text_embedder(models[language], onnx_config),
+                texts[language],
+                queries,
+                args.k
+            )
+
+        if images:
+            compare(
+                "image",
+                torch_image,
+                create_image_embedder(onnx_config.image_embedding_model, "cpu", onnx_config),
+                images,
+                ["a chart", "a table of numbers", "a photograph", "a diagram", "a logo"],
+                args.k
+            )
+
+
+if __name__ == "__main__":
+    main()
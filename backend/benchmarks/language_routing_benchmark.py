@@ -0,0 +1,105 @@
+"""
+Compare script-based language routing with per-chunk langdetect on the bundled PDFs.
+
+Run from the backend folder:
+
+    python -m benchmarks.language_routing_benchmark --repeat 5
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+from pathlib import Path
+
+src_path = Path(__file__).resolve().parents[1] / "src"
+if str(src_path) not in sys.path:
+    sys.path.insert(0, str(src_path))
+
+import fitz  # noqa: E402
+from langdetect import DetectorFactory, detect  # noqa: E402
+
+from smart_doc.retrieval.components import RAGConfig, create_splitters  # noqa: E402
+from smart_doc.retrieval.language import detect_text_languages  # noqa: E402
+
+
+PDF_FOLDER = Path(__file__).resolve().parents[1] / "pdfs"
+
+
+def load_page_chunks(pdf_paths, splitters):
+    """Child chunks grouped per page, as PDF ingestion routes them."""
+    pages = []
+    for path in pdf_paths:
+        with fitz.open(path) as pdf:
+            for page in pdf:
+                pages.append([
+                    child
+                    for parent in splitters.parent.split_text(page.get_text())
+                    for child in splitters.child.split_text(parent)
+                ])
+    return pages
+
+
+def langdetect_route(chunk):
+    try:
+        return "ar" if detect(chunk) == "ar" else "en"
+    except Exception:
+        return "en"
+
+
+def time_runs(repeat, route_pages):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        routes = route_pages()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, routes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pdf-folder", default=str(PDF_FOLDER))
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    pdf_paths = sorted(glob.glob(os.path.join(args.pdf_folder, "*.pdf")))
+    if not pdf_paths:
+        raise SystemExit(f"No PDFs found in {args.pdf_folder}")
+
+    pages = load_page_chunks(pdf_paths, create_splitters(RAGConfig()))
+    chunks = sum(len(page) for page in pages)
+    print(f"{len(pdf_paths)} PDFs, {len(pages)} pages, {chunks} chunks")
+
+    DetectorFactory.seed = 0
+    runs = {
+        "langdetect per chunk": lambda: [
+            langdetect_route(chunk) for page in pages for chunk in page
+        ],
+        "script ratio per page": lambda: [
+            route for page in pages
+            for route in detect_text_languages(page, fallback=False)
+        ],
+        "script ratio + fallback": lambda: [
+            route for page in pages
+            for route in detect_text_languages(page, fallback=True)
+        ],
+    }
+
+    baseline = None
+    for name, route_pages in runs.items():
+        elapsed, routes = time_runs(args.repeat, route_pages)
+        if baseline is None:
+            baseline = routes
+
+        agreement = sum(a == b for a, b in zip(routes, baseline)) / max(chunks, 1)
+        arabic = routes.count("ar")
+        print(
+            f"{name:<24} {elapsed * 1000:9.1f} ms  "
+            f"{chunks / elapsed:10.0f} chunks/s  "
+            f"{arabic:5d} Arabic  {agreement:6.1%} agree with langdetect"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Measure PDF ingestion throughput (pages per second) on the bundled PDFs.
+
+Run from the backend folder so the ./models paths resolve:
+
+    python -m benchmarks.pdf_ingestion_benchmark --batch-sizes 1 8
+"""
+import argparse
+import dataclasses
+import glob
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+src_path = Path(__file__).resolve().parents[1] / "src"
+if str(src_path) not in sys.path:
+    sys.path.insert(0, str(src_path))
+
+import chromadb  # noqa: E402
+import fitz  # noqa: E402
+
+from smart_doc.retrieval.components import RAGConfig  # noqa: E402
+from smart_doc.retrieval.rag_engine import RAGEngine  # noqa: E402
+
+
+PDF_FOLDER = Path(__file__).resolve().parents[1] / "pdfs"
+
+
+def count_pages(pdf_paths):
+    total = 0
+    for path in pdf_paths:
+        with fitz.open(path) as pdf:
+            total += pdf.page_count
+    return total
+
+
+def run(pdf_paths, config):
+    with tempfile.TemporaryDirectory() as workdir:
+        engine = RAGEngine(
+            chromadb.PersistentClient(path=os.path.join(workdir, "chroma_db")),
+            blob_storage_path=os.path.join(workdir, "blob_storage"),
+            documents_path=os.path.join(workdir, "documents"),
+            config=config,
+            registry_path=os.path.join(workdir, "document_registry.sqlite3"),
+            table_store_path=os.path.join(workdir, "spreadsheet_tables.sqlite3"),
+            embedding_cache_path=os.path.join(workdir, "embedding_cache")
+        )
+        # Load the detector up front so model start-up is not timed.
+        engine._ensure_yolo_model()
+
+        start = time.perf_counter()
+        for path in pdf_paths:
+            engine.add_file(path)
+        return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pdf-folder", default=str(PDF_FOLDER))
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--page-workers", type=int, default=RAGConfig.pdf_page_workers)
+    args = parser.parse_args()
+
+    pdf_paths = sorted(glob.glob(os.path.join(args.pdf_folder, "*.pdf")))
+    if not pdf_paths:
+        raise SystemExit(f"No PDFs found in {args.pdf_folder}")
+
+    pages = count_pages(pdf_paths)
+    print(f"{len(pdf_paths)} PDFs, {pages} pages")
+
+    for batch_size in args.batch_sizes:
+        config = dataclasses.replace(
+            RAGConfig(),
+            yolo_batch_size=batch_size,
+            pdf_page_workers=args.page_workers
+        )
+        elapsed = run(pdf_paths, config)
+        print(
+            f"yolo_batch_size={batch_size:<3} "
+            f"{elapsed:8.2f}s  {pages / elapsed:6.2f} pages/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
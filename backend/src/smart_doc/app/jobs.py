@@ -0,0 +1,217 @@
+import copy
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass
+
+
+# Finished jobs are kept this long so the frontend can still poll them.
+JOB_RETENTION_SECONDS = 60 * 60
+
+
+@dataclass
+class UploadedFile:
+    name: str
+    path: str
+    existed_before_upload: bool
+    file_hash: str | None = None
+    # Set when the upload was settled before ingestion: a failed save, or a
+    # reason to skip the file such as a name repeated in the same upload.
+    error: str | None = None
+    skip_reason: str | None = None
+
+
+class IngestionJobQueue:
+    """
+    Runs uploaded files through RAGEngine.add_file on a worker pool so the
+    upload request can return straight away with a job id to poll.
+
+    Jobs run on `workers` threads; the files of every job share a second pool
+    of `file_workers` threads, so the files of one upload are ingested
+    concurrently without the total running unbounded.
+
+    A finished job is "completed" when no file failed, "failed" when every
+    file did, and "completed_with_errors" otherwise.
+    """
+
+    def __init__(self, rag, workers: int = 2, file_workers: int = 4):
+        self._rag = rag
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers,
+            thread_name_prefix="ingestion"
+        )
+        self._file_executor = ThreadPoolExecutor(
+            max_workers=file_workers,
+            thread_name_prefix="ingestion-file"
+        )
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, files: list[UploadedFile]) -> str:
+        job_id = uuid.uuid4().hex
+        job = {
+            "id": job_id,
+            "status": "queued",
+            "created_at": time.time(),
+            "finished_at": None,
+            "files": [
+                {
+                    "file": file.name,
+                    "status": "queued",
+                    "stage": "queued",
+                    "pages_done": 0,
+                    "pages_total": None,
+                    "error": None,
+                    "reason": None,
+                }
+                for file in files
+            ],
+            "uploaded": [],
+            "skipped": [],
+            "failed": [],
+        }
+
+        with self._lock:
+            self._prune_finished_jobs()
+            self._jobs[job_id] = job
+
+        # Failed saves, repeated names and identical files in one upload are
+        # settled before any work starts; identical files are ingested once.
+        pending = []
+        seen_hashes = set()
+        for index, file in enumerate(files):
+            if file.error:
+                self._finish_file(
+                    job_id,
+                    index,
+                    "failed",
+                    {"file": file.name, "error": file.error},
+                    error=file.error
+                )
+                continue
+
+            if file.skip_reason:
+                self._finish_file(job_id, index, "skipped", file.name, reason=file.skip_reason)
+                continue
+
+            if file.file_hash and file.file_hash in seen_hashes:
+                self._discard_upload(file)
+                self._finish_file(job_id, index, "skipped", file.name, reason="duplicate_file")
+                continue
+
+            seen_hashes.add(file.file_hash)
+            pending.append((index, file))
+
+        self._executor.submit(self._run, job_id, pending)
+        return job_id
+
+    def get(self, job_id: str) -> dict | None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return copy.deepcopy(job) if job else None
+
+    def _run(self, job_id, files):
+        self._update_job(job_id, status="running")
+
+        # Caption all uploaded images in batches up front; each add_file
+        # below then finds its caption in the cache.
+        try:
+            self._rag.caption_files([file.path for _, file in files])
+        except Exception as e:
+            print(f"Batch captioning failed, images will be captioned one by one: {e}")
+
+        wait([
+            self._file_executor.submit(self._ingest_file, job_id, index, file)
+            for index, file in files
+        ])
+
+        with self._lock:
+            job = self._jobs[job_id]
+            if not job["failed"]:
+                job["status"] = "completed"
+            elif job["uploaded"] or job["skipped"]:
+                job["status"] = "completed_with_errors"
+            else:
+                job["status"] = "failed"
+            job["finished_at"] = time.time()
+
+    def _ingest_file(self, job_id, index, file):
+        self._update_file(job_id, index, status="running")
+
+        try:
+            result = self._rag.add_file(
+                file.path,
+                progress=self._file_progress(job_id, index),
+                file_hash=file.file_hash
+            )
+            print(f"File ingestion result for {file.name}: {result}")
+
+            if result.get("status") == "skipped":
+                self._discard_upload(file)
+                self._finish_file(
+                    job_id,
+                    index,
+                    "skipped",
+                    file.name,
+                    reason=result.get("reason")
+                )
+            else:
+                self._finish_file(job_id, index, "uploaded", file.name)
+
+        except Exception as e:
+            self._discard_upload(file)
+            print(f"Error uploading {file.name}: {e}")
+            self._finish_file(
+                job_id,
+                index,
+                "failed",
+                {"file": file.name, "error": str(e)},
+                error=str(e)
+            )
+
+    def _file_progress(self, job_id, index):
+        def progress(stage, done=None, total=None):
+            changes = {"stage": stage}
+            if done is not None:
+                changes["pages_done"] = done
+            if total is not None:
+                changes["pages_total"] = total
+            self._update_file(job_id, index, **changes)
+
+        return progress
+
+    def _finish_file(self, job_id, index, status, entry, error=None, reason=None):
+        with self._lock:
+            job = self._jobs[job_id]
+            job["files"][index].update(
+                status=status,
+                stage="done",
+                error=error,
+                reason=reason
+            )
+            job[status].append(entry)
+
+    def _update_file(self, job_id, index, **changes):
+        with self._lock:
+            self._jobs[job_id]["files"][index].update(changes)
+
+    def _update_job(self, job_id, **changes):
+        with self._lock:
+            self._jobs[job_id].update(changes)
+
+    def _prune_finished_jobs(self):
+        cutoff = time.time() - JOB_RETENTION_SECONDS
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job["finished_at"] and job["finished_at"] < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    @staticmethod
+    def _discard_upload(file):
+        # Only remove files this upload created; never an already stored document.
+        if not file.existed_before_upload and os.path.exists(file.path):
+            os.remove(file.path)
@@ -7,20 +7,29 @@ from fastapi.responses import HTMLResponse, FileResponse
 from fastapi.templating import Jinja2Templates
 
 from smart_doc.app import formatting
+from smart_doc.app.jobs import IngestionJobQueue
 from smart_doc.app.schemas import ChatRequest
 from smart_doc.app.settings import (
     BLOB_STORAGE_FOLDER,
     CHROMA_DB_FOLDER,
+    DOCUMENT_REGISTRY_PATH,
+    EMBEDDING_CACHE_FOLDER,
+    INGESTION_FILE_WORKERS,
+    INGESTION_WORKERS,
     OUTPUT_DIR,
     SLIDES_OUTPUT_PATH,
+    TABLE_STORE_PATH,
     UPLOAD_FOLDER,
+    WARM_UP_EMBEDDERS,
 )
+from smart_doc.app.uploads import save_uploaded_files
 from smart_doc.core.chat_memory import ChatMemory
 from smart_doc.features.question_answering.graph import QuestionAnsweringModule
 from smart_doc.features.slide_generation.graph import generate_slides
 from smart_doc.features.summarization.graph import SummarizationModule
 from smart_doc.features.visualization.rag_graph import VisualizationModule
 from smart_doc.features.visualization.state import DiagramType
+from smart_doc.retrieval.components import RAGConfig
 from smart_doc.retrieval.rag_engine import RAGEngine
 from smart_doc.utils.helper import safe_json_parse
 from smart_doc.utils.pptx import save_as_pptx
@@ -59,11 +68,20 @@ rag = RAGEngine(
     client,
     blob_storage_path=BLOB_STORAGE_FOLDER,
     documents_path=UPLOAD_FOLDER,
+    config=RAGConfig(warm_up_embedders=WARM_UP_EMBEDDERS),
+    registry_path=DOCUMENT_REGISTRY_PATH,
+    table_store_path=TABLE_STORE_PATH,
+    embedding_cache_path=EMBEDDING_CACHE_FOLDER,
 )
 qa_module = QuestionAnsweringModule(retriever=rag)
 summary_module = SummarizationModule(retriever=rag)
 visualization_module = VisualizationModule(retriever=rag)
 memory = ChatMemory()
+ingestion_jobs = IngestionJobQueue(
+    rag,
+    workers=INGESTION_WORKERS,
+    file_workers=INGESTION_FILE_WORKERS
+)
 
 print("System Ready.\n")
 
@@ -118,7 +136,10 @@ def build_summary_reply(result) -> str:
 
 @router.get("/documents")
 def list_documents():
-    return {"documents": rag.list_documents()}
+    return {
+        "documents": rag.list_documents(),
+        "unfinished": rag.unfinished_documents()
+    }
 
 
 @router.post("/send")
@@ -175,44 +196,30 @@ def receive_message(data: ChatRequest):
 
 @router.post("/upload")
 async def upload_files(files: List[UploadFile] = File(...)):
-    uploaded_files = []
-    skipped_files = []
-    failed_files = []
-
-    for file in files:
-        file_path = os.path.join(UPLOAD_FOLDER, file.filename)
-        file_existed = os.path.exists(file_path)
-
-        try:
-            with open(file_path, "wb") as f:
-                f.write(await file.read())
-
-            result = rag.add_file(file_path)
-            print(f"File ingestion result for {file.filename}: {result}")
-            if result.get("status") == "skipped":
-                if not file_existed and os.path.exists(file_path):
-                    os.remove(file_path)
-                skipped_files.append(file.filename)
-            else:
-                uploaded_files.append(file.filename)
-
-        except Exception as e:
-            if not file_existed and os.path.exists(file_path):
-                os.remove(file_path)
-            print(f"Error uploading {file.filename}: {e}")
-            failed_files.append(
-                {
-                    "file": file.filename,
-                    "error": str(e),
-                }
-            )
+    saved_files = await save_uploaded_files(files, UPLOAD_FOLDER)
+
+    # Ingestion runs on the job queue's workers; the client polls /jobs/{id}.
+    job_id = ingestion_jobs.submit(saved_files)
+    return ingestion_jobs.get(job_id)
 
+
+@router.get("/models")
+def model_stats():
     return {
-        "uploaded": uploaded_files,
-        "skipped": skipped_files,
-        "failed": failed_files,
+        "models": rag.model_stats(),
+        "embedding_cache": rag.embedding_cache_stats(),
+        "query_embedding_cache": rag.query_embedding_stats()
     }
 
+
+@router.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = ingestion_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Ingestion job not found.")
+    return job
+
+
 @router.get("/download-slides")
 async def download_slides():
     # Use the SLIDES_OUTPUT_PATH variable already imported in your file
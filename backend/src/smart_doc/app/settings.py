@@ -5,5 +5,13 @@ OUTPUT_DIR = "outputs"
 UPLOAD_FOLDER = os.path.join(DATA_DIR, "documents")
 BLOB_STORAGE_FOLDER = os.path.join(DATA_DIR, "blob_storage")
 CHROMA_DB_FOLDER = os.path.join(DATA_DIR, "chroma_db")
+DOCUMENT_REGISTRY_PATH = os.path.join(DATA_DIR, "document_registry.sqlite3")
+TABLE_STORE_PATH = os.path.join(DATA_DIR, "spreadsheet_tables.sqlite3")
+EMBEDDING_CACHE_FOLDER = os.path.join(DATA_DIR, "embedding_cache")
 SLIDES_OUTPUT_PATH = os.path.join(OUTPUT_DIR, "generated_slides.pptx")
+INGESTION_WORKERS = int(os.getenv("INGESTION_WORKERS", 2))
+# Files of one upload ingested at once, across all running jobs.
+INGESTION_FILE_WORKERS = int(os.getenv("INGESTION_FILE_WORKERS", 4))
 
+# Load the embedding models in the background at start-up rather than on first use.
+WARM_UP_EMBEDDERS = os.getenv("WARM_UP_EMBEDDERS", "0") == "1"
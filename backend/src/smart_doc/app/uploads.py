@@ -0,0 +1,72 @@
+import asyncio
+import os
+import uuid
+
+from smart_doc.app.jobs import UploadedFile
+from smart_doc.retrieval.file_utils import HASH_CHUNK_SIZE, new_file_hasher
+
+
+async def save_upload(file, file_path: str) -> str:
+    """
+    Stream an upload to disk in large chunks, hashing it in the same pass.
+    The file is written under a temporary name and moved into place once
+    complete, so a failed save never leaves a partial file behind or
+    truncates a stored document of the same name.
+    """
+    hasher = new_file_hasher()
+    partial_path = f"{file_path}.{uuid.uuid4().hex}.partial"
+
+    try:
+        with open(partial_path, "wb") as f:
+            while chunk := await file.read(HASH_CHUNK_SIZE):
+                hasher.update(chunk)
+                # Written off the event loop so concurrent saves overlap.
+                await asyncio.to_thread(f.write, chunk)
+        os.replace(partial_path, file_path)
+    except BaseException:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+
+    return hasher.hexdigest()
+
+
+async def save_uploaded_file(file, folder: str) -> UploadedFile:
+    """Save one upload into folder; a failed save is returned with its error."""
+    file_path = os.path.join(folder, file.filename)
+    file_existed = os.path.exists(file_path)
+
+    try:
+        file_hash = await save_upload(file, file_path)
+    except Exception as e:
+        print(f"Error saving {file.filename}: {e}")
+        return UploadedFile(file.filename, file_path, file_existed, error=str(e))
+
+    return UploadedFile(file.filename, file_path, file_existed, file_hash)
+
+
+async def save_uploaded_files(files, folder: str) -> list[UploadedFile]:
+    """
+    Save the files of one upload concurrently, in the order given. Files
+    sharing a name would be written to the same path: only the first is
+    saved and the others are returned as skipped duplicates.
+    """
+    unique = {}
+    for file in files:
+        unique.setdefault(file.filename, file)
+
+    saved = await asyncio.gather(*(
+        save_uploaded_file(file, folder) for file in unique.values()
+    ))
+    saved = dict(zip(unique, saved))
+
+    return [
+        saved[file.filename] if unique[file.filename] is file
+        else UploadedFile(
+            file.filename,
+            saved[file.filename].path,
+            existed_before_upload=True,
+            skip_reason="duplicate_name"
+        )
+        for file in files
+    ]
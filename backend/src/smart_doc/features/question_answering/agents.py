@@ -2,6 +2,7 @@ from smart_doc.features.question_answering.agents.critical_agent import critical
 from smart_doc.features.question_answering.agents.general_agent import general_agent
 from smart_doc.features.question_answering.agents.image_agent import image_agent
 from smart_doc.features.question_answering.agents.qa_agent import qa_agent
+from smart_doc.features.question_answering.agents.table_agent import table_agent
 from smart_doc.features.question_answering.agents.text_agent import text_agent
 
 __all__ = [
@@ -9,6 +10,7 @@ __all__ = [
     "general_agent",
     "image_agent",
     "qa_agent",
+    "table_agent",
     "text_agent",
 ]
 
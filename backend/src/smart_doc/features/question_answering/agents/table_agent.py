@@ -0,0 +1,75 @@
+from langchain.messages import SystemMessage, HumanMessage, AIMessage
+from smart_doc.core.models import text_model as model
+import smart_doc.features.question_answering.prompts as qprompts
+from smart_doc.retrieval.file_utils import SPREADSHEET_EXTENSIONS
+from smart_doc.utils.helper import safe_json_parse
+import json
+import os
+import re
+
+
+# Words that suggest a question needs arithmetic over rows, in English and Arabic.
+NUMERIC_QUESTION_PATTERN = re.compile(
+    r"\b(how many|how much|total|sum|average|median|count|number of|"
+    r"max(imum)?|min(imum)?|highest|lowest|largest|smallest|"
+    r"percent(age)?|ratio|top \d+|"
+    r"مجموع|إجمالي|اجمالي|متوسط|عدد|كم|أعلى|اعلى|أقل|اقل|أكبر|اكبر|أصغر|اصغر|نسبة)\b",
+    re.IGNORECASE
+)
+
+
+def is_table_question(question: str, document: str | None) -> bool:
+    """
+    Cheap gate in front of the SQL agent: a spreadsheet was selected, or the
+    question asks for a number across all documents.
+    """
+    if document and document != "all":
+        return os.path.splitext(document)[1].lower() in SPREADSHEET_EXTENSIONS
+    return bool(NUMERIC_QUESTION_PATTERN.search(question or ""))
+
+
+def table_agent(state: dict, retriever=None, model=model):
+    """
+    Answers the numeric part of a question with one SQL query over the
+    spreadsheet tables, and adds the result to the text evidence.
+    """
+    if retriever is None:
+        return {"llm_calls": 0}
+
+    # Most questions are not about spreadsheets; they skip the extra LLM call.
+    if not is_table_question(state.get("user_question", ""), state.get("document")):
+        return {"llm_calls": 0}
+
+    tables = retriever.describe_tables(state.get("document"))
+    if not tables:
+        return {"llm_calls": 0}
+
+    content = f"""
+        Question: {state.get('user_question', '')}
+        Tables: {json.dumps(tables, ensure_ascii=False)}
+    """
+
+    agent_answer: AIMessage = model.invoke([
+        SystemMessage(content=qprompts.QA_TABLE_SYSTEM_PROMPT),
+        HumanMessage(content=content)
+    ])
+
+    sql = safe_json_parse(agent_answer.content, {}).get("sql")
+    if not sql:
+        return {"llm_calls": 1}
+
+    try:
+        result = retriever.query_tables(sql)
+    except Exception as e:
+        print(f"Table query failed: {e}")
+        return {"llm_calls": 1}
+
+    evidence = (
+        f"Computed over the full spreadsheet table with SQL `{sql}`: "
+        f"{json.dumps(result, ensure_ascii=False, default=str)}"
+    )
+    return {
+        "llm_calls": 1,
+        "table_results": [{"sql": sql, **result}],
+        "retrieved_text_chunks": [evidence] + list(state.get("retrieved_text_chunks", []))
+    }
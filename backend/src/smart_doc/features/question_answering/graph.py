@@ -9,6 +9,7 @@ from smart_doc.features.question_answering.agents.image_agent import image_agent
 from smart_doc.features.question_answering.agents.critical_agent import critical_agent
 from smart_doc.features.question_answering.agents.qa_agent import qa_agent
 from smart_doc.features.question_answering.agents.qa_complexity_agent import qa_complexity_evaluator_agent
+from smart_doc.features.question_answering.agents.table_agent import table_agent
 
 class QAState(TypedDict):
     llm_calls: Annotated[int, operator.add]
@@ -17,6 +18,7 @@ class QAState(TypedDict):
     document: str
     retrieved_text_chunks: list
     retrieved_images: list
+    table_results: list
     text_answer: str
     image_answer: str
     cross_modal_analysis: dict
@@ -38,9 +40,12 @@ class QuestionAnsweringModule:
         
         # Add the complexity node with the retriever passed in
         g.add_node("complexity", partial(qa_complexity_evaluator_agent, retriever=self.retriever))
+        # Spreadsheet questions get SQL over the full tables before the text agents run
+        g.add_node("table", partial(table_agent, retriever=self.retriever))
 
         # 🔧 FIX: Linearized the execution edges to prevent overlapping steps
-        g.add_edge(START, "general")
+        g.add_edge(START, "table")
+        g.add_edge("table", "general")
         g.add_edge("general", "text")
         g.add_edge("text", "image")  
         g.add_edge("image", "critical")
@@ -60,6 +65,7 @@ class QuestionAnsweringModule:
             "document": document, 
             "retrieved_text_chunks": retrieved.get("text", []),
             "retrieved_images": retrieved.get("images", []),
+            "table_results": [],
             "text_answer": "",
             "image_answer": "",
             "cross_modal_analysis": {},
@@ -70,7 +70,14 @@ class SummarizationModule:
         if len(question.split()) <= 5 and any(w in question.lower() for w in ["summary", "brief", "detail"]):
             search_query = "abstract introduction main contribution methodology conclusion"
 
-        retrieved = self.retriever.query(search_query, k_text=6, k_image=4, document=document)
+        # The image branch works from captions, so no images are encoded.
+        retrieved = self.retriever.query(
+            search_query,
+            k_text=6,
+            k_image=4,
+            document=document,
+            include_encoded_images=False
+        )
 
         text = " ".join(retrieved.get("text", []))
         doc_tokens = max(1, len(text) // 4)
@@ -0,0 +1,304 @@
+"""
+Bulk-ingest every supported document under a directory.
+
+Files are indexed on a pool of worker processes, each with its own models
+and an in-memory Chroma client. Their records come back with embeddings and
+a single writer in this process stores them, so the persistent database has
+one writer. Progress is appended to a checkpoint file, and a rerun skips what
+an earlier run finished.
+
+    python -m smart_doc.ingest path/to/files --workers 4
+"""
+import argparse
+import dataclasses
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing.util import Finalize
+
+import chromadb
+
+from smart_doc.app.settings import (
+    BLOB_STORAGE_FOLDER,
+    CHROMA_DB_FOLDER,
+    DATA_DIR,
+    DOCUMENT_REGISTRY_PATH,
+    EMBEDDING_CACHE_FOLDER,
+    TABLE_STORE_PATH,
+    UPLOAD_FOLDER,
+)
+from smart_doc.retrieval.components import RAGConfig
+from smart_doc.retrieval.document_registry import INDEXED, DocumentRegistry
+from smart_doc.retrieval.file_utils import (
+    SUPPORTED_DOCUMENT_EXTENSIONS,
+    compute_file_hash,
+)
+from smart_doc.retrieval.rag_engine import RAGEngine
+
+
+CHECKPOINT_PATH = os.path.join(DATA_DIR, "ingest_checkpoint.jsonl")
+
+_worker_rag = None
+
+
+def discover_files(root):
+    paths = []
+    for directory, _, filenames in os.walk(root):
+        for filename in filenames:
+            if os.path.splitext(filename)[1].lower() in SUPPORTED_DOCUMENT_EXTENSIONS:
+                paths.append(os.path.join(directory, filename))
+    return sorted(paths)
+
+
+def load_checkpoint(path):
+    """Last recorded outcome per file path."""
+    done = {}
+    if not os.path.exists(path):
+        return done
+
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # A run killed mid-write leaves a partial last line.
+                continue
+            done[entry["path"]] = entry
+    return done
+
+
+def is_finished(entry, path):
+    if entry is None or entry["status"] == "failed":
+        return False
+
+    stat = os.stat(path)
+    return entry.get("size") == stat.st_size and entry.get("mtime") == stat.st_mtime
+
+
+def _init_worker(paths, config):
+    global _worker_rag
+
+    # Each worker keeps its in-progress records in memory and its own
+    # registry; figures, stored copies, spreadsheet tables and cached
+    # embeddings go straight to the shared folders.
+    workdir = tempfile.mkdtemp(prefix="smart_doc_ingest_")
+    Finalize(None, shutil.rmtree, args=(workdir, True), exitpriority=0)
+
+    _worker_rag = RAGEngine(
+        chromadb.EphemeralClient(),
+        blob_storage_path=paths["blob_storage"],
+        documents_path=paths["documents"],
+        config=config,
+        registry_path=os.path.join(workdir, "document_registry.sqlite3"),
+        table_store_path=paths["table_store"],
+        shared_blob_storage=True,
+        embedding_cache_path=paths["embedding_cache"]
+    )
+
+
+def _ingest_in_worker(path, file_hash):
+    start = time.perf_counter()
+    result = _worker_rag.add_file(path, file_hash=file_hash)
+
+    export = None
+    if result.get("status") == "indexed":
+        _worker_rag.wait_for_captions()
+        export = _worker_rag.export_file(file_hash, drop=True)
+
+    return {**result, "export": export, "seconds": time.perf_counter() - start}
+
+
+class _Checkpoint:
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def record(self, path, status, file_hash=None, error=None):
+        stat = os.stat(path)
+        self._file.write(json.dumps({
+            "path": path,
+            "status": status,
+            "file_hash": file_hash,
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "error": error,
+        }) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def ingest_directory(
+    root,
+    workers=2,
+    checkpoint_path=CHECKPOINT_PATH,
+    config=None,
+    paths=None
+):
+    paths = paths or {
+        "chroma": CHROMA_DB_FOLDER,
+        "blob_storage": BLOB_STORAGE_FOLDER,
+        "documents": UPLOAD_FOLDER,
+        "registry": DOCUMENT_REGISTRY_PATH,
+        "table_store": TABLE_STORE_PATH,
+        "embedding_cache": EMBEDDING_CACHE_FOLDER,
+    }
+    # Workers are processes already; rendering PDF pages inline avoids
+    # nesting a second pool inside each of them.
+    config = dataclasses.replace(config or RAGConfig(), pdf_page_workers=1)
+
+    files = discover_files(root)
+    finished = load_checkpoint(checkpoint_path)
+    registry = DocumentRegistry(paths["registry"])
+    checkpoint = _Checkpoint(checkpoint_path)
+    counts = {"indexed": 0, "skipped": 0, "failed": 0}
+    failures = []
+    seen_hashes = set()
+    tasks = []
+
+    # Documents are keyed by file name, so a second file with the same name
+    # in another folder would replace the first. The first path in sorted
+    # order, or the one an earlier run indexed, keeps the name.
+    names = {
+        os.path.basename(path): path
+        for path, entry in finished.items()
+        if entry["status"] == "indexed"
+    }
+
+    for path in files:
+        name = os.path.basename(path)
+        owner = names.setdefault(name, path)
+        if owner != path:
+            error = f"Another file named {name} is already ingested from {owner}"
+            print(f"WARNING: skipping {path}: {error}")
+            checkpoint.record(path, "failed", error=error)
+            counts["failed"] += 1
+            failures.append((path, error))
+            continue
+
+        if is_finished(finished.get(path), path):
+            counts["skipped"] += 1
+            continue
+
+        file_hash = compute_file_hash(path)
+        record = registry.get(file_hash)
+        if file_hash in seen_hashes or (record is not None and record["status"] == INDEXED):
+            counts["skipped"] += 1
+            checkpoint.record(path, "skipped", file_hash)
+            continue
+
+        seen_hashes.add(file_hash)
+        tasks.append((path, file_hash))
+
+    total_bytes = sum(os.path.getsize(path) for path, _ in tasks)
+    print(
+        f"{len(files)} supported files, {len(tasks)} to ingest "
+        f"({total_bytes / 1e6:.1f} MB), {counts['skipped']} already done; "
+        f"{workers} workers"
+    )
+    if not tasks:
+        checkpoint.close()
+        return counts
+
+    # The writer's engine only upserts precomputed embeddings.
+    rag = RAGEngine(
+        chromadb.PersistentClient(path=paths["chroma"]),
+        blob_storage_path=paths["blob_storage"],
+        documents_path=paths["documents"],
+        config=config,
+        registry_path=paths["registry"],
+        table_store_path=paths["table_store"],
+        embedding_cache_path=paths["embedding_cache"]
+    )
+
+    start = time.perf_counter()
+    completed = 0
+    pending = iter(tasks)
+    in_flight = {}
+
+    executor = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(paths, config)
+    )
+    try:
+        while True:
+            # A few tasks per worker: enough to keep them busy without
+            # holding many files' exported embeddings at once.
+            while len(in_flight) < workers * 2:
+                task = next(pending, None)
+                if task is None:
+                    break
+                in_flight[executor.submit(_ingest_in_worker, *task)] = task
+
+            if not in_flight:
+                break
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                path, file_hash = in_flight.pop(future)
+                completed += 1
+
+                try:
+                    result = future.result()
+                    status = result["status"]
+                    if result["export"] is not None:
+                        status = rag.import_file(result["export"])["status"]
+                    checkpoint.record(path, status, file_hash)
+                    counts[status] += 1
+                    detail = f"{result['seconds']:.1f}s"
+                except Exception as e:
+                    checkpoint.record(path, "failed", file_hash, error=str(e))
+                    counts["failed"] += 1
+                    failures.append((path, str(e)))
+                    status, detail = "failed", str(e)
+
+                elapsed = time.perf_counter() - start
+                print(
+                    f"[{completed}/{len(tasks)}] {status:<7} {path} ({detail}) "
+                    f"- {completed / elapsed:.2f} files/s"
+                )
+    finally:
+        executor.shutdown(cancel_futures=True)
+        checkpoint.close()
+
+    elapsed = time.perf_counter() - start
+    print(
+        f"Done in {elapsed:.1f}s: {counts['indexed']} indexed, "
+        f"{counts['skipped']} skipped, {counts['failed']} failed; "
+        f"{len(tasks) / elapsed:.2f} files/s, {total_bytes / 1e6 / elapsed:.2f} MB/s"
+    )
+    for path, error in failures:
+        print(f"FAILED {path}: {error}")
+
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("directory")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH)
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.directory):
+        raise SystemExit(f"Not a directory: {args.directory}")
+
+    counts = ingest_directory(
+        args.directory,
+        workers=args.workers,
+        checkpoint_path=args.checkpoint
+    )
+    raise SystemExit(1 if counts["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+from PIL import Image, ImageChops
+
+
+PHASH_BITS = 64
+# A perceptual-hash match is only a candidate: the stored figure must also
+# have the same size and differ from the new one by at most this mean
+# grey-level difference (0-255) ...
+NEAR_DUPLICATE_MAX_MEAN_DIFF = 2.0
+# ... with at most this share of pixels differing clearly, so two tables or
+# charts with the same layout but different numbers stay apart.
+NEAR_DUPLICATE_MAX_CHANGED_PIXELS = 0.0005
+NEAR_DUPLICATE_CHANGED_LEVEL = 32
+
+
+class BlobStore:
+    """
+    Content-addressed store for figure images. A blob is keyed by a hash of
+    its pixels. A perceptual hash also lets visually identical figures (the
+    same logo re-encoded, a watermark on every page) share one blob, once a
+    pixel comparison confirms the match; near_duplicate_distance=0 turns
+    this off and only shares identical pixels.
+
+    Every put counts a reference to the blob it returns and every release
+    drops one, in the same index transaction as the lookup, so a blob is
+    only deleted once nothing uses it, even while another ingestion is
+    reusing it.
+    """
+
+    def __init__(self, root: str, near_duplicate_distance: int = 4):
+        self.__root = root
+        os.makedirs(self.__root, exist_ok=True)
+
+        self.__index_path = os.path.join(root, "blob_index.sqlite3")
+        self.__near_duplicate_distance = near_duplicate_distance
+        self.__lock = threading.Lock()
+
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS blobs (
+                    blob_id TEXT PRIMARY KEY,
+                    path TEXT NOT NULL,
+                    phash TEXT NOT NULL,
+                    refs INTEGER
+                )
+                """
+            )
+            # Indexes written before reference counting lack the refs column;
+            # their blobs stay uncounted until set_references is called.
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(blobs)")}
+            if "refs" not in columns:
+                conn.execute("ALTER TABLE blobs ADD COLUMN refs INTEGER")
+            rows = conn.execute("SELECT blob_id, path, phash FROM blobs").fetchall()
+
+        # Perceptual hashes are split into bands: two hashes within the
+        # near-duplicate distance must agree exactly on at least one band,
+        # so candidates come from dict lookups instead of a full scan.
+        self.__paths = {}
+        self.__phashes = {}
+        self.__bands = {}
+        for blob_id, path, phash in rows:
+            self._remember(blob_id, path, int(phash, 16))
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.__index_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def put(self, image: Image.Image, data: bytes | None = None, ext: str = "png"):
+        """
+        Store a figure unless it, or a near-duplicate, is already stored, and
+        count one reference to the blob returned.
+
+        data, when given, is written as-is instead of PNG-encoding the image.
+        Returns (blob_id, path, is_new).
+        """
+        blob_id = content_hash(image)
+        phash = perceptual_hash(image)
+
+        with self.__lock, self._connect() as conn:
+            # Taking the write lock first makes the lookup and the new
+            # reference one step for every process sharing the folder.
+            conn.execute("BEGIN IMMEDIATE")
+            if self._add_reference(conn, blob_id):
+                return blob_id, self.__paths[blob_id], False
+
+            if self.__near_duplicate_distance > 0:
+                near_id = self._find_near_duplicate(phash, image)
+                if near_id and self._add_reference(conn, near_id):
+                    return near_id, self.__paths[near_id], False
+
+            path = os.path.abspath(os.path.join(self.__root, f"{blob_id}.{ext}"))
+            if data is not None:
+                with open(path, "wb") as f:
+                    f.write(data)
+            else:
+                image.save(path, "PNG")
+
+            conn.execute(
+                "INSERT OR REPLACE INTO blobs (blob_id, path, phash, refs) VALUES (?, ?, ?, 1)",
+                (blob_id, path, f"{phash:016x}")
+            )
+            self._remember(blob_id, path, phash)
+
+        return blob_id, path, True
+
+    def release(self, blob_id: str):
+        """Drop one reference to a blob, deleting it once none are left."""
+        with self.__lock, self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT path, refs FROM blobs WHERE blob_id = ?",
+                (blob_id,)
+            ).fetchone()
+            if row is None:
+                self._forget(blob_id)
+                return
+
+            path, refs = row
+            if refs is not None and refs > 1:
+                conn.execute(
+                    "UPDATE blobs SET refs = refs - 1 WHERE blob_id = ?",
+                    (blob_id,)
+                )
+                return
+
+            conn.execute("DELETE FROM blobs WHERE blob_id = ?", (blob_id,))
+            self._forget(blob_id)
+            # Removed before the transaction commits, so no other process
+            # can take a new reference to the file in between.
+            if os.path.exists(path):
+                os.remove(path)
+
+    def uncounted(self) -> bool:
+        """Whether some blobs predate reference counting."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT 1 FROM blobs WHERE refs IS NULL LIMIT 1").fetchone()
+        return row is not None
+
+    def set_references(self, counts: dict):
+        """Reference counts of the blobs stored before counting started."""
+        with self.__lock, self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            blob_ids = [
+                row[0] for row in conn.execute("SELECT blob_id FROM blobs WHERE refs IS NULL")
+            ]
+            conn.executemany(
+                "UPDATE blobs SET refs = ? WHERE blob_id = ?",
+                [(counts.get(blob_id, 0), blob_id) for blob_id in blob_ids]
+            )
+
+    def _add_reference(self, conn, blob_id):
+        if blob_id not in self.__paths:
+            # Stored by another process since this one loaded the index.
+            row = conn.execute(
+                "SELECT path, phash FROM blobs WHERE blob_id = ?",
+                (blob_id,)
+            ).fetchone()
+            if row is None:
+                return False
+            self._remember(blob_id, row[0], int(row[1], 16))
+
+        updated = conn.execute(
+            "UPDATE blobs SET refs = COALESCE(refs, 0) + 1 WHERE blob_id = ?",
+            (blob_id,)
+        ).rowcount
+        if not updated:
+            # Released by another process since this one loaded the index.
+            self._forget(blob_id)
+        return bool(updated)
+
+    def _forget(self, blob_id):
+        self.__paths.pop(blob_id, None)
+        phash = self.__phashes.pop(blob_id, None)
+        if phash is not None:
+            for band in self._band_keys(phash):
+                self.__bands.get(band, set()).discard(blob_id)
+
+    def _remember(self, blob_id, path, phash):
+        self.__paths[blob_id] = path
+        self.__phashes[blob_id] = phash
+        for band in self._band_keys(phash):
+            self.__bands.setdefault(band, set()).add(blob_id)
+
+    def _find_near_duplicate(self, phash, image):
+        candidates = set()
+        for band in self._band_keys(phash):
+            candidates |= self.__bands.get(band, set())
+
+        by_distance = sorted(
+            ((self.__phashes[blob_id] ^ phash).bit_count(), blob_id)
+            for blob_id in candidates
+        )
+        for distance, blob_id in by_distance:
+            if distance > self.__near_duplicate_distance:
+                break
+            if _same_pixels(image, self.__paths[blob_id]):
+                return blob_id
+
+        return None
+
+    def _band_keys(self, phash):
+        band_count = self.__near_duplicate_distance + 1
+        band_width = PHASH_BITS // band_count
+        keys = []
+
+        for band in range(band_count):
+            start = band * band_width
+            width = PHASH_BITS - start if band == band_count - 1 else band_width
+            keys.append((band, (phash >> start) & ((1 << width) - 1)))
+
+        return keys
+
+
+def content_hash(image: Image.Image) -> str:
+    hasher = hashlib.sha256(f"{image.mode}:{image.size}".encode("ascii"))
+    hasher.update(image.tobytes())
+    return hasher.hexdigest()
+
+
+def _same_pixels(image: Image.Image, path: str) -> bool:
+    try:
+        with Image.open(path) as stored:
+            if stored.size != image.size:
+                return False
+            histogram = ImageChops.difference(
+                image.convert("L"),
+                stored.convert("L")
+            ).histogram()
+    except OSError:
+        return False
+
+    pixels = image.size[0] * image.size[1]
+    mean_diff = sum(level * count for level, count in enumerate(histogram)) / pixels
+    changed = sum(histogram[NEAR_DUPLICATE_CHANGED_LEVEL:]) / pixels
+    return (
+        mean_diff <= NEAR_DUPLICATE_MAX_MEAN_DIFF
+        and changed <= NEAR_DUPLICATE_MAX_CHANGED_PIXELS
+    )
+
+
+def perceptual_hash(image: Image.Image) -> int:
+    """64-bit difference hash: stable across re-encoding and small rescales."""
+    pixels = np.asarray(
+        image.convert("L").resize((9, 8), Image.Resampling.LANCZOS),
+        dtype=np.int16
+    )
+    phash = 0
+
+    for bit in (pixels[:, :-1] > pixels[:, 1:]).ravel():
+        phash = (phash << 1) | int(bit)
+
+    return phash
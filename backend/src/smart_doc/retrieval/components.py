@@ -1,3 +1,6 @@
+import os
+import threading
+import time
 from dataclasses import dataclass, field
 
 import chromadb
@@ -5,9 +8,17 @@ import torch
 from chromadb.utils import embedding_functions
 from chromadb.utils.data_loaders import ImageLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
+from PIL import Image
 from transformers import BlipForConditionalGeneration, BlipProcessor
 from ultralytics import YOLO
 
+from smart_doc.retrieval.embedding_service import EmbeddingService
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
 
 @dataclass(frozen=True)
 class RAGConfig:
@@ -16,10 +27,59 @@ class RAGConfig:
     image_embedding_model: str = "ViT-B-32"
     yolo_model_path: str = "./models/yolo11n_doc_layout.pt"
     caption_model_path: str = "./models/blip-image-captioning-base"
+    # Images per BLIP generate call.
+    caption_batch_size: int = 8
+    # Caption PDF figures on a low-priority thread after their text is indexed.
+    background_captioning: bool = True
     parent_chunk_size: int = 1500
     parent_chunk_overlap: int = 200
     child_chunk_size: int = 400
     child_chunk_overlap: int = 50
+    # Spreadsheet rows per chunk, each chunk led by its sheet's header row.
+    # Chunks are embedded whole, so they are also capped at child_chunk_size
+    # characters to stay within the embedders' sequence length.
+    spreadsheet_rows_per_chunk: int = 20
+    # Text chunks buffered before one text-collection add.
+    text_write_batch_size: int = 256
+    # Worker processes that render PDF pages ahead of layout detection.
+    # 1 keeps rendering inline on the calling thread.
+    pdf_page_workers: int = 4
+    # Rendered pages per YOLO call; batching amortises per-call overhead.
+    yolo_batch_size: int = 8
+    # Figure crops buffered per document before one image-collection add.
+    image_write_batch_size: int = 32
+    # Pages with no images or drawings skip rendering and detection once text
+    # blocks cover at least this fraction of the page.
+    text_only_min_coverage: float = 0.2
+    # Figures whose 64-bit perceptual hashes differ in at most this many bits,
+    # and whose pixels match on comparison, share one stored blob. 0 only
+    # shares blobs between figures with identical pixels.
+    near_duplicate_distance: int = 4
+    # Text is routed to the Arabic or English collection by script; mixed
+    # script text is settled by langdetect when this is set and it is installed.
+    language_detection_fallback: bool = True
+    # Reuse text embeddings stored on disk for chunks seen before. A model's
+    # cache is started afresh once it holds this many vectors (about 750 MB
+    # at 384 dimensions).
+    embedding_cache: bool = True
+    embedding_cache_max_entries: int = 1_000_000
+    # Embedding requests from concurrent ingestions are coalesced into
+    # batches of up to this many inputs, waiting at most this long for more.
+    embedding_batch_size: int = 64
+    embedding_max_wait_ms: float = 5
+    # Prompt vectors kept per model for repeated retrievals.
+    query_embedding_cache_size: int = 256
+    # Load the embedding models on a background thread at start-up instead of
+    # on their first use.
+    warm_up_embedders: bool = False
+    # "torch" runs the embedders in PyTorch; "onnx" runs int8-quantised ONNX
+    # exports of the same models through onnxruntime on the CPU. Both report
+    # the same embedding function, so existing collections stay usable.
+    embedding_backend: str = "torch"
+    # ONNX exports are written here on first use and reused afterwards.
+    onnx_model_dir: str = "./models/onnx"
+    # onnxruntime intra-op threads per model; 0 uses every physical core.
+    onnx_threads: int = 0
     ignored_layout_classes: set[str] = field(default_factory=lambda: {
         "Text",
         "Title",
@@ -30,11 +90,157 @@ class RAGConfig:
     })
 
 
+class BatchedOpenCLIPEmbeddingFunction(embedding_functions.OpenCLIPEmbeddingFunction):
+    """
+    OpenCLIP embedder that encodes a list of images in one forward pass.
+    Accepts PIL images as well as the arrays Chroma's data loader produces.
+    """
+
+    def __call__(self, input):
+        # Text queries keep the stock per-item path.
+        if not input or any(isinstance(item, str) for item in input):
+            return super().__call__(input)
+
+        device = next(self._model.parameters()).device
+        batch = torch.stack([
+            self._preprocess(
+                image if isinstance(image, Image.Image) else Image.fromarray(image)
+            )
+            for image in input
+        ]).to(device)
+
+        with torch.no_grad():
+            features = self._model.encode_image(batch)
+            features /= features.norm(dim=-1, keepdim=True)
+
+        return list(features.cpu().numpy())
+
+
+class LazyEmbeddingFunction(embedding_functions.EmbeddingFunction):
+    """
+    Stands in for an embedding function and builds it on first use, so a
+    worker only loads the models its requests actually need.
+
+    Chroma reads the name and config when a collection is opened; they are
+    given up front so opening never loads the model. With an embedding cache,
+    texts embedded before under cache_key are served from it. Everything else
+    goes through one batching service per model.
+    """
+
+    def __init__(
+        self,
+        label,
+        factory,
+        name,
+        config,
+        cache=None,
+        cache_key=None,
+        batch_size=64,
+        max_wait_ms=5
+    ):
+        self.label = label
+        self._factory = factory
+        self._name = name
+        self._config = config
+        self.cache = cache
+        self.cache_key = cache_key
+        self.service = EmbeddingService(
+            lambda inputs: self.load()(inputs),
+            max_batch_size=batch_size,
+            max_wait_ms=max_wait_ms,
+            name=f"{label}-embedding"
+        )
+        self._instance = None
+        self._lock = threading.Lock()
+        self.load_seconds = None
+        self.resident_mb = None
+
+    def __call__(self, input):
+        if self.cache is not None and input and all(isinstance(item, str) for item in input):
+            return self.cache.embed(input, self.cache_key, self.service)
+        return self.service(input)
+
+    def embed_query(self, input):
+        instance = self.load()
+        if hasattr(instance, "embed_query"):
+            return instance.embed_query(input)
+        return instance(input)
+
+    def load(self):
+        with self._lock:
+            if self._instance is None:
+                start = time.perf_counter()
+                rss_before = resident_memory_mb()
+                self._instance = self._factory()
+                self.load_seconds = time.perf_counter() - start
+                # Approximate when other models load at the same time.
+                rss_after = resident_memory_mb()
+                if rss_before is not None and rss_after is not None:
+                    self.resident_mb = rss_after - rss_before
+                memory = (
+                    f" (+{self.resident_mb:.0f} MB resident)"
+                    if self.resident_mb is not None else ""
+                )
+                print(f"Loaded {self.label} embedder in {self.load_seconds:.2f}s{memory}")
+            return self._instance
+
+    @property
+    def loaded(self):
+        return self._instance is not None
+
+    def name(self):
+        return self._name
+
+    def get_config(self):
+        return self._config
+
+    def is_legacy(self):
+        return False
+
+    def default_space(self):
+        return "cosine"
+
+    def supported_spaces(self):
+        return ["cosine", "l2", "ip"]
+
+
+def resident_memory_mb() -> float | None:
+    """Current resident memory of this process, or None where it cannot be read."""
+    try:
+        if psutil is not None:
+            return psutil.Process().memory_info().rss / (1024 * 1024)
+
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except Exception:
+        # A missing metric must never stop a model from loading.
+        return None
+
+
 @dataclass
 class RAGCollections:
     arabic_text: chromadb.Collection
     english_text: chromadb.Collection
     images: chromadb.Collection
+    image_embedder: LazyEmbeddingFunction
+    text_embedders: dict[str, LazyEmbeddingFunction] = field(default_factory=dict)
+
+    def embedders(self):
+        return [*self.text_embedders.values(), self.image_embedder]
+
+    def warm_up(self):
+        """Load every embedder on a background thread, one after another."""
+        def load_all():
+            for embedder in self.embedders():
+                try:
+                    embedder.load()
+                except Exception as e:
+                    print(f"Warm-up of the {embedder.label} embedder failed: {e}")
+
+        thread = threading.Thread(target=load_all, name="embedder-warm-up", daemon=True)
+        thread.start()
+        return thread
 
 
 @dataclass
@@ -47,20 +253,84 @@ def get_torch_device() -> str:
     return "cuda" if torch.cuda.is_available() else "cpu"
 
 
+def create_text_embedder(model_name: str, config: RAGConfig):
+    if config.embedding_backend == "onnx":
+        from smart_doc.retrieval.onnx_embedding import OnnxSentenceEmbeddingFunction
+
+        return OnnxSentenceEmbeddingFunction(
+            model_name,
+            config.onnx_model_dir,
+            threads=config.onnx_threads
+        )
+
+    return embedding_functions.SentenceTransformerEmbeddingFunction(model_name=model_name)
+
+
+def create_image_embedder(model_name: str, device: str, config: RAGConfig):
+    if config.embedding_backend == "onnx":
+        from smart_doc.retrieval.onnx_embedding import OnnxOpenCLIPEmbeddingFunction
+
+        return OnnxOpenCLIPEmbeddingFunction(
+            model_name,
+            config.onnx_model_dir,
+            threads=config.onnx_threads
+        )
+
+    return BatchedOpenCLIPEmbeddingFunction(model_name=model_name, device=device)
+
+
 def create_collections(
     chroma_client: chromadb.ClientAPI,
     device: str,
-    config: RAGConfig
+    config: RAGConfig,
+    embedding_cache=None
 ) -> RAGCollections:
-    english_embedder = embedding_functions.SentenceTransformerEmbeddingFunction(
-        model_name=config.english_embedding_model
+    if config.embedding_backend not in ("torch", "onnx"):
+        raise ValueError(f"Unknown embedding backend: {config.embedding_backend}")
+
+    # Configs mirror what the PyTorch functions report, so collections
+    # created before the proxies keep validating.
+    english_embedder = LazyEmbeddingFunction(
+        "english",
+        lambda: create_text_embedder(config.english_embedding_model, config),
+        "sentence_transformer",
+        {
+            "model_name": config.english_embedding_model,
+            "device": "cpu",
+            "normalize_embeddings": False,
+            "kwargs": {}
+        },
+        cache=embedding_cache,
+        cache_key=f"{config.english_embedding_model}|{config.embedding_backend}",
+        batch_size=config.embedding_batch_size,
+        max_wait_ms=config.embedding_max_wait_ms
     )
-    arabic_embedder = embedding_functions.SentenceTransformerEmbeddingFunction(
-        model_name=config.arabic_embedding_model
+    arabic_embedder = LazyEmbeddingFunction(
+        "arabic",
+        lambda: create_text_embedder(config.arabic_embedding_model, config),
+        "sentence_transformer",
+        {
+            "model_name": config.arabic_embedding_model,
+            "device": "cpu",
+            "normalize_embeddings": False,
+            "kwargs": {}
+        },
+        cache=embedding_cache,
+        cache_key=f"{config.arabic_embedding_model}|{config.embedding_backend}",
+        batch_size=config.embedding_batch_size,
+        max_wait_ms=config.embedding_max_wait_ms
     )
-    image_embedder = embedding_functions.OpenCLIPEmbeddingFunction(
-        model_name=config.image_embedding_model,
-        device=device
+    image_embedder = LazyEmbeddingFunction(
+        "image",
+        lambda: create_image_embedder(config.image_embedding_model, device, config),
+        "open_clip",
+        {
+            "model_name": config.image_embedding_model,
+            "checkpoint": "laion2b_s34b_b79k",
+            "device": device
+        },
+        batch_size=config.embedding_batch_size,
+        max_wait_ms=config.embedding_max_wait_ms
     )
 
     image_loader = ImageLoader()
@@ -78,7 +348,9 @@ def create_collections(
             name="image_collection",
             embedding_function=image_embedder,
             data_loader=image_loader
-        )
+        ),
+        image_embedder=image_embedder,
+        text_embedders={"english": english_embedder, "arabic": arabic_embedder}
     )
 
 
@@ -0,0 +1,225 @@
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+
+INDEXED = "indexed"
+INGESTING = "ingesting"
+FAILED = "failed"
+
+
+class DocumentRegistry:
+    """
+    Small SQLite table of ingested files keyed by content hash, so dedup checks
+    and document listings do not scan the Chroma collections.
+    """
+
+    def __init__(self, path: str):
+        self.__path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS documents (
+                    file_hash TEXT PRIMARY KEY,
+                    document TEXT NOT NULL,
+                    source_type TEXT,
+                    status TEXT NOT NULL,
+                    page_count INTEGER,
+                    chunk_ids TEXT NOT NULL DEFAULT '[]',
+                    image_ids TEXT NOT NULL DEFAULT '[]',
+                    pages TEXT NOT NULL DEFAULT '{}',
+                    started_at REAL,
+                    completed_at REAL,
+                    error TEXT
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS documents_by_name ON documents (document)"
+            )
+
+            # Registries created before per-page tracking lack the pages column.
+            columns = {
+                row["name"]
+                for row in conn.execute("PRAGMA table_info(documents)")
+            }
+            if "pages" not in columns:
+                conn.execute(
+                    "ALTER TABLE documents ADD COLUMN pages TEXT NOT NULL DEFAULT '{}'"
+                )
+
+    @contextmanager
+    def _connect(self):
+        # A connection per call keeps the registry safe to share across the
+        # ingestion worker threads and processes.
+        conn = sqlite3.connect(self.__path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, file_hash: str) -> dict | None:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM documents WHERE file_hash = ?",
+                (file_hash,)
+            ).fetchone()
+        return _row_to_record(row)
+
+    def is_empty(self) -> bool:
+        with self._connect() as conn:
+            row = conn.execute("SELECT 1 FROM documents LIMIT 1").fetchone()
+        return row is None
+
+    def start(self, file_hash: str, document: str, source_type: str) -> str | None:
+        """
+        Claim file_hash for ingestion unless it is indexed or already being
+        ingested. Returns the status the file had: None or FAILED when the
+        claim was taken, INDEXED or INGESTING when it was not.
+        """
+        with self._connect() as conn:
+            # Taking the write lock first makes the check and the claim one
+            # step, so concurrent uploads of the same content never both win.
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT status FROM documents WHERE file_hash = ?",
+                (file_hash,)
+            ).fetchone()
+            status = row["status"] if row is not None else None
+            if status in (INDEXED, INGESTING):
+                return status
+
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO documents
+                    (file_hash, document, source_type, status, started_at)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (file_hash, document, source_type, INGESTING, time.time())
+            )
+        return status
+
+    def complete(
+        self,
+        file_hash: str,
+        chunk_ids: list[str],
+        image_ids: list[str],
+        page_count: int | None = None,
+        pages: dict | None = None
+    ):
+        """
+        pages maps a page index to its content hash and the chunk and image
+        ids written for it, so later versions can reuse unchanged pages.
+        """
+        with self._connect() as conn:
+            conn.execute(
+                """
+                UPDATE documents
+                SET status = ?, chunk_ids = ?, image_ids = ?, page_count = ?,
+                    pages = ?, completed_at = ?, error = NULL
+                WHERE file_hash = ?
+                """,
+                (
+                    INDEXED,
+                    json.dumps(chunk_ids),
+                    json.dumps(image_ids),
+                    page_count,
+                    json.dumps(pages or {}),
+                    time.time(),
+                    file_hash
+                )
+            )
+
+    def fail(self, file_hash: str, error: str):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE documents SET status = ?, error = ? WHERE file_hash = ?",
+                (FAILED, error, file_hash)
+            )
+
+    def add_indexed(
+        self,
+        file_hash: str,
+        document: str,
+        source_type: str,
+        chunk_ids: list[str],
+        image_ids: list[str],
+        page_count: int | None = None,
+        pages: dict | None = None
+    ):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO documents
+                    (file_hash, document, source_type, status, page_count,
+                     chunk_ids, image_ids, pages, started_at, completed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    file_hash,
+                    document,
+                    source_type,
+                    INDEXED,
+                    page_count,
+                    json.dumps(chunk_ids),
+                    json.dumps(image_ids),
+                    json.dumps(pages or {}),
+                    now,
+                    now
+                )
+            )
+
+    def remove(self, file_hash: str):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM documents WHERE file_hash = ?", (file_hash,))
+
+    def latest_indexed(self, document: str, exclude_hash: str | None = None) -> dict | None:
+        """Most recently indexed version of a document name, if any."""
+        with self._connect() as conn:
+            row = conn.execute(
+                """
+                SELECT * FROM documents
+                WHERE document = ? AND status = ? AND file_hash != ?
+                ORDER BY completed_at DESC
+                LIMIT 1
+                """,
+                (document, INDEXED, exclude_hash or "")
+            ).fetchone()
+        return _row_to_record(row)
+
+    def list_documents(self) -> list[str]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT DISTINCT document FROM documents WHERE status = ? ORDER BY document",
+                (INDEXED,)
+            ).fetchall()
+        return [row["document"] for row in rows]
+
+    def unfinished(self) -> list[dict]:
+        """Files being ingested, or whose ingestion crashed or failed part way through."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM documents WHERE status != ?",
+                (INDEXED,)
+            ).fetchall()
+        return [_row_to_record(row) for row in rows]
+
+
+def _row_to_record(row):
+    if row is None:
+        return None
+
+    record = dict(row)
+    record["chunk_ids"] = json.loads(record["chunk_ids"])
+    record["image_ids"] = json.loads(record["image_ids"])
+    record["pages"] = json.loads(record["pages"])
+    return record
@@ -0,0 +1,254 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+
+import numpy as np
+
+
+class EmbeddingCache:
+    """
+    Content-addressed store of text embeddings, so boilerplate paragraphs,
+    disclaimers and repeated captions are embedded once per model rather than
+    once per document.
+
+    Vectors are appended to one float16 file per model and read back through
+    a memory map; a SQLite index maps (model, text hash) to a row. Rows are
+    allocated inside a write transaction, so processes sharing the folder
+    never write over each other.
+
+    Files only grow, so once a model holds max_entries vectors its cache is
+    dropped and started again in a new file; recomputing an embedding costs
+    less than tracking which ones are still in use.
+    """
+
+    def __init__(self, root: str, max_entries: int = 1_000_000):
+        self.__root = root
+        os.makedirs(self.__root, exist_ok=True)
+
+        self.__index_path = os.path.join(root, "embedding_index.sqlite3")
+        self.__max_entries = max_entries
+        self.__lock = threading.Lock()
+        self.__maps = {}
+        self.__hits = Counter()
+        self.__misses = Counter()
+
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS models (
+                    model TEXT PRIMARY KEY,
+                    file TEXT NOT NULL,
+                    dimension INTEGER NOT NULL,
+                    row_count INTEGER NOT NULL DEFAULT 0
+                )
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    model TEXT NOT NULL,
+                    text_hash TEXT NOT NULL,
+                    row INTEGER NOT NULL,
+                    PRIMARY KEY (model, text_hash)
+                )
+                """
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.__index_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def embed(self, texts, model: str, embed_texts) -> list:
+        """
+        Embeddings of texts under model, calling embed_texts only for texts
+        whose normalised form has not been embedded before.
+        """
+        hashes = [text_hash(text) for text in texts]
+        vectors = self._lookup(hashes, model)
+
+        missing = {}
+        for text, digest in zip(texts, hashes):
+            if digest not in vectors:
+                missing.setdefault(digest, text)
+
+        # Repeats within one call are hits too: they are embedded once.
+        with self.__lock:
+            self.__hits[model] += len(texts) - len(missing)
+            self.__misses[model] += len(missing)
+
+        if missing:
+            computed = embed_texts(list(missing.values()))
+            # Rounded as they are stored, so a text gets the same vector
+            # whether it was just embedded or read back from the cache.
+            computed = [
+                np.asarray(vector, dtype=np.float32).astype(np.float16).astype(np.float32)
+                for vector in computed
+            ]
+            self._store(dict(zip(missing, computed)), model)
+            vectors.update(zip(missing, computed))
+
+        return [vectors[digest] for digest in hashes]
+
+    def stats(self) -> dict:
+        """Lookups, hits and hit rate per model since start-up, and stored vectors."""
+        with self._connect() as conn:
+            entries = dict(conn.execute("SELECT model, row_count FROM models").fetchall())
+
+        with self.__lock:
+            models = set(entries) | set(self.__hits) | set(self.__misses)
+            return {
+                model: {
+                    "hits": self.__hits[model],
+                    "misses": self.__misses[model],
+                    "hit_rate": (
+                        self.__hits[model] / (self.__hits[model] + self.__misses[model])
+                        if self.__hits[model] + self.__misses[model] else None
+                    ),
+                    "entries": entries.get(model, 0)
+                }
+                for model in sorted(models)
+            }
+
+    def _lookup(self, hashes, model):
+        unique = list(dict.fromkeys(hashes))
+        rows = {}
+
+        with self._connect() as conn:
+            # One read transaction, so a cache started afresh by another
+            # process cannot swap the file between these reads and the map.
+            conn.execute("BEGIN")
+            found = conn.execute(
+                "SELECT file, dimension, row_count FROM models WHERE model = ?",
+                (model,)
+            ).fetchone()
+            if found is None:
+                return {}
+
+            # Chunked to stay under SQLite's bound-parameter limit.
+            for start in range(0, len(unique), 500):
+                chunk = unique[start:start + 500]
+                placeholders = ", ".join("?" for _ in chunk)
+                rows.update(conn.execute(
+                    f"SELECT text_hash, row FROM embeddings "
+                    f"WHERE model = ? AND text_hash IN ({placeholders})",
+                    (model, *chunk)
+                ).fetchall())
+
+            if not rows:
+                return {}
+
+            vectors = self._vectors(model, *found)
+
+        return {
+            digest: vectors[row].astype(np.float32)
+            for digest, row in rows.items()
+        }
+
+    def _vectors(self, model, file, dimension, row_count):
+        with self.__lock:
+            mapped_file, mapped = self.__maps.get(model, (None, None))
+            # Rows appended since the file was mapped, or a cache started
+            # afresh, here or by another process, need a fresh map.
+            if mapped_file != file or mapped.shape[0] < row_count:
+                mapped = np.memmap(
+                    os.path.join(self.__root, file),
+                    dtype=np.float16,
+                    mode="r",
+                    shape=(row_count, dimension)
+                )
+                self.__maps[model] = (file, mapped)
+            return mapped
+
+    def _store(self, vectors: dict, model: str):
+        if not vectors:
+            return
+
+        dimension = len(next(iter(vectors.values())))
+        with self._connect() as conn:
+            # Taking the write lock first makes row allocation exclusive.
+            conn.execute("BEGIN IMMEDIATE")
+            found = conn.execute(
+                "SELECT file, dimension, row_count FROM models WHERE model = ?",
+                (model,)
+            ).fetchone()
+            if found is None:
+                found = (_vector_file_name(model), dimension, 0)
+                conn.execute(
+                    "INSERT INTO models (model, file, dimension, row_count) VALUES (?, ?, ?, 0)",
+                    (model, found[0], dimension)
+                )
+            file, stored_dimension, row_count = found
+            if stored_dimension != dimension:
+                raise ValueError(
+                    f"Cached embeddings of {model} have {stored_dimension} dimensions, not {dimension}"
+                )
+
+            if row_count + len(vectors) > self.__max_entries:
+                file, row_count = self._reset(conn, model, file), 0
+
+            # Another writer may already have stored some of these.
+            digests = [
+                digest for digest in vectors
+                if conn.execute(
+                    "SELECT 1 FROM embeddings WHERE model = ? AND text_hash = ?",
+                    (model, digest)
+                ).fetchone() is None
+            ]
+            if not digests:
+                return
+
+            # Vectors are on disk before the index points at them; a crash in
+            # between only leaves unused bytes past row_count.
+            block = np.stack([vectors[digest] for digest in digests]).astype(np.float16)
+            path = os.path.join(self.__root, file)
+            with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+                f.seek(row_count * dimension * block.itemsize)
+                f.write(block.tobytes())
+
+            conn.executemany(
+                "INSERT INTO embeddings (model, text_hash, row) VALUES (?, ?, ?)",
+                [(model, digest, row_count + i) for i, digest in enumerate(digests)]
+            )
+            conn.execute(
+                "UPDATE models SET row_count = ? WHERE model = ?",
+                (row_count + len(digests), model)
+            )
+
+
+    def _reset(self, conn, model, file):
+        # A new file name, so readers still mapping the old one notice.
+        new_file = _vector_file_name(model)
+        conn.execute("DELETE FROM embeddings WHERE model = ?", (model,))
+        conn.execute(
+            "UPDATE models SET file = ?, row_count = 0 WHERE model = ?",
+            (new_file, model)
+        )
+        path = os.path.join(self.__root, file)
+        if os.path.exists(path):
+            os.remove(path)
+        print(f"Embedding cache of {model} is full; started afresh")
+        return new_file
+
+
+def _vector_file_name(model):
+    return f"{hashlib.sha256(model.encode('utf-8')).hexdigest()[:16]}-{uuid.uuid4().hex[:8]}.f16"
+
+
+def normalise_text(text: str) -> str:
+    """Unicode-normalised text with runs of whitespace collapsed."""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", text)).strip()
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(normalise_text(text).encode("utf-8")).hexdigest()
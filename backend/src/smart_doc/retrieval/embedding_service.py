@@ -0,0 +1,110 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class EmbeddingService:
+    """
+    Coalesces embedding requests from concurrent ingestions into shared
+    batches run by one worker thread, so several uploads embed through one
+    model call at a time instead of contending for the same cores.
+
+    A batch is sent once the next request would take it past max_batch_size
+    inputs or its first request has waited max_wait_ms. Text and image
+    requests are never mixed.
+    """
+
+    def __init__(self, embed, max_batch_size: int = 64, max_wait_ms: float = 5, name="embedding-service"):
+        self.embed = embed
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.name = name
+        self.batches = 0
+        self.items = 0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, inputs) -> Future:
+        """Future of the embeddings of inputs, in order."""
+        future = Future()
+        inputs = list(inputs)
+        if not inputs:
+            future.set_result([])
+            return future
+
+        self._queue.put((_kind(inputs), inputs, future))
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+        return future
+
+    def __call__(self, inputs):
+        return self.submit(inputs).result()
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches else None
+        }
+
+    def _run(self):
+        deferred = []
+        while True:
+            first = deferred.pop(0) if deferred else self._queue.get()
+            requests = [first]
+            size = len(first[1])
+            deadline = time.monotonic() + self.max_wait
+
+            for request in list(deferred):
+                if request[0] == first[0] and size + len(request[1]) <= self.max_batch_size:
+                    deferred.remove(request)
+                    requests.append(request)
+                    size += len(request[1])
+
+            while size < self.max_batch_size:
+                try:
+                    request = self._queue.get(timeout=max(0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+
+                # Requests of the other kind, or too large to fit, wait for
+                # a later batch.
+                if request[0] != first[0]:
+                    deferred.append(request)
+                    continue
+                if size + len(request[1]) > self.max_batch_size:
+                    deferred.append(request)
+                    break
+
+                requests.append(request)
+                size += len(request[1])
+
+            self._embed_batch(requests)
+
+    def _embed_batch(self, requests):
+        inputs = [item for _, items, _ in requests for item in items]
+
+        try:
+            vectors = []
+            # A single large request is still split to bound memory per call.
+            for start in range(0, len(inputs), self.max_batch_size):
+                vectors.extend(self.embed(inputs[start:start + self.max_batch_size]))
+                self.batches += 1
+            self.items += len(inputs)
+        except Exception as e:
+            for _, _, future in requests:
+                future.set_exception(e)
+            return
+
+        start = 0
+        for _, items, future in requests:
+            future.set_result(vectors[start:start + len(items)])
+            start += len(items)
+
+
+def _kind(inputs):
+    return "text" if all(isinstance(item, str) for item in inputs) else "image"
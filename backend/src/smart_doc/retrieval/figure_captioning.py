@@ -0,0 +1,220 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from PIL import Image
+
+
+# Longest a caption batch waits for running ingestions to finish before it
+# goes ahead anyway, so a steady stream of uploads cannot starve captioning.
+MAX_IDLE_WAIT_SECONDS = 30
+# Scheduler niceness of the captioning thread, where the OS supports it.
+CAPTIONING_NICENESS = 10
+
+
+class FigureCaptioner:
+    """
+    Captions PDF figures on a low-priority background thread after their
+    document's text has been indexed. Each caption is stored on the image
+    record and as a text record, so figures are searchable and summaries can
+    use text captions instead of the images themselves.
+    """
+
+    def __init__(
+        self,
+        caption_images,
+        image_collection,
+        get_collection_by_language,
+        detect_languages,
+        batch_size=8,
+        is_busy=None
+    ):
+        self.caption_images = caption_images
+        self.image_collection = image_collection
+        self.get_collection_by_language = get_collection_by_language
+        self.detect_languages = detect_languages
+        self.batch_size = batch_size
+        self.is_busy = is_busy or (lambda: False)
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, image_ids):
+        if not image_ids:
+            return
+
+        self._queue.put(list(image_ids))
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run,
+                    name="figure-captioning",
+                    daemon=True
+                )
+                self._thread.start()
+
+    def join(self):
+        """Block until every submitted figure has been captioned."""
+        self._queue.join()
+
+    def caption_batch(self, image_ids):
+        records = self.image_collection.get(
+            ids=image_ids,
+            include=["uris", "metadatas"]
+        )
+
+        pending = []
+        for image_id, uri, metadata in zip(
+            records.get("ids", []),
+            records.get("uris") or [],
+            records.get("metadatas") or []
+        ):
+            # Figures shared with an earlier upload may already be captioned.
+            if not metadata or metadata.get("caption"):
+                continue
+
+            try:
+                with Image.open(uri) as image:
+                    pending.append((image_id, uri, metadata, image.convert("RGB")))
+            except Exception as e:
+                print(f"Skipping caption for {image_id}: {e}")
+
+        if not pending:
+            return
+
+        captions = self.caption_images([image for _, _, _, image in pending])
+        languages = self.detect_languages(captions)
+
+        # Chroma merges updated keys into the stored metadata, so page
+        # references refreshed meanwhile by a new version are kept.
+        self.image_collection.update(
+            ids=[image_id for image_id, _, _, _ in pending],
+            metadatas=[{"caption": caption} for caption in captions]
+        )
+
+        batches = {}
+        for (image_id, uri, metadata, _), caption, language in zip(pending, captions, languages):
+            batch = batches.setdefault(
+                language,
+                {
+                    "collection": self.get_collection_by_language(language),
+                    "documents": [],
+                    "ids": [],
+                    "metadatas": []
+                }
+            )
+            caption_metadata = {
+                "type": "image_caption",
+                "image_id": image_id,
+                "source": uri,
+                "file_hash": metadata.get("file_hash", ""),
+                "content_type": "text",
+                "source_type": "image_caption",
+                "document": metadata.get("document", ""),
+                "language": language
+            }
+            if "page" in metadata:
+                caption_metadata["page"] = metadata["page"]
+
+            batch["documents"].append(caption)
+            batch["ids"].append(f"{image_id}_caption")
+            batch["metadatas"].append(caption_metadata)
+
+        for batch in batches.values():
+            batch["collection"].upsert(
+                documents=batch["documents"],
+                ids=batch["ids"],
+                metadatas=batch["metadatas"]
+            )
+
+    def _run(self):
+        _lower_thread_priority()
+
+        while True:
+            image_ids = self._queue.get()
+            try:
+                for start in range(0, len(image_ids), self.batch_size):
+                    self._wait_until_idle()
+                    try:
+                        self.caption_batch(image_ids[start:start + self.batch_size])
+                    except Exception as e:
+                        print(f"Figure captioning failed: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _wait_until_idle(self):
+        deadline = time.monotonic() + MAX_IDLE_WAIT_SECONDS
+        while self.is_busy() and time.monotonic() < deadline:
+            time.sleep(0.5)
+
+
+class CaptionCache:
+    """
+    Captions already generated, keyed by image content hash and caption
+    model. Captions outlive the figures they were made for, so an image seen
+    in any earlier upload is not captioned again.
+    """
+
+    def __init__(self, path: str):
+        self.__path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS captions (
+                    content_hash TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    caption TEXT NOT NULL,
+                    PRIMARY KEY (content_hash, model)
+                )
+                """
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.__path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def cached_captions(self, content_hashes, model: str) -> dict:
+        """Captions already generated by model, keyed by image content hash."""
+        captions = {}
+        hashes = list(dict.fromkeys(content_hashes))
+
+        with self._connect() as conn:
+            # Chunked to stay under SQLite's bound-parameter limit.
+            for start in range(0, len(hashes), 500):
+                chunk = hashes[start:start + 500]
+                placeholders = ", ".join("?" for _ in chunk)
+                rows = conn.execute(
+                    f"SELECT content_hash, caption FROM captions "
+                    f"WHERE model = ? AND content_hash IN ({placeholders})",
+                    (model, *chunk)
+                ).fetchall()
+                captions.update(rows)
+
+        return captions
+
+    def cache_captions(self, captions: dict, model: str):
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO captions (content_hash, model, caption) VALUES (?, ?, ?)",
+                [(content_hash, model, caption) for content_hash, caption in captions.items()]
+            )
+
+
+def _lower_thread_priority():
+    # Per-thread niceness is Linux-only; elsewhere the thread keeps its priority.
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), CAPTIONING_NICENESS)
+    except (AttributeError, OSError):
+        pass
@@ -1,5 +1,4 @@
 import hashlib
-import os
 
 
 SUPPORTED_DOCUMENT_EXTENSIONS = {
@@ -13,22 +12,23 @@ SUPPORTED_DOCUMENT_EXTENSIONS = {
     ".csv",
 }
 
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".webp"}
+
+SPREADSHEET_EXTENSIONS = {".xlsx", ".csv"}
 
-def compute_file_hash(file_path: str) -> str:
-    hasher = hashlib.md5()
-    with open(file_path, "rb") as f:
-        for chunk in iter(lambda: f.read(4096), b""):
-            hasher.update(chunk)
-    return hasher.hexdigest()
 
+# Large reads keep hashing and upload streaming close to disk throughput.
+HASH_CHUNK_SIZE = 1024 * 1024
 
-def list_supported_documents(documents_path: str) -> list[str]:
-    if not os.path.exists(documents_path):
-        return []
 
-    docs = [
-        f for f in os.listdir(documents_path)
-        if os.path.splitext(f)[1].lower() in SUPPORTED_DOCUMENT_EXTENSIONS
-    ]
+def new_file_hasher():
+    """Hasher for file content hashes; callers streaming a file feed it chunks."""
+    return hashlib.md5()
 
-    return sorted(docs)
+
+def compute_file_hash(file_path: str) -> str:
+    hasher = new_file_hasher()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
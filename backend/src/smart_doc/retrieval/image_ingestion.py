@@ -6,26 +6,43 @@ from PIL import Image
 
 
 def caption_image(pil_image, caption_processor, caption_model):
-    inputs = caption_processor(
-        images=pil_image,
-        return_tensors="pt"
-    )
+    return caption_images([pil_image], caption_processor, caption_model)[0]
+
+
+def caption_images(pil_images, caption_processor, caption_model, batch_size=8):
+    """
+    Caption images batch_size at a time; the processor resizes every image to
+    the model's input size, so each batch is one generate call.
+    """
     device = next(caption_model.parameters()).device
-    inputs = {
-        key: value.to(device)
-        for key, value in inputs.items()
-    }
+    captions = []
 
-    with torch.no_grad():
-        out = caption_model.generate(
-            **inputs,
-            max_new_tokens=50
+    for start in range(0, len(pil_images), batch_size):
+        batch = [
+            image.convert("RGB")
+            for image in pil_images[start:start + batch_size]
+        ]
+        inputs = caption_processor(
+            images=batch,
+            return_tensors="pt"
         )
+        inputs = {
+            key: value.to(device)
+            for key, value in inputs.items()
+        }
 
-    return caption_processor.decode(
-        out[0],
-        skip_special_tokens=True
-    )
+        with torch.no_grad():
+            out = caption_model.generate(
+                **inputs,
+                max_new_tokens=50
+            )
+
+        captions += caption_processor.batch_decode(
+            out,
+            skip_special_tokens=True
+        )
+
+    return captions
 
 
 def add_image_file(
@@ -33,13 +50,12 @@ def add_image_file(
     image_collection,
     get_collection_by_language,
     detect_language,
-    caption_processor,
-    caption_model,
+    caption_images,
     file_hash
 ):
     abs_path = os.path.abspath(file_path)
-    image = Image.open(abs_path)
-    caption = caption_image(image, caption_processor, caption_model)
+    with Image.open(abs_path) as image:
+        caption = caption_images([image])[0]
     caption_language = detect_language(caption)
     image_id = str(uuid.uuid4())
 
@@ -70,3 +86,5 @@ def add_image_file(
             "language": caption_language
         }]
     )
+
+    return {"chunk_ids": [f"{image_id}_caption"], "image_ids": [image_id]}
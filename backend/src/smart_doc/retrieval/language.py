@@ -1,17 +1,80 @@
-from langdetect import detect
+import numpy as np
 
 
-def detect_text_language(text) -> str:
-    try:
-        return detect(text)
-    except Exception:
-        return "en"
+# Arabic, Arabic Supplement, Arabic Extended-A and the two presentation-form blocks.
+ARABIC_BLOCKS = (
+    (0x0600, 0x06FF),
+    (0x0750, 0x077F),
+    (0x08A0, 0x08FF),
+    (0xFB50, 0xFDFF),
+    (0xFE70, 0xFEFF),
+)
+# Digits and punctuation inside the Arabic block say nothing about the language.
+ARABIC_NON_LETTERS = (
+    (0x0660, 0x066D),
+    (0x06F0, 0x06F9),
+    (0x060C, 0x060C),
+    (0x061B, 0x061F),
+)
+# Share of Arabic-script letters at or above which text is Arabic, and at or
+# below which it is not. Text in between is mixed and may go to langdetect.
+ARABIC_MIN_RATIO = 0.6
+NON_ARABIC_MAX_RATIO = 0.2
+
+
+def detect_text_languages(texts, fallback=True) -> list[str]:
+    """
+    Route a batch of texts to "ar" or "en" by the share of their letters that
+    are in the Arabic script. The whole batch is classified in one vectorised
+    pass; langdetect, when installed and fallback is set, is only consulted
+    for mixed-script text.
+    """
+    if not texts:
+        return []
+
+    codes = np.frombuffer("".join(texts).encode("utf-32-le"), dtype=np.uint32)
+
+    arabic_block = _in_ranges(codes, ARABIC_BLOCKS)
+    arabic = arabic_block & ~_in_ranges(codes, ARABIC_NON_LETTERS)
+    folded = codes | 0x20
+    latin = (folded >= 0x61) & (folded <= 0x7A) & (codes < 0x80)
+    # Other alphabets (accented Latin, Greek, Cyrillic, Hebrew, CJK, ...),
+    # leaving out general punctuation, symbols and emoji.
+    other = (
+        ((codes >= 0xC0) & (codes < 0x2000) & (codes != 0xD7) & (codes != 0xF7))
+        | ((codes >= 0x3040) & (codes < 0xFB50))
+    ) & ~arabic_block
+
+    bounds = np.cumsum([0] + [len(text) for text in texts])
+    starts, ends = bounds[:-1], bounds[1:]
+    arabic_counts = _segment_sums(arabic, starts, ends)
+    letter_counts = arabic_counts + _segment_sums(latin | other, starts, ends)
+
+    languages = []
+    for text, arabic_count, letter_count in zip(texts, arabic_counts, letter_counts):
+        if letter_count == 0:
+            languages.append("en")
+            continue
+
+        ratio = arabic_count / letter_count
+        if ratio >= ARABIC_MIN_RATIO:
+            languages.append("ar")
+        elif ratio <= NON_ARABIC_MAX_RATIO:
+            languages.append("en")
+        else:
+            languages.append(_resolve_mixed(text, ratio, fallback))
+
+    return languages
+
+
+def detect_text_language(text, fallback=True) -> str:
+    return detect_text_languages([text], fallback=fallback)[0]
 
 
-def get_text_collection(text, arabic_collection, english_collection):
+def get_text_collection(text, arabic_collection, english_collection, fallback=True):
     """Route text to the Arabic collection when detected, otherwise English."""
     return get_text_collection_by_language(
-        detect_text_language(text),
+        detect_text_language(text, fallback=fallback),
         arabic_collection,
         english_collection
     )
@@ -19,3 +82,34 @@ def get_text_collection(text, arabic_collection, english_collection):
 
 def get_text_collection_by_language(language, arabic_collection, english_collection):
     return arabic_collection if language == "ar" else english_collection
+
+
+def _resolve_mixed(text, ratio, fallback):
+    majority = "ar" if ratio >= 0.5 else "en"
+    if not fallback:
+        return majority
+
+    try:
+        from langdetect import DetectorFactory, detect
+    except ImportError:
+        return majority
+
+    # langdetect is probabilistic; a fixed seed keeps routing reproducible.
+    DetectorFactory.seed = 0
+    try:
+        return "ar" if detect(text) == "ar" else "en"
+    except Exception:
+        return majority
+
+
+def _in_ranges(codes, ranges):
+    mask = np.zeros(codes.shape, dtype=bool)
+    for start, end in ranges:
+        mask |= (codes >= start) & (codes <= end)
+    return mask
+
+
+def _segment_sums(mask, starts, ends):
+    # Prefix sums handle empty texts, which np.add.reduceat does not.
+    totals = np.concatenate(([0], np.cumsum(mask, dtype=np.int64)))
+    return totals[ends] - totals[starts]
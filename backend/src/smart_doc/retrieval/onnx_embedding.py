@@ -0,0 +1,294 @@
+import json
+import os
+
+import numpy as np
+import torch
+from chromadb.utils import embedding_functions
+from PIL import Image
+
+try:
+    import onnxruntime
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+except ImportError:
+    onnxruntime = None
+
+
+ONNX_OPSET = 17
+# Conv layers (CLIP's patch embedding) stay float: onnxruntime's integer
+# convolution is slower on CPU than the float one it replaces.
+QUANTISED_OPS = ["MatMul", "Gemm"]
+
+
+def create_session(model_path: str, threads: int = 0):
+    """
+    CPU session for one model. threads=0 lets onnxruntime use every physical
+    core for a single call; inter-op parallelism is off because the exported
+    graphs are a single chain of operators.
+    """
+    if onnxruntime is None:
+        raise ImportError("The ONNX embedding backend needs onnxruntime installed")
+
+    options = onnxruntime.SessionOptions()
+    options.intra_op_num_threads = threads
+    options.inter_op_num_threads = 1
+    options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+    options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+    return onnxruntime.InferenceSession(
+        model_path,
+        sess_options=options,
+        providers=["CPUExecutionProvider"]
+    )
+
+
+def export_quantised(module, sample_inputs, input_names, dynamic_axes, path):
+    """
+    Export a torch module to ONNX and quantise its weights to int8, unless a
+    quantised export already exists at path. Activations are quantised per
+    call (dynamic quantisation), so no calibration data is needed.
+    """
+    if os.path.exists(path):
+        return path
+
+    if onnxruntime is None:
+        raise ImportError("The ONNX embedding backend needs onnxruntime installed")
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    float_path = path + ".float.onnx"
+    module.eval()
+
+    with torch.no_grad():
+        torch.onnx.export(
+            module,
+            sample_inputs,
+            float_path,
+            input_names=input_names,
+            output_names=["embeddings"],
+            dynamic_axes={**dynamic_axes, "embeddings": {0: "batch"}},
+            opset_version=ONNX_OPSET,
+            dynamo=False
+        )
+
+    try:
+        # Written under a temporary name so a crash never leaves a partial
+        # model where the next start-up would load it.
+        quantize_dynamic(
+            float_path,
+            path + ".partial",
+            op_types_to_quantize=QUANTISED_OPS,
+            weight_type=QuantType.QInt8
+        )
+        os.replace(path + ".partial", path)
+    finally:
+        if os.path.exists(float_path):
+            os.remove(float_path)
+
+    return path
+
+
+def _export_name(model_name: str) -> str:
+    return os.path.basename(os.path.normpath(model_name)).replace(":", "_")
+
+
+class _TokenEmbeddings(torch.nn.Module):
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask, token_type_ids=None):
+        inputs = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if token_type_ids is not None:
+            inputs["token_type_ids"] = token_type_ids
+        return self.model(**inputs).last_hidden_state
+
+
+class OnnxSentenceEmbeddingFunction(embedding_functions.EmbeddingFunction):
+    """
+    int8 ONNX counterpart of SentenceTransformerEmbeddingFunction for a local
+    sentence-transformers model. Pooling, normalisation and the maximum
+    sequence length are read from the model folder, so vectors stay close
+    enough to the PyTorch ones to share a collection with them.
+    """
+
+    def __init__(self, model_name: str, onnx_dir: str, threads: int = 0, batch_size: int = 32):
+        from transformers import AutoModel, AutoTokenizer
+
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self._tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self._max_length, self._pooling, self._normalize = _sentence_transformer_settings(
+            model_name,
+            self._tokenizer
+        )
+        self._input_names = ["input_ids", "attention_mask"]
+        if "token_type_ids" in self._tokenizer.model_input_names:
+            self._input_names.append("token_type_ids")
+
+        path = os.path.join(onnx_dir, f"{_export_name(model_name)}.int8.onnx")
+        if not os.path.exists(path):
+            sample = self._tokenizer(["sample"], return_tensors="pt")
+            export_quantised(
+                _TokenEmbeddings(AutoModel.from_pretrained(model_name)),
+                tuple(sample[name] for name in self._input_names),
+                self._input_names,
+                {name: {0: "batch", 1: "sequence"} for name in self._input_names},
+                path
+            )
+        self._session = create_session(path, threads)
+
+    def __call__(self, input):
+        embeddings = []
+        for start in range(0, len(input), self.batch_size):
+            embeddings.extend(self._encode(list(input[start:start + self.batch_size])))
+        return embeddings
+
+    def _encode(self, texts):
+        tokens = self._tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self._max_length,
+            return_tensors="np"
+        )
+        feed = {name: tokens[name].astype(np.int64) for name in self._input_names}
+        hidden = self._session.run(None, feed)[0]
+
+        if self._pooling == "cls":
+            pooled = hidden[:, 0]
+        else:
+            mask = feed["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+        if self._normalize:
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+        return list(pooled.astype(np.float32))
+
+
+def _sentence_transformer_settings(model_name, tokenizer):
+    max_length = min(tokenizer.model_max_length, 512)
+    pooling = "mean"
+    normalize = False
+
+    config_path = os.path.join(model_name, "sentence_bert_config.json")
+    if os.path.exists(config_path):
+        with open(config_path, encoding="utf-8") as f:
+            max_length = json.load(f).get("max_seq_length", max_length)
+
+    modules_path = os.path.join(model_name, "modules.json")
+    modules = []
+    if os.path.exists(modules_path):
+        with open(modules_path, encoding="utf-8") as f:
+            modules = json.load(f)
+
+    for module in modules:
+        if module["type"].endswith("Normalize"):
+            normalize = True
+        if module["type"].endswith("Pooling"):
+            with open(os.path.join(model_name, module["path"], "config.json"), encoding="utf-8") as f:
+                pooling_config = json.load(f)
+            if pooling_config.get("pooling_mode_cls_token"):
+                pooling = "cls"
+
+    return max_length, pooling, normalize
+
+
+class _ClipImageEmbeddings(torch.nn.Module):
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, pixel_values):
+        features = self.model.encode_image(pixel_values)
+        return features / features.norm(dim=-1, keepdim=True)
+
+
+class _ClipTextEmbeddings(torch.nn.Module):
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, tokens):
+        features = self.model.encode_text(tokens)
+        return features / features.norm(dim=-1, keepdim=True)
+
+
+class OnnxOpenCLIPEmbeddingFunction(embedding_functions.EmbeddingFunction):
+    """
+    int8 ONNX counterpart of BatchedOpenCLIPEmbeddingFunction: images are
+    encoded in one batched call and text queries by the exported text tower.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        onnx_dir: str,
+        checkpoint: str = "laion2b_s34b_b79k",
+        threads: int = 0,
+        batch_size: int = 32
+    ):
+        import open_clip
+
+        self.batch_size = batch_size
+        self._preprocess = _clip_preprocess(open_clip, model_name, checkpoint)
+        self._tokenizer = open_clip.get_tokenizer(model_name)
+
+        prefix = os.path.join(onnx_dir, f"{_export_name(model_name)}_{checkpoint}")
+        image_path = f"{prefix}.image.int8.onnx"
+        text_path = f"{prefix}.text.int8.onnx"
+
+        # The torch weights are only loaded when an export is missing.
+        if not (os.path.exists(image_path) and os.path.exists(text_path)):
+            model = open_clip.create_model(model_name, pretrained=checkpoint, device="cpu")
+            export_quantised(
+                _ClipImageEmbeddings(model),
+                (self._preprocess(Image.new("RGB", (224, 224))).unsqueeze(0),),
+                ["pixel_values"],
+                {"pixel_values": {0: "batch"}},
+                image_path
+            )
+            export_quantised(
+                _ClipTextEmbeddings(model),
+                (self._tokenizer(["sample"]),),
+                ["tokens"],
+                {"tokens": {0: "batch"}},
+                text_path
+            )
+            del model
+
+        self._image_session = create_session(image_path, threads)
+        self._text_session = create_session(text_path, threads)
+
+    def __call__(self, input):
+        embeddings = []
+        for start in range(0, len(input), self.batch_size):
+            batch = list(input[start:start + self.batch_size])
+            if any(isinstance(item, str) for item in batch):
+                tokens = self._tokenizer(batch).numpy().astype(np.int64)
+                output = self._text_session.run(None, {"tokens": tokens})[0]
+            else:
+                pixels = np.stack([
+                    self._preprocess(
+                        image if isinstance(image, Image.Image) else Image.fromarray(image)
+                    ).numpy()
+                    for image in batch
+                ])
+                output = self._image_session.run(None, {"pixel_values": pixels})[0]
+            embeddings.extend(output.astype(np.float32))
+        return embeddings
+
+
+def _clip_preprocess(open_clip, model_name, checkpoint):
+    # The same eval transform create_model_and_transforms builds, from the
+    # model and checkpoint configs alone.
+    image_size = open_clip.get_model_config(model_name)["vision_cfg"]["image_size"]
+    pretrained = open_clip.get_pretrained_cfg(model_name, checkpoint) or {}
+
+    return open_clip.image_transform(
+        image_size,
+        is_train=False,
+        mean=pretrained.get("mean"),
+        std=pretrained.get("std"),
+        interpolation=pretrained.get("interpolation"),
+        resize_mode=pretrained.get("resize_mode")
+    )
@@ -1,65 +1,529 @@
+import atexit
+import hashlib
 import io
+import json
+import multiprocessing
 import os
 import shutil
-import uuid
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import closing
+from dataclasses import dataclass, field
+from typing import Any
 
 import fitz
-from langchain_community.document_loaders import PyMuPDFLoader
+import numpy as np
 from PIL import Image
 
 
+PAGE_RENDER_DPI = 200
+
+# Embedded images and drawings smaller than this (in PDF points) are treated
+# as decoration rather than figures.
+MIN_FIGURE_POINTS = 36
+
+# An embedded image covering more of the page than this is a scan of the
+# page rather than a figure on it; the page goes through layout detection.
+MAX_FIGURE_PAGE_COVERAGE = 0.8
+
+# Embedded image formats decoded directly; anything else (JBIG2, JPX, ...)
+# falls back to rendering the page.
+DECODABLE_IMAGE_EXTENSIONS = {"png", "jpeg", "jpg", "bmp", "gif", "tiff"}
+
+# PDFs each render worker keeps open; concurrent ingestions interleave pages.
+WORKER_OPEN_PDFS = 4
+
+# One render pool per process, shared by every PDF being ingested, so
+# concurrent uploads never start more than its workers.
+_page_pool = None
+_page_pool_lock = threading.Lock()
+
+# Set per render worker process; fitz documents cannot be shared across processes.
+_worker_pdfs = OrderedDict()
+
+
+@dataclass
+class EmbeddedImage:
+    # The image exactly as stored in the PDF, e.g. JPEG or PNG bytes.
+    data: bytes
+    ext: str
+    bbox: tuple[float, float, float, float]
+    # Every placement of the image on the page, bbox being the first.
+    bboxes: list[tuple[float, float, float, float]] = field(default_factory=list)
+
+
+@dataclass
+class PdfPage:
+    index: int
+    page_count: int
+    text: str
+    content_hash: str
+    # Unchanged since the previous version of the document; nothing to index.
+    reused: bool = False
+    # No images, no drawings and mostly text: only the text is indexed.
+    text_only: bool = False
+    # Set instead of a raster when the page's figures are plain embedded images.
+    embedded_images: list[EmbeddedImage] | None = None
+    # Raster fields stay None unless the page needs layout detection.
+    width: int | None = None
+    height: int | None = None
+    stride: int | None = None
+    # Raw RGB samples: bytes when sent back from a worker, otherwise a
+    # memoryview straight over the pixmap, which must then stay referenced.
+    samples: Any = None
+    pixmap: Any = None
+
+    def to_array(self):
+        # An RGB array viewing the samples in place. PIL cannot map RGB
+        # buffers and would copy them, so the page stays a numpy view and
+        # only figure crops become images.
+        return np.ndarray(
+            (self.height, self.width, 3),
+            dtype=np.uint8,
+            buffer=self.samples,
+            strides=(self.stride, 3, 1)
+        )
+
+
 def add_pdf_file(
     file_path,
     documents_path,
-    blob_storage_path,
+    blob_store,
     file_hash,
     parent_splitter,
     child_splitter,
-    yolo,
-    device,
+    detect_layouts,
     ignored_layout_classes,
     get_collection_by_language,
-    detect_language,
-    image_collection
+    detect_languages,
+    image_collection,
+    embed_images,
+    delete_records,
+    page_workers=1,
+    yolo_batch_size=1,
+    image_write_batch_size=32,
+    progress=None,
+    previous_pages=None,
+    text_only_min_coverage=0.2
 ):
+    """
+    previous_pages is the per-page record of an earlier version of the same
+    document. Pages whose content hash is unchanged are not rendered, detected
+    or embedded again; the stale records of changed or removed pages are
+    deleted through delete_records(chunk_ids, image_ids).
+    """
     filename = os.path.basename(file_path)
 
     stored_path = os.path.join(documents_path, filename)
-    if not os.path.exists(stored_path):
+    # Always refresh the stored copy: an edited re-upload keeps its name.
+    if os.path.abspath(file_path) != os.path.abspath(stored_path):
         shutil.copy(file_path, stored_path)
 
     file_path = stored_path
+    source = os.path.abspath(file_path)
+    previous_pages = previous_pages or {}
+    previous_hashes = {
+        int(index): page["hash"]
+        for index, page in previous_pages.items()
+    }
+    previous_image_ids = {
+        image_id
+        for page in previous_pages.values()
+        for image_id in page["image_ids"]
+    }
+    figures = _FigureWriter(
+        filename,
+        blob_store,
+        image_collection,
+        embed_images,
+        image_write_batch_size,
+        existing_ids=previous_image_ids
+    )
+    batch = []
+    stats = {
+        "pages_reused": 0,
+        "pages_skipped": 0,
+        "pages_embedded_images": 0,
+        "pages_detected": 0
+    }
+    indexed = {
+        "chunk_ids": [],
+        "image_ids": [],
+        "page_count": 0,
+        "pages": {},
+        "reused_ids": [],
+        "stats": stats
+    }
 
-    loader = PyMuPDFLoader(file_path)
-    docs = loader.load()
-    pdf = fitz.open(file_path)
-
-    for page_index, doc in enumerate(docs):
-        _index_page_text(
-            doc.page_content,
-            filename,
-            page_index,
-            file_hash,
-            parent_splitter,
-            child_splitter,
-            get_collection_by_language,
-            detect_language,
-            os.path.abspath(file_path)
-        )
+    def record_page(page, chunk_ids, image_ids):
+        indexed["page_count"] = page.page_count
+        indexed["chunk_ids"] += chunk_ids
+        indexed["pages"][str(page.index)] = {
+            "hash": page.content_hash,
+            "chunk_ids": chunk_ids,
+            "image_ids": image_ids
+        }
+
+        if progress:
+            progress("indexing", page.index + 1, page.page_count)
+
+    def index_batch():
+        # YOLO reads arrays as BGR; the reversed view is not a copy either.
+        rendered = [page_img[..., ::-1] for _, page_img in batch if page_img is not None]
+        results = iter(detect_layouts(rendered) if rendered else [])
+
+        # Chunk ids are derived from the page index, so the old version's
+        # chunks of every changed page must go before the new ones are
+        # written; one delete covers the whole batch. Figures may be shared
+        # with other pages and are settled once the whole document is seen.
+        stale_ids = [
+            chunk_id
+            for page, _ in batch if not page.reused
+            for chunk_id in previous_pages.get(str(page.index), {}).get("chunk_ids", [])
+        ]
+        if stale_ids:
+            delete_records(stale_ids, [])
+
+        for page, page_img in batch:
+            if page.reused:
+                stats["pages_reused"] += 1
+                reused = previous_pages[str(page.index)]
+                indexed["reused_ids"] += reused["chunk_ids"]
+                figures.reference(reused["image_ids"], page.index)
+                record_page(page, reused["chunk_ids"], reused["image_ids"])
+                continue
+
+            chunk_ids = _index_page_text(
+                page.text,
+                filename,
+                page.index,
+                file_hash,
+                page.content_hash,
+                parent_splitter,
+                child_splitter,
+                get_collection_by_language,
+                detect_languages,
+                source
+            )
+
+            figure_metadata = {
+                "page": page.index,
+                "document": filename,
+                "file_hash": file_hash,
+                "page_hash": page.content_hash,
+                "content_type": "image"
+            }
+
+            if page_img is not None:
+                stats["pages_detected"] += 1
+                image_ids = _index_page_images(
+                    page_img,
+                    next(results),
+                    figure_metadata,
+                    ignored_layout_classes,
+                    figures
+                )
+            elif page.embedded_images:
+                stats["pages_embedded_images"] += 1
+                image_ids = _index_embedded_images(page, figure_metadata, figures)
+            else:
+                stats["pages_skipped"] += 1
+                image_ids = []
+
+            record_page(page, chunk_ids, image_ids)
+
+        batch.clear()
+
+    try:
+        # Pages are read ahead on a worker pool and grouped into detection
+        # batches; writes stay on this thread in page order, exactly as in the
+        # serial path.
+        with closing(iter_pdf_pages(
+            file_path,
+            page_workers,
+            previous_hashes,
+            text_only_min_coverage
+        )) as pages:
+            for page in pages:
+                # A rendered page is kept alongside its array so the buffer stays valid.
+                page_img = page.to_array() if page.samples is not None else None
+                batch.append((page, page_img))
+
+                # Every page counts towards the batch, rendered or not, so memory
+                # stays bounded and progress moves on PDFs whose pages are mostly
+                # text or embedded images.
+                if len(batch) >= yolo_batch_size:
+                    index_batch()
+
+        if batch:
+            index_batch()
+
+        figures.flush()
+        figures.refresh_page_references()
+    except BaseException:
+        figures.discard()
+        raise
 
-        _index_page_images(
-            pdf[page_index],
-            filename,
-            page_index,
-            file_hash,
-            blob_storage_path,
-            yolo,
-            device,
-            ignored_layout_classes,
-            image_collection
+    # Chunks of pages that no longer exist, and figures no page references.
+    removed_chunk_ids = [
+        chunk_id
+        for index, page in previous_pages.items()
+        if int(index) >= indexed["page_count"]
+        for chunk_id in page["chunk_ids"]
+    ]
+    unreferenced_image_ids = [
+        image_id for image_id in previous_image_ids
+        if image_id not in figures.page_refs
+    ]
+    if removed_chunk_ids or unreferenced_image_ids:
+        delete_records(removed_chunk_ids, unreferenced_image_ids)
+
+    indexed["image_ids"] = list(figures.page_refs)
+    indexed["reused_ids"] += [
+        image_id for image_id in figures.page_refs
+        if image_id in previous_image_ids
+    ]
+
+    print(
+        f"PDF indexed correctly: {filename} ({indexed['page_count']} pages: "
+        f"{stats['pages_reused']} unchanged, "
+        f"{stats['pages_skipped']} text-only, "
+        f"{stats['pages_embedded_images']} from embedded images, "
+        f"{stats['pages_detected']} layout-detected)"
+    )
+    return indexed
+
+
+def iter_pdf_pages(
+    file_path,
+    workers=1,
+    skip_hashes=None,
+    text_only_min_coverage=0.2
+):
+    """
+    Yield each page's text and raster together, lazily and in page order,
+    from a single parse of the PDF. Pages are yielded without a raster when
+    their content hash matches skip_hashes[index], when they are text-only
+    (no images, no drawings, text covering at least text_only_min_coverage of
+    the page), or when their figures can be taken from embedded images.
+
+    With workers > 1 pages are read ahead on the shared render pool, whose
+    size is fixed by the first PDF that needs it.
+    """
+    skip_hashes = skip_hashes or {}
+
+    with fitz.open(file_path) as pdf:
+        page_count = pdf.page_count
+
+        if workers <= 1 or page_count <= 1:
+            for page in pdf:
+                yield _read_page(
+                    page,
+                    skip_hashes,
+                    text_only_min_coverage,
+                    zero_copy=True
+                )
+            return
+
+    pool = get_page_pool(workers)
+    # Bound the pages read ahead so large PDFs do not pile up in memory.
+    max_pending = workers * 2
+    pending = deque()
+    next_page = 0
+
+    try:
+        while next_page < page_count or pending:
+            while next_page < page_count and len(pending) < max_pending:
+                pending.append(pool.submit(
+                    _read_worker_page,
+                    file_path,
+                    next_page,
+                    skip_hashes.get(next_page),
+                    text_only_min_coverage
+                ))
+                next_page += 1
+
+            yield pending.popleft().result()
+    except BrokenProcessPool:
+        # A crashed worker breaks the pool for good; the next PDF gets a new one.
+        shutdown_page_pool()
+        raise
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def get_page_pool(workers):
+    """
+    The process-wide render pool, created on first use with workers
+    processes and shut down at exit.
+    """
+    global _page_pool
+
+    with _page_pool_lock:
+        if _page_pool is None:
+            # Spawn keeps workers free of the torch/CUDA state held by this process.
+            _page_pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _page_pool
+
+
+def shutdown_page_pool():
+    global _page_pool
+
+    with _page_pool_lock:
+        pool, _page_pool = _page_pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+atexit.register(shutdown_page_pool)
+
+
+def _read_worker_page(file_path, page_index, skip_hash, text_only_min_coverage):
+    # Keyed by size and mtime too: a re-upload replaces the file under its name.
+    stat = os.stat(file_path)
+    key = (file_path, stat.st_size, stat.st_mtime_ns)
+
+    pdf = _worker_pdfs.pop(key, None) or fitz.open(file_path)
+    _worker_pdfs[key] = pdf
+    while len(_worker_pdfs) > WORKER_OPEN_PDFS:
+        _worker_pdfs.popitem(last=False)[1].close()
+
+    skip_hashes = {page_index: skip_hash} if skip_hash else {}
+    return _read_page(pdf[page_index], skip_hashes, text_only_min_coverage)
+
+
+def _read_page(page, skip_hashes, text_only_min_coverage, zero_copy=False):
+    page_count = page.parent.page_count
+    text = page.get_text()
+    content_hash = _page_content_hash(page, text)
+
+    if skip_hashes.get(page.number) == content_hash:
+        return PdfPage(page.number, page_count, text, content_hash, reused=True)
+
+    # Cheap fitz checks decide whether the page needs rendering at all.
+    has_drawings = _has_vector_graphics(page)
+    if (
+        not has_drawings
+        and not page.get_images()
+        and _text_coverage(page) >= text_only_min_coverage
+    ):
+        return PdfPage(page.number, page_count, text, content_hash, text_only=True)
+
+    embedded_images = None if has_drawings else _extract_embedded_images(page)
+    if embedded_images is not None:
+        return PdfPage(
+            page.number,
+            page_count,
+            text,
+            content_hash,
+            embedded_images=embedded_images
         )
 
-    print(f"PDF indexed correctly: {filename}")
+    pix = page.get_pixmap(dpi=PAGE_RENDER_DPI, alpha=False)
+    # Worker results are pickled, so they carry one plain copy of the samples.
+    samples = pix.samples_mv if zero_copy else pix.samples
+
+    return PdfPage(
+        page.number,
+        page_count,
+        text,
+        content_hash,
+        width=pix.width,
+        height=pix.height,
+        stride=pix.stride,
+        samples=samples,
+        pixmap=pix if zero_copy else None
+    )
+
+
+def _extract_embedded_images(page):
+    """
+    Return the page's figures straight from its image XObjects, or None when
+    the page has to be rendered for layout detection: it has no usable
+    embedded images, one of them cannot be decoded, or one covers most of
+    the page, as in a scanned PDF.
+    """
+    figures = []
+    seen = set()
+    page_area = abs(page.rect)
+
+    for image in page.get_images(full=True):
+        xref = image[0]
+        if xref in seen:
+            continue
+        seen.add(xref)
+
+        rects = [
+            rect for rect in page.get_image_rects(xref)
+            if rect.width >= MIN_FIGURE_POINTS and rect.height >= MIN_FIGURE_POINTS
+        ]
+        if not rects:
+            continue
+        if any(abs(rect & page.rect) > MAX_FIGURE_PAGE_COVERAGE * page_area for rect in rects):
+            return None
+
+        try:
+            extracted = page.parent.extract_image(xref)
+        except Exception:
+            return None
+
+        if not extracted or extracted.get("ext") not in DECODABLE_IMAGE_EXTENSIONS:
+            return None
+
+        bboxes = [(rect.x0, rect.y0, rect.x1, rect.y1) for rect in rects]
+        figures.append(EmbeddedImage(
+            extracted["image"],
+            extracted["ext"],
+            bboxes[0],
+            bboxes
+        ))
+
+    return figures or None
+
+
+def _text_coverage(page):
+    page_area = abs(page.rect)
+    if not page_area:
+        return 0.0
+
+    text_area = sum(
+        abs(fitz.Rect(block[:4]))
+        for block in page.get_text("blocks")
+        if block[6] == 0
+    )
+    return text_area / page_area
+
+
+def _has_vector_graphics(page):
+    # Rules and underlines are ignored; anything figure-sized (charts, table
+    # grids, diagrams) needs the rendered page.
+    return any(
+        drawing["rect"].width >= MIN_FIGURE_POINTS
+        and drawing["rect"].height >= MIN_FIGURE_POINTS
+        for drawing in page.get_drawings()
+    )
+
+
+def _page_content_hash(page, text):
+    # Text, drawing operators and embedded images together decide whether a
+    # page has to be rendered and embedded again. An image is identified by
+    # its object dictionary (size, filters, compressed length) rather than
+    # its stream; only unfiltered streams, whose length merely restates the
+    # image size, are read.
+    hasher = hashlib.md5(text.encode("utf-8"))
+    hasher.update(page.read_contents())
+    for image in page.get_images(full=True):
+        definition = page.parent.xref_object(image[0], compressed=True)
+        hasher.update(definition.encode("utf-8"))
+        if "/Filter" not in definition:
+            hasher.update(page.parent.xref_stream_raw(image[0]) or b"")
+    return hasher.hexdigest()
 
 
 def _index_page_text(
@@ -67,38 +531,42 @@ def _index_page_text(
     filename,
     page_index,
     file_hash,
+    page_hash,
     parent_splitter,
     child_splitter,
     get_collection_by_language,
-    detect_language,
+    detect_languages,
     source
 ):
-    parent_chunks = parent_splitter.split_text(page_content)
+    children = [
+        (p_id, c_id, child)
+        for p_id, parent in enumerate(parent_splitter.split_text(page_content))
+        for c_id, child in enumerate(child_splitter.split_text(parent))
+    ]
+    # The whole page is routed in one call rather than chunk by chunk.
+    languages = detect_languages([child for _, _, child in children])
     batches = {}
 
-    for p_id, parent in enumerate(parent_chunks):
-        child_chunks = child_splitter.split_text(parent)
-
-        for c_id, child in enumerate(child_chunks):
-            language = detect_language(child)
-            target_col = get_collection_by_language(language)
-            batch = batches.setdefault(
-                language,
-                {"collection": target_col, "documents": [], "ids": [], "metadatas": []}
-            )
-            batch["documents"].append(child)
-            batch["ids"].append(f"{filename}_p{page_index}_P{p_id}_C{c_id}")
-            batch["metadatas"].append({
-                "page": page_index,
-                "document": filename,
-                "source": source,
-                "file_hash": file_hash,
-                "content_type": "text",
-                "source_type": "pdf",
-                "language": language,
-                "parent_chunk_index": p_id,
-                "child_chunk_index": c_id
-            })
+    for (p_id, c_id, child), language in zip(children, languages):
+        target_col = get_collection_by_language(language)
+        batch = batches.setdefault(
+            language,
+            {"collection": target_col, "documents": [], "ids": [], "metadatas": []}
+        )
+        batch["documents"].append(child)
+        batch["ids"].append(f"{filename}_p{page_index}_P{p_id}_C{c_id}")
+        batch["metadatas"].append({
+            "page": page_index,
+            "document": filename,
+            "source": source,
+            "file_hash": file_hash,
+            "page_hash": page_hash,
+            "content_type": "text",
+            "source_type": "pdf",
+            "language": language,
+            "parent_chunk_index": p_id,
+            "child_chunk_index": c_id
+        })
 
     # One add per language collection is much cheaper than one add per chunk.
     for batch in batches.values():
@@ -108,28 +576,17 @@ def _index_page_text(
             metadatas=batch["metadatas"]
         )
 
+    return [chunk_id for batch in batches.values() for chunk_id in batch["ids"]]
+
 
 def _index_page_images(
-    page,
-    filename,
-    page_index,
-    file_hash,
-    blob_storage_path,
-    yolo,
-    device,
+    page_img,
+    result,
+    figure_metadata,
     ignored_layout_classes,
-    image_collection
+    figures
 ):
-    pix = page.get_pixmap(dpi=200)
-    page_img = Image.open(
-        io.BytesIO(pix.tobytes("png"))
-    )
-
-    results = yolo(page_img, conf=0.5, device=device)
-    if not results:
-        return
-
-    result = results[0]
+    image_ids = []
 
     for det_id, box in enumerate(result.boxes):
         class_id = int(box.cls[0])
@@ -138,34 +595,197 @@ def _index_page_images(
         if class_name in ignored_layout_classes:
             continue
 
-        x0, y0, x1, y1 = map(
-            int,
-            box.xyxy[0].tolist()
+        x0, y0, x1, y1 = (
+            max(0, int(value))
+            for value in box.xyxy[0].tolist()
         )
+        if x1 <= x0 or y1 <= y0:
+            continue
 
-        crop = page_img.crop(
-            (x0, y0, x1, y1)
+        # Only the crop is copied out of the page raster.
+        crop = Image.fromarray(
+            np.ascontiguousarray(page_img[y0:y1, x0:x1])
         )
 
-        img_path = os.path.join(
-            blob_storage_path,
-            f"{filename}_p{page_index}_fig{det_id}.png"
+        image_id = figures.add(crop, {
+            **figure_metadata,
+            "source_type": "pdf_crop",
+            "layout_class": class_name,
+            "detection_index": det_id
+        })
+        if image_id not in image_ids:
+            image_ids.append(image_id)
+
+    return image_ids
+
+
+def _index_embedded_images(page, figure_metadata, figures):
+    image_ids = []
+
+    for image_index, embedded in enumerate(page.embedded_images):
+        try:
+            image = Image.open(io.BytesIO(embedded.data)).convert("RGB")
+        except Exception as e:
+            print(
+                f"Skipping undecodable image on page {page.index} of "
+                f"{figure_metadata['document']}: {e}"
+            )
+            continue
+
+        # The original bytes are stored as-is: no re-encode, no quality loss.
+        image_id = figures.add(
+            image,
+            {
+                **figure_metadata,
+                "source_type": "pdf_embedded_image",
+                "layout_class": "Picture",
+                "bbox": json.dumps([round(value, 1) for value in embedded.bbox]),
+                "bboxes": json.dumps([
+                    [round(value, 1) for value in bbox]
+                    for bbox in embedded.bboxes or [embedded.bbox]
+                ]),
+                "detection_index": image_index
+            },
+            data=embedded.data,
+            ext=embedded.ext
         )
+        if image_id not in image_ids:
+            image_ids.append(image_id)
 
-        crop.save(img_path)
-        image_id = str(uuid.uuid4())
+    return image_ids
 
-        image_collection.add(
-            ids=[image_id],
-            uris=[os.path.abspath(img_path)],
-            metadatas=[{
-                "source": img_path,
-                "page": page_index,
-                "document": filename,
-                "file_hash": file_hash,
-                "content_type": "image",
-                "source_type": "pdf_crop",
-                "layout_class": class_name,
-                "detection_index": det_id
-            }]
+
+class _FigureWriter:
+    """
+    Buffers a document's figures for batched image-collection adds.
+
+    Figures go through the content-addressed blob store, so one repeated on
+    several pages (a logo, a watermark) becomes a single record listing all
+    its pages, and one already embedded for another document reuses that
+    vector instead of a new CLIP pass.
+    """
+
+    def __init__(
+        self,
+        filename,
+        blob_store,
+        image_collection,
+        embed_images,
+        batch_size,
+        existing_ids=()
+    ):
+        self.filename = filename
+        self.blob_store = blob_store
+        self.image_collection = image_collection
+        self.embed_images = embed_images
+        self.batch_size = batch_size
+        # Pages referencing each figure record in this version of the document.
+        self.page_refs = {}
+        self._existing_ids = set(existing_ids)
+        self._batch = {
+            "ids": [],
+            "images": [],
+            "embeddings": [],
+            "uris": [],
+            "metadatas": []
+        }
+
+    def add(self, image, metadata, data=None, ext="png"):
+        blob_id, path, is_new = self.blob_store.put(image, data=data, ext=ext)
+        image_id = f"{self.filename}_{blob_id}"
+        page = metadata["page"]
+
+        if image_id in self.page_refs:
+            # The record already holds a reference to the blob.
+            self.blob_store.release(blob_id)
+            if page not in self.page_refs[image_id]:
+                self.page_refs[image_id].append(page)
+            return image_id
+
+        self.page_refs[image_id] = [page]
+        if image_id in self._existing_ids:
+            # Written for the previous version; only its page references change.
+            self.blob_store.release(blob_id)
+            return image_id
+
+        self._batch["ids"].append(image_id)
+        self._batch["images"].append(image)
+        self._batch["embeddings"].append(
+            None if is_new else self._stored_embedding(blob_id)
+        )
+        self._batch["uris"].append(path)
+        self._batch["metadatas"].append({
+            **metadata,
+            "source": path,
+            "blob_id": blob_id,
+            "pages": json.dumps([page])
+        })
+
+        if len(self._batch["ids"]) >= self.batch_size:
+            self.flush()
+
+        return image_id
+
+    def discard(self):
+        # Figures never written hand back the blob references put took.
+        for metadata in self._batch["metadatas"]:
+            self.blob_store.release(metadata["blob_id"])
+        for values in self._batch.values():
+            values.clear()
+
+    def reference(self, image_ids, page):
+        for image_id in image_ids:
+            pages = self.page_refs.setdefault(image_id, [])
+            if page not in pages:
+                pages.append(page)
+
+    def flush(self):
+        if not self._batch["ids"]:
+            return
+
+        # Only figures without a stored vector are embedded, from memory and
+        # in one CLIP pass; Chroma never reopens the saved files.
+        embeddings = self._batch["embeddings"]
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            computed = self.embed_images([self._batch["images"][i] for i in missing])
+            for i, embedding in zip(missing, computed):
+                embeddings[i] = embedding
+
+        self.image_collection.add(
+            ids=self._batch["ids"],
+            embeddings=embeddings,
+            uris=self._batch["uris"],
+            metadatas=self._batch["metadatas"]
+        )
+
+        for values in self._batch.values():
+            values.clear()
+
+    def refresh_page_references(self):
+        image_ids = [
+            image_id for image_id, pages in self.page_refs.items()
+            if len(pages) > 1 or image_id in self._existing_ids
+        ]
+        if not image_ids:
+            return
+
+        # Only the page keys are sent: Chroma merges them into the stored
+        # metadata, leaving a caption written meanwhile in place.
+        metadatas = []
+        for image_id in image_ids:
+            pages = sorted(self.page_refs[image_id])
+            metadatas.append({"page": pages[0], "pages": json.dumps(pages)})
+
+        self.image_collection.update(ids=image_ids, metadatas=metadatas)
+
+    def _stored_embedding(self, blob_id):
+        stored = self.image_collection.get(
+            where={"blob_id": blob_id},
+            limit=1,
+            include=["embeddings"]
         )
+        embeddings = stored.get("embeddings")
+        if embeddings is None or len(embeddings) == 0:
+            return None
+        return embeddings[0]
@@ -1,6 +1,60 @@
+import threading
+from collections import OrderedDict
+
+from smart_doc.retrieval.embedding_cache import normalise_text
 from smart_doc.utils.image import encode_image_from_path
 
 
+class QueryEmbedder:
+    """
+    Embeds a prompt once per model and keeps the most recent prompt vectors,
+    so repeated retrievals within and across requests skip the embedder.
+    embedders maps a collection name to the embedding function it uses.
+    """
+
+    def __init__(self, embedders: dict, max_size: int = 256):
+        self.embedders = embedders
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._vectors = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __call__(self, collection, prompt):
+        embedder = self.embedders.get(collection.name)
+        if embedder is None:
+            return None
+
+        key = (collection.name, normalise_text(prompt))
+        with self._lock:
+            vector = self._vectors.get(key)
+            if vector is not None:
+                self._vectors.move_to_end(key)
+                self.hits += 1
+                return vector
+            self.misses += 1
+
+        vector = embedder.embed_query([prompt])[0]
+
+        with self._lock:
+            self._vectors[key] = vector
+            self._vectors.move_to_end(key)
+            while len(self._vectors) > self.max_size:
+                self._vectors.popitem(last=False)
+
+        return vector
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else None,
+                "size": len(self._vectors)
+            }
+
+
 def query_collections(
     prompt,
     get_collection,
@@ -8,8 +62,14 @@ def query_collections(
     k_text=6,
     k_image=4,
     document=None,
-    include_encoded_images=True
+    include_encoded_images=True,
+    embed_query=None
 ):
+    """
+    embed_query(collection, prompt), when given, supplies the prompt's vector
+    for a collection, so Chroma is queried by embedding instead of embedding
+    the prompt again itself.
+    """
     where_filter = None
 
     if document and document != "all":
@@ -19,14 +79,14 @@ def query_collections(
 
     target_col = get_collection(prompt)
     text_res = target_col.query(
-        query_texts=[prompt],
+        **_query_input(prompt, target_col, embed_query),
         n_results=k_text,
         where=where_filter,
         include=["documents", "metadatas"]
     )
 
     img_res = image_collection.query(
-        query_texts=[prompt],
+        **_query_input(prompt, image_collection, embed_query),
         n_results=k_image,
         where=where_filter,
         include=["uris", "metadatas"]
@@ -48,6 +108,13 @@ def query_collections(
             )
         paths.append(uri)
 
+    # Figure captions are cheap text stand-ins for the images themselves.
+    captions = [
+        meta["caption"]
+        for meta in image_metadata
+        if meta and meta.get("caption")
+    ]
+
     text_metadata = text_res.get("metadatas", [[]])[0]
     citations = _build_citations(text_metadata, image_metadata)
 
@@ -59,11 +126,19 @@ def query_collections(
         "text_metadata": text_metadata,
         "images": encoded_images,
         "image_metadata": image_metadata,
+        "captions": captions,
         "citations": citations,
         "paths": paths
     }
 
 
+def _query_input(prompt, collection, embed_query):
+    vector = embed_query(collection, prompt) if embed_query else None
+    if vector is None:
+        return {"query_texts": [prompt]}
+    return {"query_embeddings": [vector]}
+
+
 def _build_citations(text_metadata, image_metadata):
     citations = []
     seen = set()
@@ -1,7 +1,12 @@
 import os
+import threading
+import time
+from collections import Counter
 
 import chromadb
+from PIL import Image
 
+from smart_doc.retrieval.blob_store import BlobStore, content_hash
 from smart_doc.retrieval.components import (
     RAGConfig,
     create_collections,
@@ -10,20 +15,31 @@ from smart_doc.retrieval.components import (
     load_caption_model,
     load_yolo_model,
 )
+from smart_doc.retrieval.document_registry import (
+    FAILED,
+    INDEXED,
+    INGESTING,
+    DocumentRegistry,
+)
+from smart_doc.retrieval.embedding_cache import EmbeddingCache
+from smart_doc.retrieval.figure_captioning import CaptionCache, FigureCaptioner
 from smart_doc.retrieval.file_utils import (
+    IMAGE_EXTENSIONS,
+    SPREADSHEET_EXTENSIONS,
     SUPPORTED_DOCUMENT_EXTENSIONS,
     compute_file_hash,
-    list_supported_documents,
 )
-from smart_doc.retrieval.image_ingestion import add_image_file, caption_image
+from smart_doc.retrieval.image_ingestion import add_image_file, caption_images
 from smart_doc.retrieval.language import (
     detect_text_language,
+    detect_text_languages,
     get_text_collection,
     get_text_collection_by_language,
 )
 from smart_doc.retrieval.pdf_ingestion import add_pdf_file
-from smart_doc.retrieval.query import query_collections
+from smart_doc.retrieval.query import QueryEmbedder, query_collections
 from smart_doc.retrieval.spreadsheet_ingestion import add_spreadsheet_file
+from smart_doc.retrieval.table_store import TableStore
 from smart_doc.retrieval.text_ingestion import add_text_file
 
 
@@ -33,53 +49,386 @@ class RAGEngine:
         chroma_client: chromadb.ClientAPI,
         blob_storage_path: str = "backend/data/blob_storage",
         documents_path: str = "backend/data/documents",
-        config: RAGConfig | None = None
+        config: RAGConfig | None = None,
+        registry_path: str = "backend/data/document_registry.sqlite3",
+        table_store_path: str = "backend/data/spreadsheet_tables.sqlite3",
+        shared_blob_storage: bool = False,
+        embedding_cache_path: str = "backend/data/embedding_cache"
     ):
+        """
+        shared_blob_storage marks an engine whose collections do not hold
+        every record pointing into blob_storage_path, such as a bulk-ingestion
+        worker; it then never removes figure files written before the blob
+        store, since others may still use them. Blobs are reference counted
+        and released as usual.
+        """
+        start = time.perf_counter()
         self.__config = config or RAGConfig()
         self.__device = get_torch_device()
         print(f"Using device: {self.__device}")
 
         self.__blob_storage_path = blob_storage_path
         os.makedirs(self.__blob_storage_path, exist_ok=True)
+        self.__shared_blob_storage = shared_blob_storage
+        self.__blob_store = BlobStore(
+            self.__blob_storage_path,
+            near_duplicate_distance=self.__config.near_duplicate_distance
+        )
+        self.__caption_cache = CaptionCache(
+            os.path.join(self.__blob_storage_path, "caption_cache.sqlite3")
+        )
 
         self.__documents_path = documents_path
         os.makedirs(self.__documents_path, exist_ok=True)
 
+        self.__embedding_cache = None
+        if self.__config.embedding_cache:
+            self.__embedding_cache = EmbeddingCache(
+                embedding_cache_path,
+                max_entries=self.__config.embedding_cache_max_entries
+            )
+
         self.__collections = create_collections(
             chroma_client,
             self.__device,
-            self.__config
+            self.__config,
+            embedding_cache=self.__embedding_cache
         )
         self.__splitters = create_splitters(self.__config)
+        self.__query_embedder = QueryEmbedder(
+            {
+                self.__collections.english_text.name: self.__collections.text_embedders["english"],
+                self.__collections.arabic_text.name: self.__collections.text_embedders["arabic"],
+                self.__collections.images.name: self.__collections.image_embedder
+            },
+            max_size=self.__config.query_embedding_cache_size
+        )
+
+        if self.__blob_store.uncounted():
+            self._count_blob_references()
+
+        self.__tables = TableStore(table_store_path)
+        self.__registry = DocumentRegistry(registry_path)
+        if self.__registry.is_empty():
+            self._backfill_registry()
+        self._clean_up_interrupted()
 
         # Heavy vision models are loaded only when their ingestion paths need them.
         self.__yolo = None
         self.__caption_processor = None
         self.__caption_model = None
 
+        # Ingestion can run on several threads; the vision models are shared
+        # and not thread-safe, so loading and inference are serialised.
+        self.__model_lock = threading.Lock()
+        self.__yolo_lock = threading.Lock()
+        self.__caption_lock = threading.Lock()
+
+        # Running totals of how PDF pages were handled during ingestion.
+        self.__page_stats = Counter()
+        self.__stats_lock = threading.Lock()
+
+        # Ingestions in flight; background captioning yields to them.
+        self.__active_ingestions = 0
+        self.__figure_captioner = FigureCaptioner(
+            self.caption_images,
+            self.__collections.images,
+            self._get_collection_by_language,
+            self._detect_languages,
+            batch_size=self.__config.caption_batch_size,
+            is_busy=lambda: self.__active_ingestions > 0
+        )
+
+        # Embedding models load on first use unless warmed up here.
+        if self.__config.warm_up_embedders:
+            self.__collections.warm_up()
+
+        print(f"RAG engine ready in {time.perf_counter() - start:.2f}s")
+
     def _compute_file_hash(self, file_path: str) -> str:
         return compute_file_hash(file_path)
 
     def _is_file_indexed(self, file_hash: str) -> bool:
-        where = {"file_hash": file_hash}
-        collections = (
+        record = self.__registry.get(file_hash)
+        return record is not None and record["status"] == INDEXED
+
+    def _all_collections(self):
+        return (
             self.__collections.arabic_text,
             self.__collections.english_text,
             self.__collections.images,
         )
 
-        for collection in collections:
-            result = collection.get(where=where, limit=1)
-            if result.get("ids"):
-                return True
+    def _named_collections(self):
+        return {
+            "arabic_text": self.__collections.arabic_text,
+            "english_text": self.__collections.english_text,
+            "images": self.__collections.images,
+        }
+
+    def _purge_file(self, file_hash: str):
+        # Removes whatever a crashed or failed ingestion managed to write.
+        self.__tables.remove_file(file_hash)
+        self.__collections.arabic_text.delete(where={"file_hash": file_hash})
+        self.__collections.english_text.delete(where={"file_hash": file_hash})
+
+        images = self.__collections.images.get(
+            where={"file_hash": file_hash},
+            include=[]
+        )
+        self._delete_records([], images.get("ids", []))
+
+    def _clean_up_interrupted(self):
+        # Files still marked as ingesting were cut off when an earlier process
+        # stopped. What they wrote is purged; they stay listed as failed.
+        for record in self.__registry.unfinished():
+            if record["status"] == INGESTING:
+                self._purge_file(record["file_hash"])
+                self.__registry.fail(record["file_hash"], "Ingestion was interrupted")
+                print(f"Purged the interrupted ingestion of {record['document']}")
+
+    def _count_blob_references(self):
+        """
+        One-off count of the image records pointing at each blob stored
+        before blobs were reference counted.
+        """
+        counts = Counter()
+        page_size = 5000
+        offset = 0
+
+        while True:
+            result = self.__collections.images.get(
+                include=["metadatas"],
+                limit=page_size,
+                offset=offset
+            )
+            ids = result.get("ids", [])
+            if not ids:
+                break
+
+            for metadata in result["metadatas"]:
+                blob_id = (metadata or {}).get("blob_id")
+                if blob_id:
+                    counts[blob_id] += 1
+            offset += len(ids)
+
+        self.__blob_store.set_references(counts)
+        print(f"Blob references counted for {len(counts)} blobs")
+
+    def _backfill_registry(self):
+        """
+        One-off scan of collections written before the registry existed, so
+        their files keep deduplicating and listing.
+        """
+        files = {}
+        page_size = 5000
+
+        for collection in self._all_collections():
+            offset = 0
+            while True:
+                result = collection.get(
+                    include=["metadatas"],
+                    limit=page_size,
+                    offset=offset
+                )
+                ids = result.get("ids", [])
+                if not ids:
+                    break
+
+                for record_id, metadata in zip(ids, result["metadatas"]):
+                    file_hash = (metadata or {}).get("file_hash")
+                    if not file_hash:
+                        continue
+
+                    entry = files.setdefault(file_hash, {
+                        "document": metadata.get("document", ""),
+                        "source_type": None,
+                        "chunk_ids": [],
+                        "image_ids": [],
+                        "page_count": None,
+                    })
+                    if metadata.get("source_type") != "image_caption":
+                        entry["source_type"] = metadata.get("source_type")
+
+                    key = "image_ids" if metadata.get("content_type") == "image" else "chunk_ids"
+                    entry[key].append(record_id)
+
+                    if isinstance(metadata.get("page"), int):
+                        entry["page_count"] = max(
+                            entry["page_count"] or 0,
+                            metadata["page"] + 1
+                        )
+
+                offset += len(ids)
+
+        for file_hash, entry in files.items():
+            self.__registry.add_indexed(file_hash, **entry)
+
+        if files:
+            print(f"Document registry backfilled with {len(files)} files")
+
+    def _delete_records(self, chunk_ids, image_ids):
+        if chunk_ids:
+            self.__collections.arabic_text.delete(ids=chunk_ids)
+            self.__collections.english_text.delete(ids=chunk_ids)
+
+        if not image_ids:
+            return
+
+        # Captions written for the images, by ingestion or in the background.
+        caption_ids = [f"{image_id}_caption" for image_id in image_ids]
+        self.__collections.arabic_text.delete(ids=caption_ids)
+        self.__collections.english_text.delete(ids=caption_ids)
+
+        stale = self.__collections.images.get(
+            ids=image_ids,
+            include=["uris", "metadatas"]
+        )
+        self.__collections.images.delete(ids=image_ids)
+
+        blob_root = os.path.abspath(self.__blob_storage_path)
+        for uri, metadata in zip(stale.get("uris") or [], stale.get("metadatas") or []):
+            blob_id = (metadata or {}).get("blob_id")
+            if blob_id:
+                # Each image record holds one reference to its blob.
+                self.__blob_store.release(blob_id)
+            # Crops written before the blob store, and only those we own;
+            # standalone images point at the uploaded file itself.
+            elif (
+                not self.__shared_blob_storage
+                and uri
+                and os.path.dirname(os.path.abspath(uri)) == blob_root
+                and os.path.exists(uri)
+            ):
+                os.remove(uri)
+
+    def _release_blobs(self, metadatas):
+        for metadata in metadatas or []:
+            blob_id = (metadata or {}).get("blob_id")
+            if blob_id:
+                self.__blob_store.release(blob_id)
+
+    def _retag_records(self, record_ids, file_hash):
+        # Records reused from a previous version now belong to the new file,
+        # and so do the captions of reused images.
+        record_ids = record_ids + [f"{record_id}_caption" for record_id in record_ids]
+        for collection in self._all_collections():
+            existing = collection.get(ids=record_ids, include=["metadatas"])
+            if not existing.get("ids"):
+                continue
+
+            metadatas = [
+                {**(metadata or {}), "file_hash": file_hash}
+                for metadata in existing["metadatas"]
+            ]
+            collection.update(ids=existing["ids"], metadatas=metadatas)
+
+    def _ingest(
+        self,
+        file_path,
+        source_type,
+        file_hash,
+        progress,
+        ingest,
+        incremental=False
+    ):
+        """
+        Shared dedup, registry and cleanup around one ingestion function.
+
+        ingest(file_hash, progress, previous_pages) returns the ids it wrote.
+        An earlier indexed version of the same document name is replaced: its
+        records are deleted up front, unless the ingestion is incremental and
+        can reuse them page by page. Record ids are derived from the document
+        name, so the old records cannot outlive the new ones being written;
+        if ingestion fails, the earlier version is purged and marked failed
+        rather than left listed as indexed.
+        """
+        progress = progress or _ignore_progress
+        if file_hash is None:
+            progress("hashing")
+            file_hash = self._compute_file_hash(file_path)
+
+        document = os.path.basename(file_path)
+        status = self.__registry.start(file_hash, document, source_type)
+        if status == INDEXED:
+            return {"status": "skipped", "reason": "duplicate_file"}
+        if status == INGESTING:
+            # The same content is being ingested by another upload right now.
+            return {"status": "skipped", "reason": "in_progress"}
+        if status == FAILED:
+            # A previous attempt failed half way; start clean.
+            self._purge_file(file_hash)
+
+        previous = self.__registry.latest_indexed(document, exclude_hash=file_hash)
+        previous_pages = {}
+
+        if previous is not None:
+            previous_pages = previous["pages"] if incremental else {}
+            paged_ids = {
+                record_id
+                for page in previous_pages.values()
+                for record_id in page["chunk_ids"] + page["image_ids"]
+            }
+            self._delete_records(
+                [i for i in previous["chunk_ids"] if i not in paged_ids],
+                [i for i in previous["image_ids"] if i not in paged_ids]
+            )
+
+        with self.__stats_lock:
+            self.__active_ingestions += 1
+        try:
+            indexed = ingest(file_hash, progress, previous_pages)
+        except Exception as e:
+            self._purge_file(file_hash)
+            self.__registry.fail(file_hash, str(e))
+            if previous is not None:
+                # Its records were deleted or overwritten above, so it must
+                # not stay listed as indexed; a re-upload indexes it again.
+                self._purge_file(previous["file_hash"])
+                self.__registry.fail(
+                    previous["file_hash"],
+                    f"Removed when replacing it failed: {e}"
+                )
+            raise
+        finally:
+            with self.__stats_lock:
+                self.__active_ingestions -= 1
+
+        if indexed.get("reused_ids"):
+            self._retag_records(indexed["reused_ids"], file_hash)
+
+        self.__registry.complete(
+            file_hash,
+            indexed.get("chunk_ids", []),
+            indexed.get("image_ids", []),
+            page_count=indexed.get("page_count"),
+            pages=indexed.get("pages")
+        )
+
+        if previous is not None:
+            self.__tables.remove_file(previous["file_hash"])
+            self.__registry.remove(previous["file_hash"])
 
-        return False
+        return {"status": "indexed"}
 
     def _get_collection(self, text):
         return get_text_collection(
             text,
             self.__collections.arabic_text,
-            self.__collections.english_text
+            self.__collections.english_text,
+            fallback=self.__config.language_detection_fallback
+        )
+
+    def _detect_language(self, text):
+        return detect_text_language(
+            text,
+            fallback=self.__config.language_detection_fallback
+        )
+
+    def _detect_languages(self, texts):
+        return detect_text_languages(
+            texts,
+            fallback=self.__config.language_detection_fallback
         )
 
     def _get_collection_by_language(self, language):
@@ -89,70 +438,159 @@ class RAGEngine:
             self.__collections.english_text
         )
 
-    def add_txt(self, file_path):
-        file_hash = self._compute_file_hash(file_path)
-        if self._is_file_indexed(file_hash):
-            return {"status": "skipped", "reason": "duplicate_file"}
+    def add_txt(self, file_path, progress=None, file_hash=None):
+        def ingest(file_hash, progress, previous_pages):
+            progress("indexing")
+            return add_text_file(
+                file_path,
+                self.__splitters.child,
+                self._get_collection_by_language,
+                self._detect_languages,
+                file_hash
+            )
 
-        add_text_file(
-            file_path,
-            self.__splitters.child,
-            self._get_collection_by_language,
-            detect_text_language,
-            file_hash
-        )
-        return {"status": "indexed"}
+        return self._ingest(file_path, "txt", file_hash, progress, ingest)
 
-    def _caption_image(self, pil_image):
-        self._ensure_caption_model()
-        return caption_image(
-            pil_image,
-            self.__caption_processor,
-            self.__caption_model
-        )
+    def _embed_images(self, images):
+        return self.__collections.image_embedder(images)
+
+    def caption_images(self, images):
+        """
+        Caption a list of PIL images in batched generate calls. Captions are
+        cached by image content, so an image seen before, in this upload or
+        an earlier one, is never captioned twice.
+        """
+        images = [image.convert("RGB") for image in images]
+        hashes = [content_hash(image) for image in images]
+        model_id = self.__config.caption_model_path
+        captions = self.__caption_cache.cached_captions(hashes, model_id)
+
+        # First image of each uncached content hash, so duplicates are captioned once.
+        missing = {}
+        for image, image_hash in zip(images, hashes):
+            if image_hash not in captions:
+                missing.setdefault(image_hash, image)
+
+        if missing:
+            self._ensure_caption_model()
+            with self.__caption_lock:
+                generated = caption_images(
+                    list(missing.values()),
+                    self.__caption_processor,
+                    self.__caption_model,
+                    batch_size=self.__config.caption_batch_size
+                )
+
+            new_captions = dict(zip(missing, generated))
+            self.__caption_cache.cache_captions(new_captions, model_id)
+            captions.update(new_captions)
+
+        return [captions[image_hash] for image_hash in hashes]
+
+    def caption_files(self, paths):
+        """
+        Warm the caption cache for the image files among paths, a batch at a
+        time, so ingesting them one by one afterwards costs no model calls.
+        """
+        image_paths = [
+            path for path in paths
+            if os.path.splitext(path)[1].lower() in IMAGE_EXTENSIONS
+        ]
+        batch_size = self.__config.caption_batch_size
+
+        for start in range(0, len(image_paths), batch_size):
+            images = []
+            for path in image_paths[start:start + batch_size]:
+                try:
+                    with Image.open(path) as image:
+                        images.append(image.convert("RGB"))
+                except Exception as e:
+                    print(f"Skipping caption warm-up for {path}: {e}")
+
+            if images:
+                self.caption_images(images)
 
     def _ensure_caption_model(self):
-        if self.__caption_processor is not None and self.__caption_model is not None:
-            return
+        with self.__model_lock:
+            if self.__caption_processor is not None and self.__caption_model is not None:
+                return
 
-        self.__caption_processor, self.__caption_model = load_caption_model(
-            self.__config,
-            self.__device
-        )
+            self.__caption_processor, self.__caption_model = load_caption_model(
+                self.__config,
+                self.__device
+            )
 
     def _ensure_yolo_model(self):
-        if self.__yolo is not None:
-            return
+        with self.__model_lock:
+            if self.__yolo is not None:
+                return
 
-        # YOLO is only needed for PDF image extraction, not normal querying.
-        self.__yolo = load_yolo_model(self.__config, self.__device)
-
-    def add_pdf(self, file_path):
-        file_hash = self._compute_file_hash(file_path)
-        if self._is_file_indexed(file_hash):
-            return {"status": "skipped", "reason": "duplicate_file"}
+            # YOLO is only needed for PDF image extraction, not normal querying.
+            self.__yolo = load_yolo_model(self.__config, self.__device)
 
+    def _detect_layouts(self, page_images):
+        # Loaded on first use: PDFs whose pages are all text-only or carry
+        # embedded images never need the detector.
         self._ensure_yolo_model()
-        add_pdf_file(
+
+        # One call over the whole batch; YOLO returns one result per image, in order.
+        with self.__yolo_lock:
+            return self.__yolo(page_images, conf=0.5, device=self.__device)
+
+    def add_pdf(self, file_path, progress=None, file_hash=None):
+        def ingest(file_hash, progress, previous_pages):
+            progress("indexing")
+            indexed = add_pdf_file(
+                file_path,
+                self.__documents_path,
+                self.__blob_store,
+                file_hash,
+                self.__splitters.parent,
+                self.__splitters.child,
+                self._detect_layouts,
+                self.__config.ignored_layout_classes,
+                self._get_collection_by_language,
+                self._detect_languages,
+                self.__collections.images,
+                self._embed_images,
+                self._delete_records,
+                page_workers=self.__config.pdf_page_workers,
+                yolo_batch_size=self.__config.yolo_batch_size,
+                image_write_batch_size=self.__config.image_write_batch_size,
+                progress=progress,
+                previous_pages=previous_pages,
+                text_only_min_coverage=self.__config.text_only_min_coverage
+            )
+
+            with self.__stats_lock:
+                self.__page_stats.update(indexed["stats"])
+            figure_ids.extend(indexed["image_ids"])
+            return indexed
+
+        figure_ids = []
+        result = self._ingest(
             file_path,
-            self.__documents_path,
-            self.__blob_storage_path,
+            "pdf",
             file_hash,
-            self.__splitters.parent,
-            self.__splitters.child,
-            self.__yolo,
-            self.__device,
-            self.__config.ignored_layout_classes,
-            self._get_collection_by_language,
-            detect_text_language,
-            self.__collections.images
+            progress,
+            ingest,
+            incremental=True
         )
-        return {"status": "indexed"}
 
-    def add_file(self, path: str):
+        # Figures are captioned once the document is searchable, off the upload path.
+        if self.__config.background_captioning:
+            self.__figure_captioner.submit(figure_ids)
+
+        return result
+
+    def add_file(self, path: str, progress=None, file_hash: str | None = None):
         """
         Add a supported file by detecting its extension and routing it to the
         matching ingestion method.
+
+        progress, when given, is called as progress(stage, done, total) while
+        the file is ingested; done/total count pages for PDFs. Pass file_hash
+        when the content hash is already known to skip re-reading the file.
         """
         if not os.path.exists(path):
             raise FileNotFoundError(f"File not found: {path}")
@@ -160,52 +598,53 @@ class RAGEngine:
         extension = os.path.splitext(path)[1].lower()
 
         if extension == ".pdf":
-            return self.add_pdf(path)
+            return self.add_pdf(path, progress, file_hash)
 
         if extension == ".txt":
-            return self.add_txt(path)
+            return self.add_txt(path, progress, file_hash)
 
-        if extension in {".png", ".jpg", ".jpeg", ".webp"}:
-            return self.add_image(path)
+        if extension in IMAGE_EXTENSIONS:
+            return self.add_image(path, progress, file_hash)
 
-        if extension in {".xlsx", ".csv"}:
-            return self.add_spreadsheet(path)
+        if extension in SPREADSHEET_EXTENSIONS:
+            return self.add_spreadsheet(path, progress, file_hash)
 
         supported = ", ".join(sorted(SUPPORTED_DOCUMENT_EXTENSIONS))
         raise ValueError(
             f"Unsupported file type '{extension}'. Supported types: {supported}"
         )
 
-    def add_image(self, file_path):
-        file_hash = self._compute_file_hash(file_path)
-        if self._is_file_indexed(file_hash):
-            return {"status": "skipped", "reason": "duplicate_file"}
-
-        self._ensure_caption_model()
-        add_image_file(
-            file_path,
-            self.__collections.images,
-            self._get_collection_by_language,
-            detect_text_language,
-            self.__caption_processor,
-            self.__caption_model,
-            file_hash
-        )
-        return {"status": "indexed"}
-
-    def add_spreadsheet(self, file_path):
-        file_hash = self._compute_file_hash(file_path)
-        if self._is_file_indexed(file_hash):
-            return {"status": "skipped", "reason": "duplicate_file"}
-
-        add_spreadsheet_file(
-            file_path,
-            self.__splitters.child,
-            self._get_collection_by_language,
-            detect_text_language,
-            file_hash
-        )
-        return {"status": "indexed"}
+    def add_image(self, file_path, progress=None, file_hash=None):
+        def ingest(file_hash, progress, previous_pages):
+            progress("indexing")
+            return add_image_file(
+                file_path,
+                self.__collections.images,
+                self._get_collection_by_language,
+                self._detect_language,
+                self.caption_images,
+                file_hash
+            )
+
+        return self._ingest(file_path, "standalone_image", file_hash, progress, ingest)
+
+    def add_spreadsheet(self, file_path, progress=None, file_hash=None):
+        source_type = os.path.splitext(file_path)[1].lower().lstrip(".")
+
+        def ingest(file_hash, progress, previous_pages):
+            progress("indexing")
+            return add_spreadsheet_file(
+                file_path,
+                self._get_collection_by_language,
+                self._detect_languages,
+                file_hash,
+                rows_per_chunk=self.__config.spreadsheet_rows_per_chunk,
+                max_chunk_chars=self.__config.child_chunk_size,
+                write_batch_size=self.__config.text_write_batch_size,
+                table_store=self.__tables
+            )
+
+        return self._ingest(file_path, source_type, file_hash, progress, ingest)
 
     def query(
         self,
@@ -222,8 +661,160 @@ class RAGEngine:
             k_text=k_text,
             k_image=k_image,
             document=document,
-            include_encoded_images=include_encoded_images
+            include_encoded_images=include_encoded_images,
+            embed_query=self.__query_embedder
         )
 
+    def query_embedding_stats(self):
+        """Hit rate of the prompt-vector LRU used by query."""
+        return self.__query_embedder.stats()
+
+    def describe_tables(self, document=None):
+        """Typed SQL tables loaded from spreadsheet uploads."""
+        return self.__tables.describe(
+            None if document in (None, "all") else document
+        )
+
+    def query_tables(self, sql):
+        """Run one read-only SELECT against the spreadsheet tables."""
+        return self.__tables.query(sql)
+
+    def export_file(self, file_hash, drop=False):
+        """
+        Records, embeddings and registry entry of an indexed file, in the form
+        import_file takes. With drop, the file's records are then removed from
+        this engine's collections and registry, but not its blobs or tables,
+        which the importing engine shares.
+        """
+        record = self.__registry.get(file_hash)
+        if record is None or record["status"] != INDEXED:
+            raise ValueError(f"File {file_hash} is not indexed")
+
+        collections = {}
+        for name, collection in self._named_collections().items():
+            data = collection.get(
+                where={"file_hash": file_hash},
+                include=["embeddings", "documents", "metadatas", "uris"]
+            )
+            if data.get("ids"):
+                collections[name] = {
+                    key: data.get(key)
+                    for key in ("ids", "embeddings", "documents", "metadatas", "uris")
+                }
+
+        if drop:
+            for collection in self._all_collections():
+                collection.delete(where={"file_hash": file_hash})
+            self.__registry.remove(file_hash)
+
+        return {"record": record, "collections": collections}
+
+    def import_file(self, export, write_batch_size=1000):
+        """
+        Write a file exported by another engine, embeddings included, so no
+        model runs here. Replaces the previous version of the same document.
+        """
+        record = export["record"]
+        file_hash = record["file_hash"]
+        collections = self._named_collections()
+        exported_images = export["collections"].get("images")
+
+        if self._is_file_indexed(file_hash):
+            # The exporting worker stored a reference for each figure.
+            if exported_images:
+                self._release_blobs(exported_images["metadatas"])
+            return {"status": "skipped", "reason": "duplicate_file"}
+
+        if exported_images and exported_images["ids"]:
+            # Upserting replaces these records, and with them their references.
+            replaced = self.__collections.images.get(ids=exported_images["ids"], include=["metadatas"])
+            self._release_blobs(replaced.get("metadatas"))
+
+        imported_ids = set()
+
+        for name, data in export["collections"].items():
+            ids = data["ids"]
+            imported_ids.update(ids)
+            columns = {"embeddings": data["embeddings"], "metadatas": data["metadatas"]}
+            for key in ("documents", "uris"):
+                values = data.get(key)
+                if values is not None and any(value is not None for value in values):
+                    columns[key] = values
+
+            for start in range(0, len(ids), write_batch_size):
+                end = start + write_batch_size
+                collections[name].upsert(
+                    ids=ids[start:end],
+                    **{key: values[start:end] for key, values in columns.items()}
+                )
+
+        # Written before the previous version goes, so figures both versions
+        # share keep their blobs.
+        previous = self.__registry.latest_indexed(record["document"], exclude_hash=file_hash)
+        if previous is not None:
+            self._delete_records(
+                [i for i in previous["chunk_ids"] if i not in imported_ids],
+                [i for i in previous["image_ids"] if i not in imported_ids]
+            )
+            self.__tables.remove_file(previous["file_hash"])
+            self.__registry.remove(previous["file_hash"])
+
+        self.__registry.add_indexed(
+            file_hash,
+            record["document"],
+            record["source_type"],
+            record["chunk_ids"],
+            record["image_ids"],
+            page_count=record["page_count"],
+            pages=record["pages"]
+        )
+        return {"status": "indexed"}
+
+    def wait_for_captions(self):
+        """Block until queued background figure captioning has finished."""
+        self.__figure_captioner.join()
+
+    def model_stats(self):
+        """
+        Which embedding models are loaded, their load time and resident
+        memory, and how their embedding batches have been filled.
+        """
+        return {
+            embedder.label: {
+                "loaded": embedder.loaded,
+                "load_seconds": embedder.load_seconds,
+                "resident_mb": embedder.resident_mb,
+                **embedder.service.stats()
+            }
+            for embedder in self.__collections.embedders()
+        }
+
+    def embedding_cache_stats(self):
+        """Hit rate and stored vectors of the text embedding cache, per model."""
+        if self.__embedding_cache is None:
+            return {}
+        return self.__embedding_cache.stats()
+
+    def page_stats(self):
+        """PDF pages skipped as text-only, reused, or processed so far."""
+        with self.__stats_lock:
+            return dict(self.__page_stats)
+
     def list_documents(self):
-        return list_supported_documents(self.__documents_path)
+        return self.__registry.list_documents()
+
+    def unfinished_documents(self):
+        """Files being ingested, or whose ingestion failed or was interrupted."""
+        return [
+            {
+                "document": record["document"],
+                "file_hash": record["file_hash"],
+                "status": record["status"],
+                "error": record["error"],
+            }
+            for record in self.__registry.unfinished()
+        ]
+
+
+def _ignore_progress(stage, done=None, total=None):
+    pass
@@ -1,100 +1,208 @@
 import csv
 import os
+import re
 import zipfile
+from contextlib import nullcontext
 import xml.etree.ElementTree as ET
 
 
+XLSX_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+
+
 def add_spreadsheet_file(
     file_path,
-    child_splitter,
     get_collection_by_language,
-    detect_language,
-    file_hash
+    detect_languages,
+    file_hash,
+    rows_per_chunk=20,
+    max_chunk_chars=1500,
+    write_batch_size=256,
+    table_store=None
 ):
+    """
+    Rows are streamed from the file and grouped into chunks of at most
+    rows_per_chunk rows (fewer when they would exceed max_chunk_chars), each
+    starting with its sheet's header row. At most write_batch_size chunks are
+    held before they are written.
+
+    With a table_store, the same pass also loads every sheet into it as a
+    typed SQL table.
+    """
     filename = os.path.basename(file_path)
     source = os.path.abspath(file_path)
     extension = os.path.splitext(file_path)[1].lower()
 
     if extension == ".csv":
-        text = _read_csv(file_path)
+        rows = _iter_csv_rows(file_path)
         source_type = "csv"
     elif extension == ".xlsx":
-        text = _read_xlsx(file_path)
+        rows = _iter_xlsx_rows(file_path)
         source_type = "xlsx"
     else:
         raise ValueError(f"Unsupported spreadsheet type: {extension}")
 
-    chunks = child_splitter.split_text(text)
-    batches = {}
+    chunk_ids = []
+    pending = []
 
-    for i, chunk in enumerate(chunks):
-        language = detect_language(chunk)
-        target_col = get_collection_by_language(language)
-        batch = batches.setdefault(
-            language,
-            {"collection": target_col, "documents": [], "ids": [], "metadatas": []}
-        )
-        batch["documents"].append(chunk)
-        batch["ids"].append(f"{filename}_sheet_chunk_{i}")
-        batch["metadatas"].append({
-            "document": filename,
-            "source": source,
-            "file_hash": file_hash,
-            "content_type": "text",
-            "source_type": source_type,
-            "language": language,
-            "chunk_index": i
-        })
-
-    for batch in batches.values():
-        batch["collection"].add(
-            documents=batch["documents"],
-            ids=batch["ids"],
-            metadatas=batch["metadatas"]
+    def flush():
+        languages = detect_languages([text for text, _ in pending])
+        batches = {}
+
+        for (text, metadata), language in zip(pending, languages):
+            chunk_index = metadata["chunk_index"]
+            batch = batches.setdefault(
+                language,
+                {
+                    "collection": get_collection_by_language(language),
+                    "documents": [],
+                    "ids": [],
+                    "metadatas": []
+                }
+            )
+            batch["documents"].append(text)
+            batch["ids"].append(f"{filename}_sheet_chunk_{chunk_index}")
+            batch["metadatas"].append({**metadata, "language": language})
+            chunk_ids.append(f"{filename}_sheet_chunk_{chunk_index}")
+
+        for batch in batches.values():
+            batch["collection"].add(
+                documents=batch["documents"],
+                ids=batch["ids"],
+                metadatas=batch["metadatas"]
+            )
+
+        pending.clear()
+
+    with (table_store.loader(filename, file_hash) if table_store else nullcontext()) as tables:
+        if tables is not None:
+            rows = _load_rows(rows, tables)
+
+        for chunk_index, chunk in enumerate(
+            _iter_row_chunks(rows, rows_per_chunk, max_chunk_chars)
+        ):
+            pending.append(_chunk_record(
+                chunk,
+                chunk_index,
+                filename,
+                source,
+                file_hash,
+                source_type
+            ))
+
+            if len(pending) >= write_batch_size:
+                flush()
+
+    if pending:
+        flush()
+
+    return {"chunk_ids": chunk_ids}
+
+
+def _chunk_record(chunk, chunk_index, filename, source, file_hash, source_type):
+    text, sheet, row_start, row_end = chunk
+    metadata = {
+        "document": filename,
+        "source": source,
+        "file_hash": file_hash,
+        "content_type": "text",
+        "source_type": source_type,
+        "chunk_index": chunk_index,
+        "row_start": row_start,
+        "row_end": row_end
+    }
+    if sheet is not None:
+        metadata["sheet"] = sheet
+    return text, metadata
+
+
+def _load_rows(rows, tables):
+    for sheet, row_number, values in rows:
+        tables.add_row(sheet, values)
+        yield sheet, row_number, values
+
+
+def _iter_row_chunks(rows, rows_per_chunk, max_chunk_chars):
+    """
+    Group (sheet, row_number, values) rows into (text, sheet, row_start, row_end)
+    chunks. The first row of each sheet is taken as its header and repeated at
+    the top of every chunk of that sheet.
+    """
+    sheet = header = header_row = None
+    group = []
+
+    def emit():
+        prefix = f"Sheet: {sheet}\n" if sheet is not None else ""
+        lines = [header] + [line for _, line in group]
+        row_start = group[0][0] if group else header_row
+        row_end = group[-1][0] if group else header_row
+        return prefix + "\n".join(lines), sheet, row_start, row_end
+
+    for row_sheet, row_number, values in rows:
+        line = _format_row(values)
+        if header is None or row_sheet != sheet:
+            if header is not None:
+                yield emit()
+            sheet, header, header_row = row_sheet, line, row_number
+            group = []
+            continue
+
+        size = (
+            len(f"Sheet: {sheet}\n" if sheet is not None else "")
+            + len(header)
+            + sum(len(text) + 1 for _, text in group)
+            + len(line) + 1
         )
+        if group and (len(group) >= rows_per_chunk or size > max_chunk_chars):
+            yield emit()
+            group = []
+
+        group.append((row_number, line))
+
+    if header is not None:
+        yield emit()
 
 
-def _read_csv(file_path):
-    rows = []
+def _iter_csv_rows(file_path):
     with open(file_path, "r", encoding="utf-8-sig", newline="") as f:
-        for row in csv.reader(f):
-            rows.append(" | ".join(cell.strip() for cell in row if cell.strip()))
-    return "\n".join(row for row in rows if row)
+        for row_number, row in enumerate(csv.reader(f), start=1):
+            if any(cell.strip() for cell in row):
+                yield None, row_number, row
 
 
-def _read_xlsx(file_path):
+def _iter_xlsx_rows(file_path):
     with zipfile.ZipFile(file_path) as workbook:
         shared_strings = _read_shared_strings(workbook)
         sheet_names = _read_sheet_names(workbook)
         sheet_paths = sorted(
-            name for name in workbook.namelist()
-            if name.startswith("xl/worksheets/sheet") and name.endswith(".xml")
+            (
+                name for name in workbook.namelist()
+                if name.startswith("xl/worksheets/sheet") and name.endswith(".xml")
+            ),
+            key=_sheet_number
         )
 
-        parts = []
         for index, sheet_path in enumerate(sheet_paths):
             sheet_name = sheet_names[index] if index < len(sheet_names) else sheet_path
-            rows = _read_xlsx_sheet(workbook, sheet_path, shared_strings)
-            if rows:
-                parts.append(f"Sheet: {sheet_name}\n" + "\n".join(rows))
-
-        return "\n\n".join(parts)
+            for row_number, values in _iter_xlsx_sheet(workbook, sheet_path, shared_strings):
+                if any(values):
+                    yield sheet_name, row_number, values
 
 
 def _read_shared_strings(workbook):
     if "xl/sharedStrings.xml" not in workbook.namelist():
         return []
 
-    root = ET.fromstring(workbook.read("xl/sharedStrings.xml"))
-    ns = {"x": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
     strings = []
+    with workbook.open("xl/sharedStrings.xml") as f:
+        for _, item in ET.iterparse(f):
+            if item.tag != f"{{{XLSX_NS}}}si":
+                continue
 
-    for item in root.findall("x:si", ns):
-        text_parts = [
-            node.text or ""
-            for node in item.findall(".//x:t", ns)
-        ]
-        strings.append("".join(text_parts))
+            strings.append("".join(
+                node.text or ""
+                for node in item.iter(f"{{{XLSX_NS}}}t")
+            ))
+            item.clear()
 
     return strings
 
@@ -104,34 +212,51 @@ def _read_sheet_names(workbook):
         return []
 
     root = ET.fromstring(workbook.read("xl/workbook.xml"))
-    ns = {"x": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+    ns = {"x": XLSX_NS}
     return [
         sheet.attrib.get("name", "")
         for sheet in root.findall(".//x:sheet", ns)
     ]
 
 
-def _read_xlsx_sheet(workbook, sheet_path, shared_strings):
-    root = ET.fromstring(workbook.read(sheet_path))
-    ns = {"x": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
-    rows = []
+def _iter_xlsx_sheet(workbook, sheet_path, shared_strings):
+    """Yield (row_number, values) per row without loading the sheet XML."""
+    row_tag = f"{{{XLSX_NS}}}row"
+    sheet_data = None
+    row_count = 0
+
+    with workbook.open(sheet_path) as f:
+        for event, elem in ET.iterparse(f, events=("start", "end")):
+            if event == "start":
+                if elem.tag == f"{{{XLSX_NS}}}sheetData":
+                    sheet_data = elem
+                continue
+
+            if elem.tag != row_tag:
+                continue
+
+            row_count += 1
+            row_number = int(elem.attrib.get("r", row_count))
+            values = []
 
-    for row in root.findall(".//x:row", ns):
-        values = []
-        for cell in row.findall("x:c", ns):
-            value = _read_cell_value(cell, shared_strings, ns)
-            if value:
-                values.append(value)
-        if values:
-            rows.append(" | ".join(values))
+            for cell in elem.findall(f"{{{XLSX_NS}}}c"):
+                column = _column_index(cell.attrib.get("r"), len(values))
+                values.extend([""] * (column - len(values)))
+                values.append(_read_cell_value(cell, shared_strings))
 
-    return rows
+            yield row_number, values
 
+            # Drop parsed rows so memory stays flat however long the sheet is.
+            if sheet_data is not None:
+                sheet_data.clear()
+            else:
+                elem.clear()
 
-def _read_cell_value(cell, shared_strings, ns):
-    value_node = cell.find("x:v", ns)
+
+def _read_cell_value(cell, shared_strings):
+    value_node = cell.find(f"{{{XLSX_NS}}}v")
     if value_node is None or value_node.text is None:
-        inline_node = cell.find(".//x:t", ns)
+        inline_node = cell.find(f".//{{{XLSX_NS}}}t")
         return inline_node.text.strip() if inline_node is not None and inline_node.text else ""
 
     value = value_node.text.strip()
@@ -140,3 +265,28 @@ def _read_cell_value(cell, shared_strings, ns):
         return shared_strings[index] if index < len(shared_strings) else ""
 
     return value
+
+
+def _format_row(values):
+    # Inner blanks are kept so values stay aligned with the header columns.
+    cells = [value.strip() for value in values]
+    while cells and not cells[-1]:
+        cells.pop()
+    return " | ".join(cells)
+
+
+def _column_index(reference, default):
+    match = re.match(r"[A-Z]+", reference or "")
+    if not match:
+        return default
+
+    index = 0
+    for letter in match.group():
+        index = index * 26 + ord(letter) - ord("A") + 1
+    return index - 1
+
+
+def _sheet_number(sheet_path):
+    # sheet10.xml sorts after sheet9.xml.
+    match = re.search(r"(\d+)\.xml$", sheet_path)
+    return int(match.group(1)) if match else 0
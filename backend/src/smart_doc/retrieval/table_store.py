@@ -0,0 +1,299 @@
+import json
+import os
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+
+
+# Rows buffered per executemany while a sheet is loaded.
+INSERT_BATCH_SIZE = 1000
+# Upper bound on rows returned from one query, whatever the SQL asks for.
+MAX_QUERY_ROWS = 200
+# Longest a query may run before it is interrupted, e.g. an accidental cross join.
+QUERY_TIMEOUT_SECONDS = 5
+# SQLite virtual-machine instructions between deadline checks.
+PROGRESS_CHECK_INTERVAL = 10000
+# Cell values stored as NULL rather than making a numeric column text.
+NULL_MARKERS = {"", "-", "n/a", "na", "null", "none"}
+# Decimal numbers, optionally with thousands separators or an exponent (as
+# XLSX stores some values). Anything else Python would parse ("1_000",
+# "nan", "inf") stays text, and so do codes with leading zeros such as
+# postcodes or account numbers.
+NUMBER_PATTERN = re.compile(
+    r"[+-]?(0|[1-9]\d*|[1-9]\d{0,2}(,\d{3})+)(\.\d+)?([eE][+-]?\d+)?"
+)
+
+
+class TableStore:
+    """
+    SQLite copy of every uploaded spreadsheet sheet, one typed table each, so
+    numeric questions can be answered with aggregate SQL over the whole sheet
+    instead of a handful of retrieved text chunks.
+    """
+
+    def __init__(self, path: str):
+        self.__path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS spreadsheet_tables (
+                    table_name TEXT PRIMARY KEY,
+                    document TEXT NOT NULL,
+                    file_hash TEXT NOT NULL,
+                    sheet TEXT,
+                    columns TEXT NOT NULL,
+                    row_count INTEGER NOT NULL DEFAULT 0,
+                    loaded INTEGER NOT NULL DEFAULT 0
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS tables_by_hash ON spreadsheet_tables (file_hash)"
+            )
+
+    @contextmanager
+    def _connect(self, read_only=False):
+        if read_only:
+            conn = sqlite3.connect(f"file:{self.__path}?mode=ro", uri=True, timeout=30)
+        else:
+            conn = sqlite3.connect(self.__path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def loader(self, document: str, file_hash: str):
+        """
+        Load a spreadsheet's rows as they are streamed: add_row(sheet, values)
+        for every row, the first row of each sheet being its header. Tables
+        are only described to callers once the whole file has loaded, and are
+        dropped again if loading fails.
+        """
+        with self._connect() as conn:
+            loader = _TableLoader(conn, document, file_hash)
+            try:
+                yield loader
+                loader.finish()
+            except BaseException:
+                conn.rollback()
+                self.remove_file(file_hash)
+                raise
+
+            conn.execute(
+                "UPDATE spreadsheet_tables SET loaded = 1 WHERE file_hash = ?",
+                (file_hash,)
+            )
+
+    def remove_file(self, file_hash: str):
+        with self._connect() as conn:
+            tables = conn.execute(
+                "SELECT table_name FROM spreadsheet_tables WHERE file_hash = ?",
+                (file_hash,)
+            ).fetchall()
+            for (table_name,) in tables:
+                conn.execute(f"DROP TABLE IF EXISTS {_quote(table_name)}")
+            conn.execute("DELETE FROM spreadsheet_tables WHERE file_hash = ?", (file_hash,))
+
+    def describe(self, document: str | None = None) -> list[dict]:
+        """Table name, source sheet, row count and typed columns of each table."""
+        query = (
+            "SELECT table_name, document, sheet, columns, row_count "
+            "FROM spreadsheet_tables WHERE loaded = 1"
+        )
+        params = ()
+        if document:
+            query += " AND document = ?"
+            params = (document,)
+
+        with self._connect() as conn:
+            rows = conn.execute(query + " ORDER BY document, table_name", params).fetchall()
+
+        return [
+            {
+                "table": table_name,
+                "document": table_document,
+                "sheet": sheet,
+                "columns": json.loads(columns),
+                "row_count": row_count
+            }
+            for table_name, table_document, sheet, columns, row_count in rows
+        ]
+
+    def query(
+        self,
+        sql: str,
+        max_rows: int = MAX_QUERY_ROWS,
+        timeout: float = QUERY_TIMEOUT_SECONDS
+    ) -> dict:
+        """
+        Run a single read-only SELECT and return its columns and rows. A query
+        still running after timeout seconds is aborted with TimeoutError.
+        """
+        statement = sql.strip().rstrip(";").strip()
+        if ";" in statement or not re.match(r"(?is)^(select|with)\b", statement):
+            raise ValueError("Only a single SELECT statement can be run on the table store")
+
+        deadline = time.monotonic() + timeout
+        with self._connect(read_only=True) as conn:
+            # A non-zero return from the handler interrupts the statement.
+            conn.set_progress_handler(
+                lambda: time.monotonic() > deadline,
+                PROGRESS_CHECK_INTERVAL
+            )
+            try:
+                cursor = conn.execute(statement)
+                columns = [column[0] for column in cursor.description or []]
+                rows = cursor.fetchmany(max_rows + 1)
+            except sqlite3.OperationalError as e:
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"Table query exceeded {timeout}s") from e
+                raise
+
+        return {
+            "columns": columns,
+            "rows": [list(row) for row in rows[:max_rows]],
+            "truncated": len(rows) > max_rows
+        }
+
+
+class _TableLoader:
+    def __init__(self, conn, document, file_hash):
+        self.conn = conn
+        self.document = document
+        self.file_hash = file_hash
+        self.table_count = 0
+        self._sheet = None
+        self._table = None
+        self._columns = None
+        self._types = None
+        self._rows = []
+        self._row_count = 0
+
+    def add_row(self, sheet, values):
+        if self._table is None or sheet != self._sheet:
+            self._finish_table()
+            self._start_table(sheet, values)
+            return
+
+        values = [_parse_value(value) for value in values[:len(self._columns)]]
+        values += [None] * (len(self._columns) - len(values))
+        for i, value in enumerate(values):
+            self._types[i] = _widen_type(self._types[i], value)
+
+        self._rows.append(values)
+        self._row_count += 1
+        if len(self._rows) >= INSERT_BATCH_SIZE:
+            self._flush_rows()
+
+    def finish(self):
+        self._finish_table()
+
+    def _start_table(self, sheet, header):
+        self._sheet = sheet
+        self._table = f"sheet_{self.file_hash[:12]}_{self.table_count}"
+        self._columns = _column_names(header)
+        self._types = [None] * len(self._columns)
+        self._row_count = 0
+        self.table_count += 1
+
+        # Columns are untyped so parsed numbers are stored as numbers; the
+        # inferred type of each column is recorded in the catalogue.
+        columns = ", ".join(_quote(column) for column in self._columns)
+        self.conn.execute(f"DROP TABLE IF EXISTS {_quote(self._table)}")
+        self.conn.execute(f"CREATE TABLE {_quote(self._table)} ({columns})")
+        # Catalogued straight away so remove_file can find it after a crash.
+        self._write_catalogue()
+        self.conn.commit()
+
+    def _flush_rows(self):
+        if not self._rows:
+            return
+
+        placeholders = ", ".join("?" for _ in self._columns)
+        self.conn.executemany(
+            f"INSERT INTO {_quote(self._table)} VALUES ({placeholders})",
+            self._rows
+        )
+        self._rows.clear()
+        # Commit per batch: a long load must not hold the write lock while
+        # the same file's chunks are being embedded.
+        self.conn.commit()
+
+    def _finish_table(self):
+        if self._table is None:
+            return
+
+        self._flush_rows()
+        self._write_catalogue()
+        self.conn.commit()
+        self._table = None
+
+    def _write_catalogue(self):
+        columns = [
+            {"name": name, "type": column_type or "TEXT"}
+            for name, column_type in zip(self._columns, self._types)
+        ]
+        self.conn.execute(
+            """
+            INSERT OR REPLACE INTO spreadsheet_tables
+                (table_name, document, file_hash, sheet, columns, row_count)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            (
+                self._table,
+                self.document,
+                self.file_hash,
+                self._sheet,
+                json.dumps(columns),
+                self._row_count
+            )
+        )
+
+
+def _column_names(header):
+    names = []
+    for index, value in enumerate(header):
+        name = re.sub(r"\s+", " ", str(value)).strip() or f"column_{index + 1}"
+        candidate, suffix = name, 2
+        while candidate.lower() in (existing.lower() for existing in names):
+            candidate = f"{name}_{suffix}"
+            suffix += 1
+        names.append(candidate)
+    return names
+
+
+def _parse_value(value):
+    value = value.strip() if isinstance(value, str) else value
+    if value is None or str(value).lower() in NULL_MARKERS:
+        return None
+
+    if not isinstance(value, str):
+        return value
+
+    match = NUMBER_PATTERN.fullmatch(value)
+    if match is None:
+        return value
+
+    text = value.replace(",", "")
+    return float(text) if match.group(3) or match.group(4) else int(text)
+
+
+def _widen_type(current, value):
+    if value is None:
+        return current
+    if isinstance(value, int):
+        return current or "INTEGER"
+    if isinstance(value, float):
+        return "TEXT" if current == "TEXT" else "REAL"
+    return "TEXT"
+
+
+def _quote(identifier):
+    return '"' + identifier.replace('"', '""') + '"'
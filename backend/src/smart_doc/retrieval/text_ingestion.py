@@ -5,7 +5,7 @@ def add_text_file(
     file_path,
     child_splitter,
     get_collection_by_language,
-    detect_language,
+    detect_languages,
     file_hash
 ):
     filename = os.path.basename(file_path)
@@ -17,8 +17,7 @@ def add_text_file(
     chunks = child_splitter.split_text(text)
     batches = {}
 
-    for i, chunk in enumerate(chunks):
-        language = detect_language(chunk)
+    for i, (chunk, language) in enumerate(zip(chunks, detect_languages(chunks))):
         target_col = get_collection_by_language(language)
         batch = batches.setdefault(
             language,
@@ -43,3 +42,5 @@ def add_text_file(
             ids=batch["ids"],
             metadatas=batch["metadatas"]
         )
+
+    return {"chunk_ids": [chunk_id for batch in batches.values() for chunk_id in batch["ids"]]}
@@ -0,0 +1,9 @@
+import sys
+from pathlib import Path
+
+src_path = Path(__file__).resolve().parents[1] / "src"
+if str(src_path) not in sys.path:
+    sys.path.insert(0, str(src_path))
+
+# A manual script that calls the LLM, not a test.
+collect_ignore = ["visualization_test.py"]
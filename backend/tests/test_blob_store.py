@@ -0,0 +1,122 @@
+import os
+import sqlite3
+
+import pytest
+
+pytest.importorskip("PIL")
+
+from PIL import Image, ImageDraw  # noqa: E402
+
+from smart_doc.retrieval.blob_store import BlobStore  # noqa: E402
+
+
+def chart(values, size=(200, 120)):
+    image = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(image)
+    for i, value in enumerate(values):
+        x = 20 + i * 40
+        draw.rectangle((x, size[1] - value, x + 25, size[1] - 5), fill="navy")
+    return image
+
+
+def test_identical_pixels_share_a_blob(tmp_path):
+    store = BlobStore(str(tmp_path))
+
+    first_id, first_path, first_new = store.put(chart([50, 80, 30]))
+    second_id, second_path, second_new = store.put(chart([50, 80, 30]))
+
+    assert first_new and not second_new
+    assert (first_id, first_path) == (second_id, second_path)
+
+
+def test_exact_matching_can_be_requested(tmp_path):
+    store = BlobStore(str(tmp_path), near_duplicate_distance=0)
+    image = chart([50, 80, 30])
+    touched = image.copy()
+    touched.putpixel((0, 0), (250, 250, 250))
+
+    assert store.put(image)[0] != store.put(touched)[0]
+
+
+def test_near_duplicates_are_shared_by_default_once_confirmed_by_pixels(tmp_path):
+    store = BlobStore(str(tmp_path))
+    image = chart([50, 80, 30])
+    touched = image.copy()
+    touched.putpixel((0, 0), (250, 250, 250))
+
+    first_id, _, _ = store.put(image)
+    second_id, _, is_new = store.put(touched)
+
+    assert second_id == first_id and not is_new
+
+
+def test_charts_with_the_same_layout_stay_apart(tmp_path):
+    store = BlobStore(str(tmp_path), near_duplicate_distance=4)
+
+    first_id, _, _ = store.put(chart([50, 80, 30, 60]))
+    second_id, _, is_new = store.put(chart([52, 80, 34, 60]))
+
+    assert is_new and second_id != first_id
+
+
+def test_blank_crops_of_different_sizes_stay_apart(tmp_path):
+    store = BlobStore(str(tmp_path), near_duplicate_distance=4)
+
+    first_id, _, _ = store.put(Image.new("RGB", (100, 40), "white"))
+    second_id, _, is_new = store.put(Image.new("RGB", (300, 200), "white"))
+
+    assert is_new and second_id != first_id
+
+
+def test_a_blob_is_deleted_with_its_last_reference(tmp_path):
+    store = BlobStore(str(tmp_path))
+    blob_id, path, _ = store.put(chart([10, 20]))
+    store.put(chart([10, 20]))
+
+    store.release(blob_id)
+    assert os.path.exists(path)
+
+    store.release(blob_id)
+    assert not os.path.exists(path)
+    assert store.put(chart([10, 20]))[2] is True
+
+
+def test_references_survive_a_restart(tmp_path):
+    blob_id, path, _ = BlobStore(str(tmp_path)).put(chart([10, 20]))
+
+    reopened = BlobStore(str(tmp_path))
+    assert reopened.put(chart([10, 20]))[:2] == (blob_id, path)
+
+    reopened.release(blob_id)
+    BlobStore(str(tmp_path)).release(blob_id)
+    assert not os.path.exists(path)
+
+
+def test_a_blob_released_by_another_store_is_written_again(tmp_path):
+    first = BlobStore(str(tmp_path))
+    second = BlobStore(str(tmp_path))
+    blob_id, path, _ = first.put(chart([10, 20]))
+
+    second.release(blob_id)
+
+    assert first.put(chart([10, 20]))[2] is True
+    assert os.path.exists(path)
+
+
+def test_blobs_stored_before_counting_get_their_counts(tmp_path):
+    store = BlobStore(str(tmp_path))
+    kept_id, kept_path, _ = store.put(chart([10, 20]))
+    unused_id, unused_path, _ = store.put(chart([60, 20]))
+    with sqlite3.connect(str(tmp_path / "blob_index.sqlite3")) as conn:
+        conn.execute("UPDATE blobs SET refs = NULL")
+    conn.close()
+
+    reopened = BlobStore(str(tmp_path))
+    assert reopened.uncounted()
+    reopened.set_references({kept_id: 2})
+    assert not reopened.uncounted()
+
+    reopened.release(kept_id)
+    reopened.release(unused_id)
+    assert os.path.exists(kept_path)
+    assert not os.path.exists(unused_path)
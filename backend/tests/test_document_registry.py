@@ -0,0 +1,40 @@
+from smart_doc.retrieval.document_registry import (
+    FAILED,
+    INDEXED,
+    INGESTING,
+    DocumentRegistry,
+)
+
+
+def test_a_file_is_claimed_once(tmp_path):
+    registry = DocumentRegistry(str(tmp_path / "registry.sqlite3"))
+
+    assert registry.start("hash", "report.pdf", "pdf") is None
+    assert registry.start("hash", "report.pdf", "pdf") == INGESTING
+
+    registry.complete("hash", ["c1"], ["i1"], page_count=1)
+    assert registry.start("hash", "report.pdf", "pdf") == INDEXED
+    assert registry.get("hash")["chunk_ids"] == ["c1"]
+
+
+def test_a_failed_file_can_be_claimed_again(tmp_path):
+    registry = DocumentRegistry(str(tmp_path / "registry.sqlite3"))
+    registry.start("hash", "report.pdf", "pdf")
+    registry.fail("hash", "boom")
+
+    assert registry.start("hash", "report.pdf", "pdf") == FAILED
+    assert registry.get("hash")["status"] == INGESTING
+
+
+def test_only_indexed_versions_are_listed_and_replaced(tmp_path):
+    registry = DocumentRegistry(str(tmp_path / "registry.sqlite3"))
+    registry.add_indexed("old", "report.pdf", "pdf", ["c1"], [])
+    registry.start("new", "report.pdf", "pdf")
+    registry.start("broken", "notes.txt", "txt")
+    registry.fail("broken", "boom")
+
+    assert registry.list_documents() == ["report.pdf"]
+    assert registry.latest_indexed("report.pdf", exclude_hash="new")["file_hash"] == "old"
+    assert {
+        (record["file_hash"], record["status"]) for record in registry.unfinished()
+    } == {("new", INGESTING), ("broken", FAILED)}
@@ -0,0 +1,111 @@
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from smart_doc.retrieval.embedding_cache import EmbeddingCache, text_hash  # noqa: E402
+
+
+class CountingEmbedder:
+    def __init__(self, dimension=3):
+        self.dimension = dimension
+        self.seen = []
+
+    def __call__(self, texts):
+        self.seen.extend(texts)
+        return [
+            np.linspace(0, 1, self.dimension, dtype=np.float32) * len(text)
+            for text in texts
+        ]
+
+
+def test_only_unseen_texts_are_embedded(tmp_path):
+    cache = EmbeddingCache(str(tmp_path))
+    embedder = CountingEmbedder()
+
+    first = cache.embed(["disclaimer", "page one"], "model", embedder)
+    second = cache.embed(["disclaimer", "page two"], "model", embedder)
+
+    assert embedder.seen == ["disclaimer", "page one", "page two"]
+    np.testing.assert_allclose(first[0], second[0])
+    assert cache.stats()["model"] == {"hits": 1, "misses": 3, "hit_rate": 0.25, "entries": 3}
+
+
+def test_repeats_and_whitespace_variants_are_embedded_once(tmp_path):
+    cache = EmbeddingCache(str(tmp_path))
+    embedder = CountingEmbedder()
+
+    vectors = cache.embed(["All rights  reserved.", "All rights reserved.\n", "All rights reserved."], "model", embedder)
+
+    assert len(embedder.seen) == 1
+    assert len(vectors) == 3
+    assert text_hash(" a\tb ") == text_hash("a b")
+
+
+def test_vectors_persist_across_instances_as_float16(tmp_path):
+    embedder = CountingEmbedder(dimension=8)
+    expected = EmbeddingCache(str(tmp_path)).embed(["boilerplate"], "model", embedder)[0]
+
+    reopened = EmbeddingCache(str(tmp_path))
+    [cached] = reopened.embed(["boilerplate"], "model", CountingEmbedder(dimension=8))
+
+    assert cached.dtype == np.float32
+    np.testing.assert_allclose(cached, expected, rtol=1e-3)
+    assert reopened.stats()["model"]["hits"] == 1
+
+
+def test_models_do_not_share_vectors(tmp_path):
+    cache = EmbeddingCache(str(tmp_path))
+    embedder = CountingEmbedder()
+
+    cache.embed(["same text"], "english|torch", embedder)
+    cache.embed(["same text"], "english|onnx", embedder)
+
+    assert embedder.seen == ["same text", "same text"]
+
+
+def test_rows_written_by_another_instance_are_visible(tmp_path):
+    reader = EmbeddingCache(str(tmp_path))
+    writer = EmbeddingCache(str(tmp_path))
+    reader.embed(["first"], "model", CountingEmbedder())
+    writer.embed(["second"], "model", CountingEmbedder())
+
+    embedder = CountingEmbedder()
+    reader.embed(["first", "second"], "model", embedder)
+    assert embedder.seen == []
+
+
+def test_dimension_mismatch_is_rejected(tmp_path):
+    cache = EmbeddingCache(str(tmp_path))
+    cache.embed(["a"], "model", CountingEmbedder(dimension=3))
+
+    with pytest.raises(ValueError):
+        cache.embed(["b"], "model", CountingEmbedder(dimension=4))
+
+
+def test_a_fresh_embedding_equals_its_cached_copy(tmp_path):
+    cache = EmbeddingCache(str(tmp_path))
+    embedder = CountingEmbedder(dimension=8)
+
+    [fresh] = cache.embed(["a paragraph with a long enough length"], "model", embedder)
+    [cached] = cache.embed(["a paragraph with a long enough length"], "model", embedder)
+
+    assert fresh.dtype == np.float32
+    np.testing.assert_array_equal(fresh, cached)
+
+
+def test_a_full_cache_is_started_afresh(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), max_entries=2)
+    reader = EmbeddingCache(str(tmp_path), max_entries=2)
+    cache.embed(["first", "second"], "model", CountingEmbedder())
+    reader.embed(["first"], "model", CountingEmbedder())
+
+    cache.embed(["third"], "model", CountingEmbedder())
+
+    assert cache.stats()["model"]["entries"] == 1
+    assert len([name for name in os.listdir(tmp_path) if name.endswith(".f16")]) == 1
+    embedder = CountingEmbedder()
+    [third, first] = reader.embed(["third", "first"], "model", embedder)
+    assert embedder.seen == ["first"]
+    np.testing.assert_allclose(third, np.linspace(0, 1, 3) * 5, rtol=1e-3)
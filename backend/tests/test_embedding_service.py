@@ -0,0 +1,83 @@
+import threading
+import time
+
+import pytest
+
+from smart_doc.retrieval.embedding_service import EmbeddingService
+
+
+class RecordingEmbedder:
+    def __init__(self, delay=0.01):
+        self.delay = delay
+        self.calls = []
+
+    def __call__(self, inputs):
+        self.calls.append(list(inputs))
+        time.sleep(self.delay)
+        return [f"vector:{item}" for item in inputs]
+
+
+def test_concurrent_requests_share_batches_and_keep_their_order():
+    embedder = RecordingEmbedder()
+    service = EmbeddingService(embedder, max_batch_size=16, max_wait_ms=50)
+    results = {}
+
+    def request(i):
+        results[i] = service([f"{i}-{j}" for j in range(4)])
+
+    threads = [threading.Thread(target=request, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for i in range(8):
+        assert results[i] == [f"vector:{i}-{j}" for j in range(4)]
+    assert len(embedder.calls) < 8
+    assert all(len(call) <= 16 for call in embedder.calls)
+    assert service.stats()["items"] == 32
+
+
+def test_large_requests_are_split_into_bounded_calls():
+    embedder = RecordingEmbedder(delay=0)
+    service = EmbeddingService(embedder, max_batch_size=4)
+
+    assert service([str(i) for i in range(10)]) == [f"vector:{i}" for i in range(10)]
+    assert [len(call) for call in embedder.calls] == [4, 4, 2]
+
+
+def test_text_and_image_requests_are_not_mixed():
+    embedder = RecordingEmbedder()
+    service = EmbeddingService(embedder, max_batch_size=64, max_wait_ms=50)
+    image = object()
+
+    futures = [service.submit(["a"]), service.submit([image]), service.submit(["b"])]
+
+    assert [future.result() for future in futures] == [
+        ["vector:a"],
+        [f"vector:{image}"],
+        ["vector:b"],
+    ]
+    for call in embedder.calls:
+        assert len({isinstance(item, str) for item in call}) == 1
+
+
+def test_errors_reach_every_caller_in_the_batch():
+    def fail(inputs):
+        raise RuntimeError("model failed")
+
+    service = EmbeddingService(fail, max_wait_ms=20)
+    futures = [service.submit(["a"]), service.submit(["b"])]
+
+    for future in futures:
+        with pytest.raises(RuntimeError, match="model failed"):
+            future.result()
+    # The worker survives a failed batch.
+    service.embed = RecordingEmbedder(delay=0)
+    assert service(["c"]) == ["vector:c"]
+
+
+def test_empty_request_resolves_immediately():
+    embedder = RecordingEmbedder()
+    assert EmbeddingService(embedder).submit([]).result() == []
+    assert embedder.calls == []
@@ -0,0 +1,71 @@
+import json
+
+import pytest
+
+chromadb = pytest.importorskip("chromadb")
+pytest.importorskip("PIL")
+
+from chromadb.utils.embedding_functions import EmbeddingFunction  # noqa: E402
+from PIL import Image  # noqa: E402
+
+from smart_doc.retrieval.figure_captioning import CaptionCache, FigureCaptioner  # noqa: E402
+from smart_doc.retrieval.pdf_ingestion import _FigureWriter  # noqa: E402
+
+
+class LengthEmbedding(EmbeddingFunction):
+    def __init__(self):
+        pass
+
+    def __call__(self, input):
+        return [[len(text) % 97 + 1.0, 1.0, 1.0] for text in input]
+
+
+def test_captions_are_cached_per_model(tmp_path):
+    cache = CaptionCache(str(tmp_path / "captions" / "cache.sqlite3"))
+    cache.cache_captions({"a": "a bar chart", "b": "a logo"}, "blip")
+
+    reopened = CaptionCache(str(tmp_path / "captions" / "cache.sqlite3"))
+
+    assert reopened.cached_captions(["a", "b", "c", "a"], "blip") == {
+        "a": "a bar chart",
+        "b": "a logo"
+    }
+    assert reopened.cached_captions(["a"], "other-model") == {}
+
+
+def test_captions_and_page_references_written_together_are_both_kept(tmp_path):
+    client = chromadb.EphemeralClient()
+    images = client.create_collection("figure_images", embedding_function=None)
+    text = client.create_collection("figure_captions", embedding_function=LengthEmbedding())
+    path = tmp_path / "logo.png"
+    Image.new("RGB", (40, 20), "navy").save(path)
+    images.add(
+        ids=["report.pdf_logo"],
+        embeddings=[[0.1, 0.2, 0.3]],
+        uris=[str(path)],
+        metadatas=[{"document": "report.pdf", "file_hash": "v1", "page": 0, "pages": "[0]"}]
+    )
+
+    writer = _FigureWriter("report.pdf", None, images, None, 8, existing_ids=["report.pdf_logo"])
+    writer.reference(["report.pdf_logo"], 2)
+    writer.reference(["report.pdf_logo"], 5)
+
+    def caption_images(batch):
+        # A new version of the document refreshes the figure's pages while
+        # its caption is being generated.
+        writer.refresh_page_references()
+        return ["a navy logo"] * len(batch)
+
+    captioner = FigureCaptioner(
+        caption_images,
+        images,
+        lambda language: text,
+        lambda captions: ["en"] * len(captions)
+    )
+    captioner.caption_batch(["report.pdf_logo"])
+
+    [metadata] = images.get(ids=["report.pdf_logo"])["metadatas"]
+    assert metadata["caption"] == "a navy logo"
+    assert (metadata["page"], json.loads(metadata["pages"])) == (2, [2, 5])
+    assert metadata["document"] == "report.pdf"
+    assert text.get(ids=["report.pdf_logo_caption"])["documents"] == ["a navy logo"]
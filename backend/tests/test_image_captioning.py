@@ -0,0 +1,79 @@
+import pytest
+
+chromadb = pytest.importorskip("chromadb")
+# Needs the full model stack to import; the caption model is replaced below.
+rag_engine = pytest.importorskip("smart_doc.retrieval.rag_engine")
+
+from types import SimpleNamespace  # noqa: E402
+
+from PIL import Image  # noqa: E402
+
+from smart_doc.retrieval.components import RAGConfig  # noqa: E402
+from smart_doc.retrieval.image_ingestion import caption_images  # noqa: E402
+
+
+class FakeProcessor:
+    def __call__(self, images, return_tensors):
+        return {"pixel_values": SimpleNamespace(to=lambda device: [image.size for image in images])}
+
+    def batch_decode(self, out, skip_special_tokens):
+        return [f"a {width}x{height} image" for width, height in out]
+
+
+class FakeModel:
+    def __init__(self):
+        self.batches = []
+
+    def parameters(self):
+        return iter([SimpleNamespace(device="cpu")])
+
+    def generate(self, pixel_values, max_new_tokens):
+        self.batches.append(len(pixel_values))
+        return pixel_values
+
+
+def image(width):
+    return Image.new("RGB", (width, 10), "navy")
+
+
+def test_images_are_captioned_in_batches():
+    model = FakeModel()
+
+    captions = caption_images([image(w) for w in (1, 2, 3, 4, 5)], FakeProcessor(), model, batch_size=2)
+
+    assert model.batches == [2, 2, 1]
+    assert captions == [f"a {w}x10 image" for w in (1, 2, 3, 4, 5)]
+
+
+def test_each_image_is_captioned_once_and_the_model_loaded_on_demand(tmp_path, monkeypatch):
+    loads = []
+    model = FakeModel()
+
+    def load_caption_model(config, device):
+        loads.append(config.caption_model_path)
+        return FakeProcessor(), model
+
+    monkeypatch.setattr(rag_engine, "load_caption_model", load_caption_model)
+
+    def make_engine():
+        return rag_engine.RAGEngine(
+            chromadb.PersistentClient(path=str(tmp_path / "chroma")),
+            blob_storage_path=str(tmp_path / "blobs"),
+            documents_path=str(tmp_path / "documents"),
+            registry_path=str(tmp_path / "registry.sqlite3"),
+            table_store_path=str(tmp_path / "tables.sqlite3"),
+            embedding_cache_path=str(tmp_path / "embedding_cache"),
+            config=RAGConfig(caption_batch_size=2)
+        )
+
+    engine = make_engine()
+    assert loads == []
+
+    first = engine.caption_images([image(1), image(2), image(1), image(3)])
+    assert first == ["a 1x10 image", "a 2x10 image", "a 1x10 image", "a 3x10 image"]
+    assert model.batches == [2, 1]
+
+    # Captions are cached by content across engines; no model is needed.
+    restarted = make_engine()
+    assert restarted.caption_images([image(3), image(2)]) == ["a 3x10 image", "a 2x10 image"]
+    assert len(loads) == 1
@@ -0,0 +1,94 @@
+import json
+import os
+
+import pytest
+
+pytest.importorskip("chromadb")
+# Needs the full model stack to import; these tests start no worker.
+ingest = pytest.importorskip("smart_doc.ingest")
+
+from smart_doc.retrieval.document_registry import DocumentRegistry  # noqa: E402
+from smart_doc.retrieval.file_utils import compute_file_hash  # noqa: E402
+
+
+def write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+    return str(path)
+
+
+def run(tmp_path, root):
+    data = tmp_path / "data"
+    paths = {
+        "chroma": str(data / "chroma"),
+        "blob_storage": str(data / "blobs"),
+        "documents": str(data / "documents"),
+        "registry": str(data / "registry.sqlite3"),
+        "table_store": str(data / "tables.sqlite3"),
+        "embedding_cache": str(data / "embedding_cache"),
+    }
+    counts = ingest.ingest_directory(
+        str(root),
+        workers=1,
+        checkpoint_path=str(data / "checkpoint.jsonl"),
+        paths=paths
+    )
+    return counts, ingest.load_checkpoint(str(data / "checkpoint.jsonl"))
+
+
+def test_only_supported_files_are_discovered(tmp_path):
+    write(tmp_path / "b" / "report.PDF", "")
+    write(tmp_path / "a.txt", "")
+    write(tmp_path / "notes.docx", "")
+
+    assert ingest.discover_files(str(tmp_path)) == [
+        str(tmp_path / "a.txt"),
+        str(tmp_path / "b" / "report.PDF"),
+    ]
+
+
+def test_a_partial_last_checkpoint_line_is_ignored(tmp_path):
+    checkpoint = tmp_path / "checkpoint.jsonl"
+    checkpoint.write_text(
+        json.dumps({"path": "a.txt", "status": "failed"}) + "\n"
+        + json.dumps({"path": "a.txt", "status": "indexed"}) + "\n"
+        + '{"path": "b.txt", "sta'
+    )
+
+    assert ingest.load_checkpoint(str(checkpoint)) == {"a.txt": {"path": "a.txt", "status": "indexed"}}
+
+
+def test_a_file_changed_since_its_checkpoint_is_not_finished(tmp_path):
+    path = write(tmp_path / "a.txt", "first")
+    stat = os.stat(path)
+    entry = {"path": path, "status": "indexed", "size": stat.st_size, "mtime": stat.st_mtime}
+
+    assert ingest.is_finished(entry, path)
+    assert not ingest.is_finished({**entry, "status": "failed"}, path)
+
+    write(tmp_path / "a.txt", "second version")
+    assert not ingest.is_finished(entry, path)
+
+
+def test_finished_indexed_and_colliding_files_are_not_sent_to_workers(tmp_path):
+    root = tmp_path / "files"
+    done = write(root / "a" / "notes.txt", "done in an earlier run")
+    colliding = write(root / "b" / "notes.txt", "another file of the same name")
+    copy = write(root / "copy.txt", "already indexed")
+    DocumentRegistry(str(tmp_path / "data" / "registry.sqlite3")).add_indexed(
+        compute_file_hash(copy), "original.txt", "txt", [], []
+    )
+    stat = os.stat(done)
+    write(tmp_path / "data" / "checkpoint.jsonl", json.dumps({
+        "path": done,
+        "status": "indexed",
+        "size": stat.st_size,
+        "mtime": stat.st_mtime
+    }) + "\n")
+
+    counts, checkpoint = run(tmp_path, root)
+
+    assert counts == {"indexed": 0, "skipped": 2, "failed": 1}
+    assert checkpoint[copy]["status"] == "skipped"
+    assert checkpoint[colliding]["status"] == "failed"
+    assert done in checkpoint[colliding]["error"]
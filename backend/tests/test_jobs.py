@@ -0,0 +1,60 @@
+from smart_doc.app.jobs import IngestionJobQueue, UploadedFile
+
+
+class FakeEngine:
+    """Ingests every file except those named in failing."""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+
+    def caption_files(self, paths):
+        pass
+
+    def add_file(self, path, progress=None, file_hash=None):
+        if path in self.failing:
+            raise RuntimeError(f"cannot read {path}")
+        progress("indexing", 1, 1)
+        return {"status": "indexed"}
+
+
+def run_job(tmp_path, names, failing=()):
+    files = []
+    for name in names:
+        path = tmp_path / name
+        path.write_text(name)
+        files.append(UploadedFile(name, str(path), False, file_hash=name))
+
+    jobs = IngestionJobQueue(
+        FakeEngine(str(tmp_path / name) for name in failing),
+        workers=1,
+        file_workers=2
+    )
+    job_id = jobs.submit(files)
+    jobs._executor.shutdown(wait=True)
+    return jobs.get(job_id)
+
+
+def test_a_job_without_failures_is_completed(tmp_path):
+    job = run_job(tmp_path, ["a.txt", "b.txt"])
+
+    assert job["status"] == "completed"
+    assert sorted(job["uploaded"]) == ["a.txt", "b.txt"]
+    assert [file["pages_done"] for file in job["files"]] == [1, 1]
+    assert job["finished_at"] is not None
+
+
+def test_a_job_with_some_failures_is_completed_with_errors(tmp_path):
+    job = run_job(tmp_path, ["a.txt", "b.txt"], failing=["b.txt"])
+
+    assert job["status"] == "completed_with_errors"
+    assert job["uploaded"] == ["a.txt"]
+    assert job["failed"][0]["file"] == "b.txt"
+    # The failed upload is not left behind in the documents folder.
+    assert not (tmp_path / "b.txt").exists()
+
+
+def test_a_job_whose_files_all_failed_is_failed(tmp_path):
+    job = run_job(tmp_path, ["a.txt"], failing=["a.txt"])
+
+    assert job["status"] == "failed"
+    assert job["files"][0]["error"].startswith("cannot read")
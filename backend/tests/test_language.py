@@ -0,0 +1,47 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from smart_doc.retrieval.language import (  # noqa: E402
+    detect_text_language,
+    detect_text_languages,
+    get_text_collection,
+)
+
+
+def test_routes_by_script():
+    assert detect_text_languages([
+        "هذا نص عربي عن الذكاء الاصطناعي",
+        "This is an English sentence about AI",
+    ]) == ["ar", "en"]
+
+
+def test_empty_batch_and_texts_without_letters():
+    assert detect_text_languages([]) == []
+    assert detect_text_languages(["", "12345 - 678", "٣٤٥٦"]) == ["en", "en", "en"]
+
+
+def test_a_few_english_terms_keep_arabic_text_arabic():
+    text = "تعتمد نماذج التعلم العميق مثل BERT على بيانات كثيرة"
+    assert detect_text_language(text, fallback=False) == "ar"
+
+
+def test_mixed_text_goes_to_the_majority_script_without_fallback():
+    arabic_majority = "نص عربي طويل نسبيا هنا mixed words"
+    english_majority = "mostly English words in this sentence نص قصير"
+    assert detect_text_languages(
+        [arabic_majority, english_majority],
+        fallback=False
+    ) == ["ar", "en"]
+
+
+def test_batch_matches_single_detection():
+    texts = ["hello world", "مرحبا بالعالم", "", "Grüße aus München"]
+    assert detect_text_languages(texts, fallback=False) == [
+        detect_text_language(text, fallback=False) for text in texts
+    ]
+
+
+def test_get_text_collection():
+    assert get_text_collection("مرحبا بالعالم", "ar_col", "en_col") == "ar_col"
+    assert get_text_collection("hello world", "ar_col", "en_col") == "en_col"
@@ -0,0 +1,31 @@
+import pytest
+
+# Needs the full model stack (torch, chromadb, transformers, ultralytics) to import.
+components = pytest.importorskip("smart_doc.retrieval.components")
+
+
+def lazy_embedder(factory):
+    return components.LazyEmbeddingFunction(
+        "test",
+        factory,
+        "sentence_transformer",
+        {"model_name": "test"}
+    )
+
+
+def test_resident_memory_is_read_without_psutil(monkeypatch):
+    monkeypatch.setattr(components, "psutil", None)
+
+    resident = components.resident_memory_mb()
+
+    assert resident is None or resident > 0
+
+
+def test_a_missing_memory_metric_does_not_stop_loading(monkeypatch):
+    monkeypatch.setattr(components, "resident_memory_mb", lambda: None)
+    embedder = lazy_embedder(lambda: lambda inputs: [[1.0] for _ in inputs])
+
+    assert embedder(["text"]) == [[1.0]]
+    assert embedder.loaded
+    assert embedder.load_seconds is not None
+    assert embedder.resident_mb is None
@@ -0,0 +1,134 @@
+import io
+
+import pytest
+
+fitz = pytest.importorskip("fitz")
+np = pytest.importorskip("numpy")
+pytest.importorskip("PIL")
+
+from PIL import Image  # noqa: E402
+
+from smart_doc.retrieval.pdf_ingestion import iter_pdf_pages, shutdown_page_pool  # noqa: E402
+
+
+def png(size, color):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    path = tmp_path / "sample.pdf"
+    pdf = fitz.open()
+
+    text_page = pdf.new_page()
+    text_page.insert_textbox(text_page.rect + (40, 40, -40, -40), "Plain text. " * 400)
+
+    chart_page = pdf.new_page()
+    chart_page.insert_text((72, 72), "A chart drawn with vector graphics")
+    chart_page.draw_rect(fitz.Rect(72, 100, 400, 400), color=(0, 0, 1), fill=(0.5, 0.5, 1))
+
+    figure_page = pdf.new_page()
+    figure_page.insert_text((72, 72), "A page with an embedded figure")
+    figure_page.insert_image(fitz.Rect(72, 100, 272, 250), stream=png((200, 150), "red"))
+
+    scan_page = pdf.new_page()
+    scan_page.insert_image(scan_page.rect, stream=png((612, 792), "gray"))
+
+    pdf.save(str(path))
+    pdf.close()
+    yield str(path)
+    shutdown_page_pool()
+
+
+def summary(page):
+    return (
+        page.index,
+        page.page_count,
+        page.text,
+        page.content_hash,
+        page.reused,
+        page.text_only,
+        [(image.data, image.ext, image.bbox) for image in page.embedded_images or []],
+        page.width,
+        page.height,
+        bytes(page.samples) if page.samples is not None else None,
+    )
+
+
+def read(pdf_path, workers, skip_hashes=None):
+    return [summary(page) for page in iter_pdf_pages(pdf_path, workers, skip_hashes)]
+
+
+def test_parallel_rendering_matches_the_serial_path(pdf_path):
+    assert read(pdf_path, workers=2) == read(pdf_path, workers=1)
+
+
+def test_rendered_pages_are_viewed_without_copies(pdf_path):
+    chart_page = list(iter_pdf_pages(pdf_path, 1))[1]
+    array = chart_page.to_array()
+
+    assert array.shape == (chart_page.height, chart_page.width, 3)
+    assert not array.flags["OWNDATA"]
+    assert np.shares_memory(array, np.frombuffer(chart_page.samples, dtype=np.uint8))
+
+
+def test_unchanged_pages_are_not_rendered_again(pdf_path):
+    first = read(pdf_path, workers=1)
+    skip_hashes = {index: page[3] for index, page in enumerate(first)}
+
+    for workers in (1, 2):
+        again = list(iter_pdf_pages(pdf_path, workers, skip_hashes))
+        assert all(page.reused and page.samples is None for page in again)
+
+
+def test_embedded_figures_skip_rendering_but_scans_do_not(pdf_path):
+    _, chart_page, figure_page, scan_page = read(pdf_path, workers=1)
+
+    assert chart_page[9] is not None
+    assert figure_page[6] and figure_page[9] is None
+    # A full-page image is a scan: it goes to layout detection, not the figure path.
+    assert not scan_page[6] and scan_page[9] is not None
+
+
+def test_text_only_pages_are_not_rendered(pdf_path):
+    text_page = read(pdf_path, workers=1)[0]
+
+    assert text_page[5] is True
+    assert text_page[9] is None
+
+
+@pytest.mark.parametrize("deflate", [False, True])
+def test_a_replaced_figure_changes_the_page_hash(tmp_path, deflate):
+    def figure_page_hash(name, image):
+        path = tmp_path / name
+        pdf = fitz.open()
+        page = pdf.new_page()
+        page.insert_text((72, 72), "Same caption")
+        page.insert_image(fitz.Rect(72, 100, 272, 250), stream=image)
+        pdf.save(str(path), deflate=deflate)
+        pdf.close()
+        return list(iter_pdf_pages(str(path), 1))[0].content_hash
+
+    gradient = Image.linear_gradient("L").resize((200, 150)).convert("RGB")
+    buffer = io.BytesIO()
+    gradient.save(buffer, "PNG")
+
+    assert figure_page_hash("a.pdf", png((200, 150), "red")) != figure_page_hash("b.pdf", buffer.getvalue())
+
+
+def test_an_image_placed_twice_keeps_both_boxes(tmp_path):
+    path = tmp_path / "twice.pdf"
+    pdf = fitz.open()
+    page = pdf.new_page()
+    page.insert_text((72, 72), "The same logo twice")
+    xref = page.insert_image(fitz.Rect(72, 100, 272, 250), stream=png((200, 150), "red"))
+    page.insert_image(fitz.Rect(300, 400, 500, 550), xref=xref)
+    pdf.save(str(path))
+    pdf.close()
+
+    (image,) = list(iter_pdf_pages(str(path), 1))[0].embedded_images
+
+    assert image.bbox == image.bboxes[0]
+    assert sorted(image.bboxes) == [(72, 100, 272, 250), (300, 400, 500, 550)]
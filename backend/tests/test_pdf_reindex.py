@@ -0,0 +1,97 @@
+from types import SimpleNamespace
+
+import pytest
+
+chromadb = pytest.importorskip("chromadb")
+fitz = pytest.importorskip("fitz")
+np = pytest.importorskip("numpy")
+
+from chromadb.utils.embedding_functions import EmbeddingFunction  # noqa: E402
+
+from smart_doc.retrieval.blob_store import BlobStore  # noqa: E402
+from smart_doc.retrieval.pdf_ingestion import add_pdf_file, shutdown_page_pool  # noqa: E402
+
+
+class LengthEmbedding(EmbeddingFunction):
+    def __init__(self):
+        pass
+
+    def __call__(self, input):
+        return [np.array([len(text) % 97 + 1, 1.0, 1.0], dtype=np.float32) for text in input]
+
+
+class PageSplitter:
+    def split_text(self, text):
+        return [text] if text.strip() else []
+
+
+def write_pdf(path, texts):
+    pdf = fitz.open()
+    for text in texts:
+        page = pdf.new_page()
+        page.insert_textbox(page.rect + (40, 40, -40, -40), text * 150)
+    pdf.save(str(path))
+    pdf.close()
+
+
+@pytest.fixture
+def ingest(tmp_path):
+    client = chromadb.PersistentClient(path=str(tmp_path / "chroma"))
+    text = client.create_collection("text", embedding_function=LengthEmbedding())
+    images = client.create_collection("images", embedding_function=LengthEmbedding())
+    deletes = []
+    (tmp_path / "documents").mkdir()
+
+    def delete_records(chunk_ids, image_ids):
+        deletes.append((list(chunk_ids), list(image_ids)))
+        if chunk_ids:
+            text.delete(ids=chunk_ids)
+        if image_ids:
+            images.delete(ids=image_ids)
+
+    def run(path, file_hash, previous_pages=None):
+        return add_pdf_file(
+            str(path),
+            str(tmp_path / "documents"),
+            BlobStore(str(tmp_path / "blobs")),
+            file_hash,
+            PageSplitter(),
+            PageSplitter(),
+            lambda images: [SimpleNamespace(boxes=[], names={}) for _ in images],
+            [],
+            lambda language: text,
+            lambda texts: ["en"] * len(texts),
+            images,
+            lambda batch: [[1.0, 1.0, 1.0] for _ in batch],
+            delete_records,
+            yolo_batch_size=8,
+            previous_pages=previous_pages
+        )
+
+    yield run, text, deletes
+    shutdown_page_pool()
+
+
+def test_changed_pages_are_replaced_with_one_delete_per_batch(tmp_path, ingest):
+    run, text, deletes = ingest
+    path = tmp_path / "report.pdf"
+
+    write_pdf(path, ["Alpha text. ", "Beta text. ", "Gamma text. ", "Delta text. "])
+    first = run(path, "v1")
+    assert deletes == []
+
+    write_pdf(path, ["Alpha text. ", "Changed beta. ", "Changed gamma. "])
+    second = run(path, "v2", previous_pages=first["pages"])
+
+    assert second["stats"]["pages_reused"] == 1
+    assert second["reused_ids"] == first["pages"]["0"]["chunk_ids"]
+    # The two changed pages share one batch and one delete; the removed
+    # page goes in the final clean-up.
+    assert [chunk_ids for chunk_ids, _ in deletes] == [
+        first["pages"]["1"]["chunk_ids"] + first["pages"]["2"]["chunk_ids"],
+        first["pages"]["3"]["chunk_ids"],
+    ]
+
+    stored = text.get(include=["documents"])
+    assert sorted(stored["ids"]) == sorted(second["chunk_ids"])
+    assert any(document.startswith("Changed beta.") for document in stored["documents"])
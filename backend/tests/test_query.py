@@ -0,0 +1,78 @@
+from types import SimpleNamespace
+
+from smart_doc.retrieval.query import QueryEmbedder, query_collections
+
+
+class CountingEmbedder:
+    def __init__(self):
+        self.prompts = []
+
+    def embed_query(self, prompts):
+        self.prompts.extend(prompts)
+        return [[float(len(prompt)), 1.0] for prompt in prompts]
+
+
+class RecordingCollection:
+    def __init__(self, name):
+        self.name = name
+        self.queries = []
+
+    def query(self, **kwargs):
+        self.queries.append(kwargs)
+        return {"documents": [[]], "metadatas": [[]], "uris": [[]]}
+
+
+def test_a_prompt_is_embedded_once_per_model():
+    text = CountingEmbedder()
+    images = CountingEmbedder()
+    embed = QueryEmbedder({"english_text": text, "images": images})
+    english = SimpleNamespace(name="english_text")
+
+    first = embed(english, "What was the revenue?")
+    again = embed(english, "  What was the revenue?\n")
+    embed(SimpleNamespace(name="images"), "What was the revenue?")
+
+    assert first == again
+    assert text.prompts == ["What was the revenue?"]
+    assert images.prompts == ["What was the revenue?"]
+    assert embed.stats() == {"hits": 1, "misses": 2, "hit_rate": 1 / 3, "size": 2}
+
+
+def test_the_least_recently_used_prompt_is_evicted():
+    embedder = CountingEmbedder()
+    embed = QueryEmbedder({"english_text": embedder}, max_size=2)
+    english = SimpleNamespace(name="english_text")
+
+    embed(english, "a")
+    embed(english, "b")
+    embed(english, "a")
+    embed(english, "c")
+    embed(english, "a")
+    embed(english, "b")
+
+    assert embedder.prompts == ["a", "b", "c", "b"]
+
+
+def test_collections_are_queried_by_embedding():
+    text = RecordingCollection("english_text")
+    images = RecordingCollection("images")
+    embedder = CountingEmbedder()
+    embed = QueryEmbedder({"english_text": embedder, "images": embedder})
+
+    for _ in range(2):
+        query_collections("Show the chart", lambda prompt: text, images, embed_query=embed)
+
+    assert embedder.prompts == ["Show the chart", "Show the chart"]
+    assert all("query_texts" not in query for query in text.queries + images.queries)
+    assert text.queries[0]["query_embeddings"] == [[14.0, 1.0]]
+
+
+def test_collections_without_a_known_embedder_are_queried_by_text():
+    text = RecordingCollection("arabic_text")
+    images = RecordingCollection("images")
+    embed = QueryEmbedder({"images": CountingEmbedder()})
+
+    query_collections("Show the chart", lambda prompt: text, images, embed_query=embed)
+
+    assert text.queries[0]["query_texts"] == ["Show the chart"]
+    assert "query_embeddings" in images.queries[0]
@@ -0,0 +1,183 @@
+import os
+
+import pytest
+
+chromadb = pytest.importorskip("chromadb")
+# Needs the full model stack to import; no model is loaded by these tests.
+rag_engine = pytest.importorskip("smart_doc.retrieval.rag_engine")
+
+from PIL import Image  # noqa: E402
+
+from smart_doc.retrieval.blob_store import BlobStore  # noqa: E402
+from smart_doc.retrieval.document_registry import DocumentRegistry  # noqa: E402
+
+
+@pytest.fixture
+def make_engine(tmp_path):
+    def make():
+        return rag_engine.RAGEngine(
+            chromadb.PersistentClient(path=str(tmp_path / "chroma")),
+            blob_storage_path=str(tmp_path / "blobs"),
+            documents_path=str(tmp_path / "documents"),
+            registry_path=str(tmp_path / "registry.sqlite3"),
+            table_store_path=str(tmp_path / "tables.sqlite3"),
+            embedding_cache_path=str(tmp_path / "embedding_cache")
+        )
+
+    return make
+
+
+def write_file(tmp_path, text):
+    path = tmp_path / "notes.txt"
+    path.write_text(text)
+    return str(path)
+
+
+def writer(engine, text, calls=None):
+    """An ingestion function that stores one precomputed chunk."""
+    def ingest(file_hash, progress, previous_pages):
+        if calls is not None:
+            calls.append(file_hash)
+        engine._named_collections()["english_text"].add(
+            ids=["notes.txt_chunk_0"],
+            embeddings=[[0.1, 0.2, 0.3]],
+            documents=[text],
+            metadatas=[{"file_hash": file_hash, "document": "notes.txt"}]
+        )
+        return {"chunk_ids": ["notes.txt_chunk_0"]}
+
+    return ingest
+
+
+def figure_writer(engine, tmp_path, document, with_logo):
+    """An ingestion function that stores a logo shared across documents."""
+    def ingest(file_hash, progress, previous_pages):
+        if not with_logo:
+            return {"chunk_ids": [], "image_ids": []}
+
+        blob_id, path, _ = BlobStore(str(tmp_path / "blobs")).put(Image.new("RGB", (40, 20), "navy"))
+        image_id = f"{document}_{blob_id}"
+        engine._named_collections()["images"].add(
+            ids=[image_id],
+            embeddings=[[0.1, 0.2, 0.3]],
+            uris=[path],
+            metadatas=[{"file_hash": file_hash, "document": document, "blob_id": blob_id}]
+        )
+        return {"chunk_ids": [], "image_ids": [image_id]}
+
+    return ingest
+
+
+def stored_chunks(engine):
+    return engine._named_collections()["english_text"].get(include=["documents", "metadatas"])
+
+
+def test_identical_content_is_ingested_once(tmp_path, make_engine):
+    engine = make_engine()
+    path = write_file(tmp_path, "first version")
+    calls = []
+
+    assert engine._ingest(path, "txt", None, None, writer(engine, "first", calls)) == {"status": "indexed"}
+    assert engine._ingest(path, "txt", None, None, writer(engine, "first", calls)) == {
+        "status": "skipped",
+        "reason": "duplicate_file"
+    }
+    assert len(calls) == 1
+
+
+def test_a_new_version_replaces_the_previous_one(tmp_path, make_engine):
+    engine = make_engine()
+    path = write_file(tmp_path, "first version")
+    engine._ingest(path, "txt", None, None, writer(engine, "first"))
+    first_hash = stored_chunks(engine)["metadatas"][0]["file_hash"]
+
+    write_file(tmp_path, "second version")
+    engine._ingest(path, "txt", None, None, writer(engine, "second"))
+
+    chunks = stored_chunks(engine)
+    assert chunks["documents"] == ["second"]
+    assert chunks["metadatas"][0]["file_hash"] != first_hash
+    assert engine.list_documents() == ["notes.txt"]
+    assert engine.unfinished_documents() == []
+
+
+def test_a_failed_replacement_does_not_leave_the_previous_version_listed(tmp_path, make_engine):
+    engine = make_engine()
+    path = write_file(tmp_path, "first version")
+    engine._ingest(path, "txt", None, None, writer(engine, "first"))
+
+    def fail(file_hash, progress, previous_pages):
+        raise RuntimeError("model crashed")
+
+    write_file(tmp_path, "second version")
+    with pytest.raises(RuntimeError):
+        engine._ingest(path, "txt", None, None, fail)
+
+    assert stored_chunks(engine)["ids"] == []
+    assert engine.list_documents() == []
+    assert {record["status"] for record in engine.unfinished_documents()} == {"failed"}
+
+    # Uploading the first version again indexes it afresh.
+    write_file(tmp_path, "first version")
+    assert engine._ingest(path, "txt", None, None, writer(engine, "first")) == {"status": "indexed"}
+    assert engine.list_documents() == ["notes.txt"]
+
+
+def test_a_concurrent_upload_of_the_same_content_is_left_alone(tmp_path, make_engine):
+    engine = make_engine()
+    path = write_file(tmp_path, "first version")
+    nested = []
+
+    def ingest(file_hash, progress, previous_pages):
+        # A second upload of the same bytes arrives mid-ingestion.
+        nested.append(engine._ingest(path, "txt", None, None, writer(engine, "copy")))
+        return writer(engine, "first")(file_hash, progress, previous_pages)
+
+    assert engine._ingest(path, "txt", None, None, ingest) == {"status": "indexed"}
+    assert nested == [{"status": "skipped", "reason": "in_progress"}]
+    assert stored_chunks(engine)["documents"] == ["first"]
+
+
+def test_ingestions_interrupted_by_a_restart_are_purged(tmp_path, make_engine):
+    engine = make_engine()
+    registry = DocumentRegistry(str(tmp_path / "registry.sqlite3"))
+    registry.start("crashed", "notes.txt", "txt")
+    writer(engine, "partial")("crashed", None, {})
+
+    restarted = make_engine()
+
+    assert stored_chunks(restarted)["ids"] == []
+    assert restarted.unfinished_documents() == [{
+        "document": "notes.txt",
+        "file_hash": "crashed",
+        "status": "failed",
+        "error": "Ingestion was interrupted"
+    }]
+
+
+def test_a_shared_figure_is_kept_until_no_document_uses_it(tmp_path, make_engine):
+    engine = make_engine()
+    first = str(tmp_path / "first.txt")
+    second = str(tmp_path / "second.txt")
+    for path in (first, second):
+        with open(path, "w") as f:
+            f.write(path)
+
+    engine._ingest(first, "txt", None, None, figure_writer(engine, tmp_path, "first.txt", True))
+    engine._ingest(second, "txt", None, None, figure_writer(engine, tmp_path, "second.txt", True))
+    logo = engine._named_collections()["images"].get(include=["uris"])["uris"][0]
+
+    # A new version of the first document no longer has the logo.
+    with open(first, "w") as f:
+        f.write("first, without the logo")
+    engine._ingest(first, "txt", None, None, figure_writer(engine, tmp_path, "first.txt", False))
+    assert os.path.exists(logo)
+
+    def fail(file_hash, progress, previous_pages):
+        raise RuntimeError("model crashed")
+
+    with open(second, "w") as f:
+        f.write("second, broken")
+    with pytest.raises(RuntimeError):
+        engine._ingest(second, "txt", None, None, fail)
+    assert not os.path.exists(logo)
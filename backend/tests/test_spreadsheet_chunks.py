@@ -0,0 +1,55 @@
+from smart_doc.retrieval.spreadsheet_ingestion import _iter_csv_rows, _iter_row_chunks
+
+
+def rows(sheet, count, start=1):
+    yield sheet, start, ["name", "value"]
+    for i in range(count):
+        yield sheet, start + i + 1, [f"item {i}", str(i)]
+
+
+def test_header_is_repeated_in_every_chunk():
+    chunks = list(_iter_row_chunks(rows("Sales", 5), rows_per_chunk=2, max_chunk_chars=1000))
+
+    assert [(row_start, row_end) for _, _, row_start, row_end in chunks] == [(2, 3), (4, 5), (6, 6)]
+    for text, sheet, _, _ in chunks:
+        assert sheet == "Sales"
+        assert text.startswith("Sheet: Sales\nname | value\n")
+
+
+def test_chunks_stay_within_the_character_cap():
+    long_rows = [("S", 1, ["header"])] + [("S", i, ["x" * 40]) for i in range(2, 30)]
+    chunks = list(_iter_row_chunks(long_rows, rows_per_chunk=100, max_chunk_chars=150))
+
+    assert len(chunks) > 1
+    assert all(len(text) <= 150 for text, _, _, _ in chunks)
+    covered = [row for _, _, start, end in chunks for row in range(start, end + 1)]
+    assert covered == list(range(2, 30))
+
+
+def test_a_new_sheet_starts_a_new_chunk_with_its_own_header():
+    chunks = list(_iter_row_chunks(
+        [*rows("A", 1), ("B", 1, ["city"]), ("B", 2, ["Cairo"])],
+        rows_per_chunk=20,
+        max_chunk_chars=1000
+    ))
+
+    assert [(text, sheet) for text, sheet, _, _ in chunks] == [
+        ("Sheet: A\nname | value\nitem 0 | 0", "A"),
+        ("Sheet: B\ncity\nCairo", "B"),
+    ]
+
+
+def test_header_only_sheet_is_kept():
+    chunks = list(_iter_row_chunks([(None, 1, ["a", "b"])], 20, 1000))
+    assert chunks == [("a | b", None, 1, 1)]
+
+
+def test_csv_rows_skip_blank_lines(tmp_path):
+    path = tmp_path / "data.csv"
+    path.write_text("a,b\n1,2\n,\n3,4\n", encoding="utf-8")
+
+    assert list(_iter_csv_rows(str(path))) == [
+        (None, 1, ["a", "b"]),
+        (None, 2, ["1", "2"]),
+        (None, 4, ["3", "4"]),
+    ]
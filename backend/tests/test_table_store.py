@@ -0,0 +1,110 @@
+import sqlite3
+
+import pytest
+
+from smart_doc.retrieval.table_store import TableStore, _parse_value
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = TableStore(str(tmp_path / "tables.sqlite3"))
+    with store.loader("sales.csv", "a" * 32) as loader:
+        loader.add_row(None, ["region", "units", "price"])
+        for i in range(300):
+            loader.add_row(None, [f"r{i % 3}", str(i), "n/a" if i == 0 else f"{i}.5"])
+    return store
+
+
+def table_name(store):
+    return store.describe("sales.csv")[0]["table"]
+
+
+def test_columns_are_typed_and_null_markers_stored_as_null(store):
+    [table] = store.describe()
+
+    assert table["row_count"] == 300
+    assert table["columns"] == [
+        {"name": "region", "type": "TEXT"},
+        {"name": "units", "type": "INTEGER"},
+        {"name": "price", "type": "REAL"},
+    ]
+    result = store.query(f'SELECT SUM(units), COUNT(price) FROM "{table["table"]}"')
+    assert result["rows"] == [[sum(range(300)), 299]]
+
+
+def test_rows_are_capped(store):
+    result = store.query(f'SELECT * FROM "{table_name(store)}"', max_rows=10)
+
+    assert len(result["rows"]) == 10
+    assert result["truncated"] is True
+    assert result["columns"] == ["region", "units", "price"]
+
+
+@pytest.mark.parametrize("sql", [
+    "DELETE FROM spreadsheet_tables",
+    "DROP TABLE spreadsheet_tables",
+    "SELECT 1; DELETE FROM spreadsheet_tables",
+    "PRAGMA table_info(spreadsheet_tables)",
+])
+def test_only_a_single_select_is_accepted(store, sql):
+    with pytest.raises(ValueError):
+        store.query(sql)
+
+
+def test_writes_disguised_as_select_hit_the_read_only_connection(store):
+    with pytest.raises(sqlite3.OperationalError):
+        store.query("WITH x AS (SELECT 1) DELETE FROM spreadsheet_tables")
+    assert store.describe()
+
+
+def test_runaway_queries_time_out(store):
+    table = table_name(store)
+    with pytest.raises(TimeoutError):
+        store.query(
+            f'SELECT COUNT(*) FROM "{table}" a, "{table}" b, "{table}" c, "{table}" d',
+            timeout=0.2
+        )
+
+
+def test_failed_load_leaves_no_tables(tmp_path):
+    store = TableStore(str(tmp_path / "tables.sqlite3"))
+
+    with pytest.raises(RuntimeError):
+        with store.loader("broken.csv", "b" * 32) as loader:
+            loader.add_row(None, ["a"])
+            loader.add_row(None, ["1"])
+            raise RuntimeError("parse error")
+
+    assert store.describe() == []
+
+
+def test_remove_file_drops_its_tables(store):
+    table = table_name(store)
+    store.remove_file("a" * 32)
+
+    assert store.describe() == []
+    with pytest.raises(sqlite3.OperationalError):
+        store.query(f'SELECT * FROM "{table}"')
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("42", 42),
+    ("-7", -7),
+    ("+3.25", 3.25),
+    ("0.5", 0.5),
+    ("1,234,567", 1234567),
+    ("-1,234.5", -1234.5),
+    ("2.5E-3", 0.0025),
+    ("007", "007"),
+    ("1_000", "1_000"),
+    ("nan", "nan"),
+    ("inf", "inf"),
+    ("-Infinity", "-Infinity"),
+    ("12,34", "12,34"),
+    ("1.", "1."),
+    (" 12 ", 12),
+])
+def test_only_plain_numbers_are_parsed(text, expected):
+    value = _parse_value(text)
+
+    assert value == expected and type(value) is type(expected)
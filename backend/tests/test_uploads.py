@@ -0,0 +1,103 @@
+import asyncio
+import os
+
+from smart_doc.app import uploads
+from smart_doc.app.jobs import IngestionJobQueue
+from smart_doc.app.uploads import save_uploaded_files
+from smart_doc.retrieval.file_utils import compute_file_hash
+
+
+class FakeUpload:
+    """The part of fastapi's UploadFile the save path uses."""
+
+    def __init__(self, filename, data, fail_after=None, max_read=4):
+        self.filename = filename
+        self._data = data
+        self._offset = 0
+        self._fail_after = fail_after
+        self._max_read = max_read
+
+    async def read(self, size):
+        if self._fail_after is not None and self._offset >= self._fail_after:
+            raise ConnectionResetError("client went away")
+        chunk = self._data[self._offset:self._offset + min(size, self._max_read or size)]
+        self._offset += len(chunk)
+        return chunk
+
+
+class RecordingEngine:
+    def __init__(self):
+        self.added = []
+
+    def caption_files(self, paths):
+        pass
+
+    def add_file(self, path, progress=None, file_hash=None):
+        self.added.append(os.path.basename(path))
+        return {"status": "indexed"}
+
+
+def save(files, folder):
+    return asyncio.run(save_uploaded_files(files, str(folder)))
+
+
+def test_files_are_saved_and_hashed(tmp_path):
+    saved = save([FakeUpload("a.txt", b"alpha"), FakeUpload("b.txt", b"beta")], tmp_path)
+
+    assert [file.name for file in saved] == ["a.txt", "b.txt"]
+    assert all(file.error is None for file in saved)
+    assert saved[0].file_hash == compute_file_hash(str(tmp_path / "a.txt"))
+    assert sorted(os.listdir(tmp_path)) == ["a.txt", "b.txt"]
+
+
+def test_a_failed_save_is_reported_and_leaves_no_partial_file(tmp_path):
+    (tmp_path / "b.txt").write_bytes(b"stored version")
+
+    saved = save([
+        FakeUpload("a.txt", b"alpha"),
+        FakeUpload("b.txt", b"a longer new version", fail_after=8)
+    ], tmp_path)
+
+    assert saved[0].error is None
+    assert "client went away" in saved[1].error
+    # The stored document of the same name is untouched.
+    assert sorted(os.listdir(tmp_path)) == ["a.txt", "b.txt"]
+    assert (tmp_path / "b.txt").read_bytes() == b"stored version"
+
+
+def test_repeated_names_are_skipped(tmp_path):
+    saved = save([FakeUpload("a.txt", b"first"), FakeUpload("a.txt", b"second")], tmp_path)
+
+    assert saved[1].skip_reason == "duplicate_name"
+    assert (tmp_path / "a.txt").read_bytes() == b"first"
+
+
+def test_settled_uploads_reach_the_job_without_being_ingested(tmp_path):
+    saved = save([
+        FakeUpload("a.txt", b"alpha"),
+        FakeUpload("a.txt", b"again"),
+        FakeUpload("b.txt", b"beta", fail_after=0),
+    ], tmp_path)
+    engine = RecordingEngine()
+    jobs = IngestionJobQueue(engine, workers=1, file_workers=1)
+
+    job_id = jobs.submit(saved)
+    jobs._executor.shutdown(wait=True)
+    job = jobs.get(job_id)
+
+    assert engine.added == ["a.txt"]
+    assert job["uploaded"] == ["a.txt"]
+    assert job["skipped"] == ["a.txt"]
+    assert job["failed"] == [{"file": "b.txt", "error": "client went away"}]
+    assert [file["reason"] for file in job["files"]] == [None, "duplicate_name", None]
+
+
+def test_the_streamed_hash_matches_hashing_the_stored_file(tmp_path, monkeypatch):
+    # Several full read chunks and a partial last one.
+    monkeypatch.setattr(uploads, "HASH_CHUNK_SIZE", 1000)
+    data = bytes(range(256)) * 20
+
+    saved = save([FakeUpload("large.bin", data, max_read=None)], tmp_path)[0]
+
+    assert (tmp_path / "large.bin").read_bytes() == data
+    assert saved.file_hash == compute_file_hash(str(tmp_path / "large.bin"))
@@ -460,9 +460,12 @@ export default function ChatApp() {
           body: formData
         });
         if (!res.ok) throw new Error(`HTTP ${res.status}`);
-        const data = await res.json();
+        const data = await waitForIngestionJob(await res.json());
 
-        let replyText = `❌ Upload failed for ${file.name}`;
+        const failure = (data.failed || []).find((entry: any) => entry.file === file.name);
+        let replyText = failure
+          ? `❌ Upload failed for ${file.name}: ${failure.error}`
+          : `❌ Upload failed for ${file.name}`;
         let success = false;
         if (data.uploaded && data.uploaded.includes(file.name)) {
           replyText = `✅ Uploaded ${file.name} successfully`;
@@ -506,6 +509,21 @@ export default function ChatApp() {
     }
   };
 
+  // Uploads are ingested in the background; poll the job until it finishes.
+  // A finished job is 'completed', 'completed_with_errors' (some files
+  // failed) or 'failed' (every file failed); per-file results are in its
+  // uploaded, skipped and failed lists.
+  const finishedJobStatuses = ['completed', 'completed_with_errors', 'failed'];
+  const waitForIngestionJob = async (job: any) => {
+    while (!finishedJobStatuses.includes(job.status)) {
+      await new Promise(resolve => setTimeout(resolve, 1500));
+      const res = await fetch(`${backendUrl}/jobs/${job.id}`);
+      if (!res.ok) throw new Error(`HTTP ${res.status}`);
+      job = await res.json();
+    }
+    return job;
+  };
+
   const loadPDFs = () => {
     const userKey = user ? user.uid : 'guest';
     const key = `smartdoc_user_files_${userKey}`;